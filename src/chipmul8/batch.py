@@ -0,0 +1,209 @@
+"""
+Batch runner executing a corpus of ROMs headlessly across a pool of worker processes.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Final, NamedTuple
+
+from chipmul8.display import SpriteMode
+from chipmul8.headless import display_hash, parse_input_script, run_headless
+from chipmul8.interpreter import Interpreter, StopReason
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from pathlib import Path
+
+# File extensions picked up when a directory of ROMs is scanned.
+ROM_SUFFIXES: Final = frozenset({".ch8", ".c8"})
+
+# An input script named after a ROM with this suffix appended (pong.ch8.inputs) is fed to that ROM.
+INPUT_SCRIPT_SUFFIX: Final = ".inputs"
+
+
+class BatchJob(NamedTuple):
+    """
+    A single headless run of a ROM.
+    """
+
+    rom: Path
+    frames: int | None = None
+    cycles: int | None = None
+    input_script: Path | None = None
+    instructions_per_second: int = 700
+    sprite_mode: SpriteMode = SpriteMode.CLIP
+    # Seed of the random numbers drawn by CXNN, fixed so reruns of a ROM produce the same display.
+    seed: int = 0
+
+
+class BatchResult(NamedTuple):
+    """
+    Outcome of a batch job.
+    """
+
+    rom: Path
+    # SHA-256 of the final display, None if the ROM couldn't be loaded.
+    display_hash: str | None
+    cycles: int
+    # Description of the fault that stopped the run, None if the budget was exhausted.
+    fault: str | None
+    # Seconds spent loading and running the ROM.
+    wall_time: float
+
+
+def _validate(job: BatchJob) -> BatchJob:
+    """
+    Check a job has a budget.
+
+    :param job: Job to check.
+    :return: The job.
+    """
+    if job.frames is None and job.cycles is None:
+        msg = f"{job.rom}: a frame or cycle budget is required"
+        raise ValueError(msg)
+
+    return job
+
+
+def discover_jobs(  # noqa: PLR0913
+    directory: Path,
+    *,
+    frames: int | None = None,
+    cycles: int | None = None,
+    instructions_per_second: int = 700,
+    sprite_mode: SpriteMode = SpriteMode.CLIP,
+    seed: int = 0,
+) -> list[BatchJob]:
+    """
+    Create a job for every ROM within a directory (recursively), with the same budget.
+
+    :param directory: Directory to scan.
+    :param frames: Frame budget of each job.
+    :param cycles: Cycle budget of each job.
+    :param instructions_per_second: Instruction rate of each job.
+    :param sprite_mode: Behaviour of sprites drawn past the edge of the display.
+    :param seed: Seed of the random numbers drawn by each job.
+    :return: Jobs, sorted by ROM path.
+    """
+    jobs = []
+
+    for rom in sorted(directory.rglob("*")):
+        if rom.suffix.lower() not in ROM_SUFFIXES or not rom.is_file():
+            continue
+
+        input_script = rom.with_name(rom.name + INPUT_SCRIPT_SUFFIX)
+
+        job = BatchJob(
+            rom=rom,
+            frames=frames,
+            cycles=cycles,
+            input_script=input_script if input_script.is_file() else None,
+            instructions_per_second=instructions_per_second,
+            sprite_mode=sprite_mode,
+            seed=seed,
+        )
+        jobs.append(_validate(job))
+
+    return jobs
+
+
+def load_manifest(  # noqa: PLR0913
+    manifest: Path,
+    *,
+    frames: int | None = None,
+    cycles: int | None = None,
+    instructions_per_second: int = 700,
+    sprite_mode: SpriteMode = SpriteMode.CLIP,
+    seed: int = 0,
+) -> list[BatchJob]:
+    """
+    Load jobs from a JSON manifest.
+
+    The manifest is a list of objects with a ``rom`` path and optionally ``frames``, ``cycles``, ``input_script``,
+    ``instructions_per_second``, ``sprite_mode`` and ``seed``; missing fields take the provided defaults. Relative
+    paths are resolved against the manifest's directory.
+
+    :param manifest: Manifest path.
+    :param frames: Default frame budget.
+    :param cycles: Default cycle budget.
+    :param instructions_per_second: Default instruction rate.
+    :param sprite_mode: Default behaviour of sprites drawn past the edge of the display.
+    :param seed: Default seed of the random numbers drawn.
+    :return: Jobs, in manifest order.
+    """
+    jobs = []
+
+    for entry in json.loads(manifest.read_text()):
+        unknown = set(entry) - set(BatchJob._fields)
+
+        if unknown or "rom" not in entry:
+            msg = f"{manifest}: invalid entry {entry!r}, expected a rom and any of {', '.join(BatchJob._fields[1:])}"
+            raise ValueError(msg)
+
+        input_script = entry.get("input_script")
+
+        job = BatchJob(
+            rom=manifest.parent / entry["rom"],
+            frames=entry.get("frames", frames),
+            cycles=entry.get("cycles", cycles),
+            input_script=None if input_script is None else manifest.parent / input_script,
+            instructions_per_second=entry.get("instructions_per_second", instructions_per_second),
+            sprite_mode=SpriteMode(entry.get("sprite_mode", sprite_mode)),
+            seed=entry.get("seed", seed),
+        )
+        jobs.append(_validate(job))
+
+    return jobs
+
+
+def run_job(job: BatchJob) -> BatchResult:
+    """
+    Run a single job in the current process.
+
+    :param job: Job to run.
+    :return: Job result.
+    """
+    start = time.perf_counter()
+    cpu = Interpreter(sprite_mode=job.sprite_mode, seed=job.seed)
+
+    try:
+        with job.rom.open("rb") as rom_file:
+            cpu.load_rom(rom_file)
+
+        inputs = {} if job.input_script is None else parse_input_script(job.input_script.read_text())
+    except (OSError, ValueError, IndexError) as e:
+        # e.g. an unreadable ROM, one too big for memory or a bad input script, which only fails this job.
+        return BatchResult(job.rom, None, 0, str(e), time.perf_counter() - start)
+
+    reason = run_headless(
+        cpu,
+        frames=job.frames,
+        cycles=job.cycles,
+        inputs=inputs,
+        instructions_per_second=job.instructions_per_second,
+    )
+
+    fault = None
+
+    if reason == StopReason.FAULT:
+        fault = f"opcode {cpu.current_op_code:#06x} at {cpu.program_counter:#05x}: {cpu.fault}"
+
+    return BatchResult(job.rom, display_hash(cpu.display_memory), cpu.cycles, fault, time.perf_counter() - start)
+
+
+def run_batch(jobs: Iterable[BatchJob], workers: int | None = None) -> Iterator[BatchResult]:
+    """
+    Run jobs across a pool of worker processes, yielding results as they finish.
+
+    :param jobs: Jobs to run.
+    :param workers: Number of worker processes, defaults to one per core.
+    :return: Job results, in completion order.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_job, job) for job in jobs]
+
+        for future in as_completed(futures):
+            yield future.result()
@@ -3,36 +3,790 @@ CLI interface for the Chipmul8 emulator.
 """
 
 import os
-from io import BufferedReader
+from io import BufferedReader, TextIOWrapper
+from pathlib import Path
+from typing import TYPE_CHECKING
 
-from click import File, argument, command, echo, option
+from click import (
+    BadParameter,
+    Choice,
+    Context,
+    File,
+    Group,
+    IntRange,
+    Parameter,
+    UsageError,
+    argument,
+    echo,
+    group,
+    option,
+)
+from click import Path as PathType
+from click.exceptions import Exit
 
+from chipmul8.display import DEFAULT_PALETTE, Color, SpriteMode
 
-@command()
+if TYPE_CHECKING:
+    from chipmul8.profiler import GuestProfiler, HostProfiler
+    from chipmul8.trace import TraceRecorder
+
+# Commands are run with the default command's options when the first argument isn't a command name.
+DEFAULT_COMMAND = "run"
+
+
+class DefaultCommandGroup(Group):
+    """
+    Command group falling back to the default command, so ``chipmul8 rom.ch8`` keeps working.
+    """
+
+    def parse_args(self, ctx: Context, args: list[str]) -> list[str]:
+        """
+        Insert the default command ahead of arguments that don't start with a command name.
+
+        :param ctx: Click context.
+        :param args: Command line arguments.
+        :return: Arguments left for the subcommand.
+        """
+        if args and args[0] not in self.commands and args[0] not in ctx.help_option_names:
+            args = [DEFAULT_COMMAND, *args]
+
+        return super().parse_args(ctx, args)
+
+
+def parse_palette(_context: Context, _parameter: Parameter, value: str | None) -> tuple[Color, Color]:
+    """
+    Parse a palette in the form RRGGBB:RRGGBB (pixel off colour, pixel on colour).
+
+    :param _context: Click context.
+    :param _parameter: Palette option.
+    :param value: Option value.
+    :return: Colours of pixels that are off and on.
+    """
+    if value is None:
+        return DEFAULT_PALETTE
+
+    try:
+        off, on = (bytes.fromhex(color) for color in value.split(":"))
+    except ValueError:
+        off = on = b""
+
+    if len(off) != 3 or len(on) != 3:
+        msg = "expected two hex colours in the form RRGGBB:RRGGBB"
+        raise BadParameter(msg)
+
+    return (off[0], off[1], off[2]), (on[0], on[1], on[2])
+
+
+def parse_input_script(_context: Context, _parameter: Parameter, value: TextIOWrapper | None) -> dict[int, int]:
+    """
+    Parse a headless input script.
+
+    :param _context: Click context.
+    :param _parameter: Input script option.
+    :param value: Input script file.
+    :return: Mapping of frame number to key mask.
+    """
+    if value is None:
+        return {}
+
+    from chipmul8.headless import parse_input_script
+
+    try:
+        return parse_input_script(value.read())
+    except ValueError as e:
+        raise BadParameter(str(e)) from None
+
+
+def write_dump(destination: str, text: str, png: bytes | None = None) -> None:
+    """
+    Write a dump as PNG if the destination ends in .png, otherwise as text ("-" writes the text to stdout).
+
+    :param destination: Output path.
+    :param text: Dump rendered as text.
+    :param png: Dump rendered as PNG, None if the dump is only available as text.
+    :return: None.
+    """
+    if destination == "-":
+        echo(text, nl=False)
+    elif png is not None and destination.lower().endswith(".png"):
+        Path(destination).write_bytes(png)
+    else:
+        Path(destination).write_text(text)
+
+
+def create_profilers(
+    *, profile: bool, profile_json: str | None, guest_profile: str | None
+) -> tuple["HostProfiler | None", "GuestProfiler | None"]:
+    """
+    Create the profilers requested, without importing the profiler module unless one is.
+
+    :param profile: Print a host profile.
+    :param profile_json: Host profile JSON path.
+    :param guest_profile: Guest profile path prefix.
+    :return: Host and guest profilers, None if not requested.
+    """
+    if not profile and profile_json is None and guest_profile is None:
+        return None, None
+
+    from chipmul8.profiler import GuestProfiler, HostProfiler
+
+    return (
+        HostProfiler() if profile or profile_json is not None else None,
+        GuestProfiler() if guest_profile is not None else None,
+    )
+
+
+def create_trace_recorder(trace: Path | None) -> "TraceRecorder | None":
+    """
+    Create the trace recorder requested, without importing the trace module unless one is.
+
+    :param trace: Execution trace path.
+    :return: Trace recorder, None if not requested.
+    """
+    if trace is None:
+        return None
+
+    from chipmul8.trace import TraceRecorder
+
+    return TraceRecorder(trace)
+
+
+def write_profiles(
+    host_profiler: "HostProfiler | None",
+    guest_profiler: "GuestProfiler | None",
+    *,
+    profile: bool,
+    profile_json: str | None,
+    guest_profile: str | None,
+) -> None:
+    """
+    Output the profiles gathered.
+
+    The host profile is printed as tables to stderr and/or written as JSON ("-" writes to stdout). The guest profile is
+    written to <guest_profile>.folded (folded call stacks, for flame graphs), <guest_profile>.png (RAM heatmap) and
+    <guest_profile>.json (subroutines, calls and hottest addresses).
+
+    :param host_profiler: Host profiler, None if not profiling the host.
+    :param guest_profiler: Guest profiler, None if not profiling the guest.
+    :param profile: Print the host profile.
+    :param profile_json: Host profile JSON path.
+    :param guest_profile: Guest profile path prefix.
+    :return: None.
+    """
+    import json
+
+    if host_profiler is not None:
+        from chipmul8.profiler import format_report
+
+        report = host_profiler.report()
+
+        if profile:
+            echo(format_report(report), err=True, nl=False)
+
+        if profile_json is not None:
+            write_dump(profile_json, json.dumps(report, indent=2) + "\n")
+
+    if guest_profile is not None and guest_profiler is not None and guest_profiler.interpreters:
+        memory = guest_profiler.interpreters[-1].ram.memory
+
+        Path(f"{guest_profile}.folded").write_text(guest_profiler.folded_stacks())
+        Path(f"{guest_profile}.png").write_bytes(guest_profiler.heatmap(memory))
+        Path(f"{guest_profile}.json").write_text(json.dumps(guest_profiler.report(), indent=2) + "\n")
+
+
+@group(cls=DefaultCommandGroup)
+def cli() -> None:
+    """
+    CHIP-8 emulator, ``chipmul8 ROM`` is shorthand for ``chipmul8 run ROM``.
+
+    :return: None.
+    """
+
+
+@cli.command()
 @option("--invert_colors/--no-invert_colors", default=False, help="Inverts the black/white values for the display")
+@option("--ips", default=700, type=IntRange(min=1), help="Instructions executed per second")
+@option(
+    "--sprite_mode",
+    default=SpriteMode.CLIP,
+    type=Choice(SpriteMode, case_sensitive=False),
+    help="Clip or wrap sprites drawn past the edge of the display",
+)
+@option("--palette", callback=parse_palette, help="Display colours as RRGGBB:RRGGBB (pixel off:pixel on)")
+@option(
+    "--pixel_buffer/--no-pixel_buffer", default=False, help="Upload frames to the GPU through a pixel buffer object"
+)
+@option(
+    "--rewind_seconds",
+    default=300,
+    type=IntRange(min=0),
+    help="Seconds of play kept for rewinding (hold backspace), 0 disables rewinding",
+)
+@option("--seed", type=IntRange(min=0, max=2**64 - 1), help="Seed of the random numbers drawn by the ROM (CXNN)")
+@option(
+    "--record",
+    type=PathType(dir_okay=False, writable=True, path_type=Path),
+    help="Record the keys held each frame to a movie file, see the replay command",
+)
+@option("--profile", is_flag=True, help="Print where the host spent its time (per instruction and game loop phase)")
+@option(
+    "--profile_json",
+    type=PathType(dir_okay=False, allow_dash=True),
+    help="Write the profile as JSON ('-' writes to stdout)",
+)
+@option(
+    "--guest_profile",
+    type=PathType(dir_okay=False),
+    help="Profile the ROM, writing <path>.folded (call stacks, for flame graphs), <path>.png (RAM heatmap) and .json",
+)
+@option(
+    "--trace",
+    type=PathType(dir_okay=False, writable=True, path_type=Path),
+    help="Record every instruction executed to a compressed binary trace, see chipmul8.trace",
+)
+@option(
+    "--jit",
+    is_flag=True,
+    help="Execute straight-line runs of instructions as compiled Python functions, see chipmul8.jit",
+)
+@option(
+    "--threaded",
+    is_flag=True,
+    help="Run the interpreter on its own thread, so presenting frames (e.g. waiting on vsync) never stalls it",
+)
+@option(
+    "--split",
+    is_flag=True,
+    help="Run the interpreter in its own process, sharing the display and keys with the window through shared memory",
+)
+@option("--headless", is_flag=True, help="Run without a window, as fast as possible, until a budget is exhausted")
+@option("--frames", type=IntRange(min=0), help="Headless: number of 60 Hz frames to run")
+@option("--cycles", type=IntRange(min=0), help="Headless: number of instructions to execute")
+@option(
+    "--input_script",
+    type=File("r"),
+    callback=parse_input_script,
+    help="Headless: file of '<frame> <hex keys>' lines, the keys held from each frame onwards",
+)
+@option(
+    "--dump_display", type=PathType(dir_okay=False, allow_dash=True), help="Headless: write the display (.png/text)"
+)
+@option("--dump_registers", type=PathType(dir_okay=False, allow_dash=True), help="Headless: write the registers")
+@option("--dump_ram", type=PathType(dir_okay=False, allow_dash=True), help="Headless: write the RAM (.png/text)")
 @argument("input_file", type=File("rb"), nargs=1)
-def cli(invert_colors: bool, input_file: BufferedReader) -> None:
+def run(  # noqa: PLR0913
+    *,
+    invert_colors: bool,
+    ips: int,
+    sprite_mode: SpriteMode,
+    palette: tuple[Color, Color],
+    pixel_buffer: bool,
+    rewind_seconds: int,
+    seed: int | None,
+    record: Path | None,
+    profile: bool,
+    profile_json: str | None,
+    guest_profile: str | None,
+    trace: Path | None,
+    jit: bool,
+    threaded: bool,
+    split: bool,
+    headless: bool,
+    frames: int | None,
+    cycles: int | None,
+    input_script: dict[int, int],
+    dump_display: str | None,
+    dump_registers: str | None,
+    dump_ram: str | None,
+    input_file: BufferedReader,
+) -> None:
     """
-    CLI interface for launching the emulator.
+    Run a ROM.
 
     :param invert_colors: Invert display colour flag.
+    :param ips: Instructions executed per second.
+    :param sprite_mode: Behaviour of sprites drawn past the edge of the display.
+    :param palette: Colours of pixels that are off and on.
+    :param pixel_buffer: Upload frames through a pixel buffer object.
+    :param rewind_seconds: Seconds of play kept for rewinding.
+    :param seed: Seed of the random numbers drawn by the ROM.
+    :param record: Movie recording path.
+    :param profile: Print a host profile.
+    :param profile_json: Host profile JSON path.
+    :param guest_profile: Guest profile path prefix.
+    :param trace: Execution trace path.
+    :param jit: Execute through compiled basic blocks.
+    :param threaded: Run the interpreter on its own thread.
+    :param split: Run the interpreter in a separate process.
+    :param headless: Run without a window.
+    :param frames: Headless frame budget.
+    :param cycles: Headless cycle budget.
+    :param input_script: Headless mapping of frame number to key mask.
+    :param dump_display: Headless display dump path.
+    :param dump_registers: Headless register dump path.
+    :param dump_ram: Headless RAM dump path.
     :param input_file: Rom file.
     :return: None.
     """
+    if jit and (profile or any(value is not None for value in (profile_json, guest_profile, trace))):
+        msg = "--profile*, --guest_profile and --trace instrument the dispatch table, which --jit bypasses"
+        raise UsageError(msg)
+
+    if headless:
+        if frames is None and cycles is None:
+            msg = "--headless requires --frames and/or --cycles"
+            raise UsageError(msg)
+
+        if record is not None:
+            msg = "--record requires a window, headless runs are reproduced by their input script"
+            raise UsageError(msg)
+
+        if split or threaded:
+            msg = "--split and --threaded require a window"
+            raise UsageError(msg)
+
+        if invert_colors:
+            palette = (palette[1], palette[0])
+
+        run_headless(
+            rom_file=input_file,
+            ips=ips,
+            sprite_mode=sprite_mode,
+            palette=palette,
+            seed=seed,
+            profile=profile,
+            profile_json=profile_json,
+            guest_profile=guest_profile,
+            trace=trace,
+            jit=jit,
+            frames=frames,
+            cycles=cycles,
+            inputs=input_script,
+            dump_display=dump_display,
+            dump_registers=dump_registers,
+            dump_ram=dump_ram,
+        )
+        return
+
+    if input_script or any(value is not None for value in (frames, cycles, dump_display, dump_registers, dump_ram)):
+        msg = "--frames, --cycles, --input_script and --dump_* options require --headless"
+        raise UsageError(msg)
+
+    if split:
+        if jit:
+            msg = "--jit can't reach an interpreter run with --split"
+            raise UsageError(msg)
+
+        if threaded:
+            msg = "--split already runs the interpreter apart from the window, --threaded can't be combined with it"
+            raise UsageError(msg)
+
+        if record is not None or profile or any(value is not None for value in (profile_json, guest_profile, trace)):
+            msg = "--record, --profile*, --guest_profile and --trace can't reach an interpreter run with --split"
+            raise UsageError(msg)
+
+        run_split(
+            rom_file=input_file,
+            invert_colors=invert_colors,
+            ips=ips,
+            sprite_mode=sprite_mode,
+            palette=palette,
+            pixel_buffer=pixel_buffer,
+            seed=seed,
+        )
+        return
+
+    run_windowed(
+        rom_file=input_file,
+        invert_colors=invert_colors,
+        ips=ips,
+        sprite_mode=sprite_mode,
+        palette=palette,
+        pixel_buffer=pixel_buffer,
+        rewind_seconds=rewind_seconds,
+        seed=seed,
+        record=record,
+        profile=profile,
+        profile_json=profile_json,
+        guest_profile=guest_profile,
+        trace=trace,
+        jit=jit,
+        threaded=threaded,
+    )
+
+
+def run_windowed(  # noqa: PLR0913
+    *,
+    rom_file: BufferedReader,
+    invert_colors: bool,
+    ips: int,
+    sprite_mode: SpriteMode,
+    palette: tuple[Color, Color],
+    pixel_buffer: bool,
+    rewind_seconds: int,
+    seed: int | None,
+    record: Path | None,
+    profile: bool,
+    profile_json: str | None,
+    guest_profile: str | None,
+    trace: Path | None,
+    jit: bool,
+    threaded: bool,
+) -> None:
+    """
+    Run a ROM in a window until it's closed.
+
+    :param rom_file: Rom file.
+    :param invert_colors: Invert display colour flag.
+    :param ips: Instructions executed per second.
+    :param sprite_mode: Behaviour of sprites drawn past the edge of the display.
+    :param palette: Colours of pixels that are off and on.
+    :param pixel_buffer: Upload frames through a pixel buffer object.
+    :param rewind_seconds: Seconds of play kept for rewinding.
+    :param seed: Seed of the random numbers drawn by the ROM.
+    :param record: Movie recording path.
+    :param profile: Print a host profile.
+    :param profile_json: Host profile JSON path.
+    :param guest_profile: Guest profile path prefix.
+    :param trace: Execution trace path.
+    :param jit: Execute through compiled basic blocks.
+    :param threaded: Run the interpreter on its own thread.
+    :return: None.
+    """
     # Suppress PyGame support prompt
     os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "hide"
 
     from chipmul8.engine import GameEngine
 
-    rom_file = input_file
+    echo(f"Loaded rom from path: {rom_file.name}")
+
+    movie = None
 
-    echo(f"Loaded rom from path: {input_file.name}")
+    if record is not None:
+        import secrets
+
+        from chipmul8.movie import Movie, rom_hash
+
+        # Replays have to draw the same random numbers, so recordings are always seeded.
+        seed = secrets.randbits(64) if seed is None else seed
+        movie = Movie(rom_hash(rom_file.read()), seed, instructions_per_second=ips, sprite_mode=sprite_mode)
+        rom_file.seek(0)
+
+    profiler, guest_profiler = create_profilers(profile=profile, profile_json=profile_json, guest_profile=guest_profile)
+
+    recorder = create_trace_recorder(trace)
 
     try:
-        game = GameEngine(rom_file=rom_file, invert_colors=invert_colors)
+        game = GameEngine(
+            rom_file=rom_file,
+            invert_colors=invert_colors,
+            instructions_per_second=ips,
+            sprite_mode=sprite_mode,
+            palette=palette,
+            use_pixel_buffer=pixel_buffer,
+            rewind_seconds=rewind_seconds,
+            seed=seed,
+            movie=movie,
+            threaded=threaded,
+        )
         game.create_window()
+
+        if jit:
+            from chipmul8.jit import BlockCompiler
+
+            BlockCompiler(game.cpu).attach()
+
+        if profiler is not None:
+            profiler.attach_engine(game)
+
+        if guest_profiler is not None:
+            guest_profiler.attach(game.cpu)
+
+        if recorder is not None:
+            recorder.attach(game.cpu)
+
+        if profiler is not None:
+            profiler.start_clock()
+
         game.start()
     except Exception as e:
         echo(f"An exception occurred: {e}")
 
+    if recorder is not None:
+        recorder.close()
+
+    write_profiles(profiler, guest_profiler, profile=profile, profile_json=profile_json, guest_profile=guest_profile)
+
+    if record is not None and movie is not None:
+        record.write_bytes(movie.to_bytes())
+        echo(f"Recorded {len(movie)} frames to: {record}")
+
     echo("Goodbye, Parzival. Thank you for playing my game.")
+
+
+def run_split(  # noqa: PLR0913
+    *,
+    rom_file: BufferedReader,
+    invert_colors: bool,
+    ips: int,
+    sprite_mode: SpriteMode,
+    palette: tuple[Color, Color],
+    pixel_buffer: bool,
+    seed: int | None,
+) -> None:
+    """
+    Run a ROM in an interpreter process, presented in a window until it's closed.
+
+    :param rom_file: Rom file.
+    :param invert_colors: Invert display colour flag.
+    :param ips: Instructions executed per second.
+    :param sprite_mode: Behaviour of sprites drawn past the edge of the display.
+    :param palette: Colours of pixels that are off and on.
+    :param pixel_buffer: Upload frames through a pixel buffer object.
+    :param seed: Seed of the random numbers drawn by the ROM.
+    :return: None.
+    """
+    from chipmul8.shared import SharedMachine, start_interpreter
+
+    echo(f"Loaded rom from path: {rom_file.name}")
+
+    rom_path = Path(rom_file.name)
+    machine = SharedMachine.create()
+    # Started before the window, the interpreter process is spawned without pygame.
+    process = start_interpreter(
+        machine, rom_file.read(), instructions_per_second=ips, sprite_mode=sprite_mode, seed=seed
+    )
+
+    # Suppress PyGame support prompt
+    os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "hide"
+
+    from chipmul8.engine import RemoteGameEngine
+
+    try:
+        game = RemoteGameEngine(
+            [machine],
+            rom_path.name[: len(rom_path.suffix) + 2],
+            invert_colors,
+            palette=palette,
+            use_pixel_buffer=pixel_buffer,
+        )
+        game.create_window()
+        game.start()
+    except Exception as e:
+        echo(f"An exception occurred: {e}")
+    finally:
+        machine.stop()
+        process.join()
+        machine.close()
+        machine.unlink()
+
+    echo("Goodbye, Parzival. Thank you for playing my game.")
+
+
+def run_headless(  # noqa: PLR0913
+    *,
+    rom_file: BufferedReader,
+    ips: int,
+    sprite_mode: SpriteMode,
+    palette: tuple[Color, Color],
+    seed: int | None,
+    profile: bool,
+    profile_json: str | None,
+    guest_profile: str | None,
+    trace: Path | None,
+    jit: bool,
+    frames: int | None,
+    cycles: int | None,
+    inputs: dict[int, int],
+    dump_display: str | None,
+    dump_registers: str | None,
+    dump_ram: str | None,
+) -> None:
+    """
+    Run a ROM without a window and dump the final machine state.
+
+    :param rom_file: Rom file.
+    :param ips: Instructions executed per second.
+    :param sprite_mode: Behaviour of sprites drawn past the edge of the display.
+    :param palette: Colours of pixels that are off and on, used by PNG display dumps.
+    :param seed: Seed of the random numbers drawn by the ROM.
+    :param profile: Print a host profile.
+    :param profile_json: Host profile JSON path.
+    :param guest_profile: Guest profile path prefix.
+    :param trace: Execution trace path.
+    :param jit: Execute through compiled basic blocks.
+    :param frames: Frame budget.
+    :param cycles: Cycle budget.
+    :param inputs: Mapping of frame number to key mask.
+    :param dump_display: Display dump path.
+    :param dump_registers: Register dump path.
+    :param dump_ram: RAM dump path.
+    :return: None.
+    """
+    from chipmul8 import headless
+    from chipmul8.interpreter import Interpreter, StopReason
+
+    cpu = Interpreter(sprite_mode=sprite_mode, seed=seed)
+
+    try:
+        cpu.load_rom(rom_file)
+    except IndexError as e:
+        raise BadParameter(str(e), param_hint="'INPUT_FILE'") from None
+
+    if jit:
+        from chipmul8.jit import BlockCompiler
+
+        BlockCompiler(cpu).attach()
+
+    profiler, guest_profiler = create_profilers(profile=profile, profile_json=profile_json, guest_profile=guest_profile)
+
+    # The host profiler goes first, so it doesn't time the guest profiler's bookkeeping.
+    if profiler is not None:
+        profiler.attach(cpu)
+
+    if guest_profiler is not None:
+        guest_profiler.attach(cpu)
+
+    recorder = create_trace_recorder(trace)
+
+    if recorder is not None:
+        recorder.attach(cpu)
+
+    if profiler is not None:
+        profiler.start_clock()
+
+    reason = headless.run_headless(cpu, frames=frames, cycles=cycles, inputs=inputs, instructions_per_second=ips)
+
+    if recorder is not None:
+        recorder.close()
+
+    write_profiles(profiler, guest_profiler, profile=profile, profile_json=profile_json, guest_profile=guest_profile)
+
+    if dump_display is not None:
+        pixels = cpu.display_memory
+        write_dump(dump_display, headless.format_display(pixels), headless.display_png(pixels, palette))
+
+    if dump_registers is not None:
+        write_dump(dump_registers, headless.format_registers(cpu))
+
+    if dump_ram is not None:
+        memory = cpu.ram.memory
+        write_dump(dump_ram, headless.format_memory(memory), headless.memory_png(memory))
+
+    if reason == StopReason.FAULT:
+        echo(f"Fault executing opcode {cpu.current_op_code:#06x} at {cpu.program_counter:#05x}: {cpu.fault}", err=True)
+        raise Exit(1)
+
+
+@cli.command()
+@option("--frames", type=IntRange(min=0), help="Default number of 60 Hz frames to run each ROM for")
+@option("--cycles", type=IntRange(min=0), help="Default number of instructions to execute per ROM")
+@option("--ips", default=700, type=IntRange(min=1), help="Default instructions executed per second")
+@option(
+    "--sprite_mode",
+    default=SpriteMode.CLIP,
+    type=Choice(SpriteMode, case_sensitive=False),
+    help="Default behaviour of sprites drawn past the edge of the display",
+)
+@option(
+    "--seed",
+    default=0,
+    type=IntRange(min=0, max=2**64 - 1),
+    help="Default seed of the random numbers drawn by each ROM (CXNN)",
+)
+@option("--workers", type=IntRange(min=1), help="Number of worker processes, defaults to one per core")
+@option("--json_lines", is_flag=True, help="Print each result as a JSON object")
+@argument("source", type=PathType(exists=True, path_type=Path))
+def batch(  # noqa: PLR0913
+    *,
+    frames: int | None,
+    cycles: int | None,
+    ips: int,
+    sprite_mode: SpriteMode,
+    seed: int,
+    workers: int | None,
+    json_lines: bool,
+    source: Path,
+) -> None:
+    """
+    Run a directory of ROMs, or a JSON manifest of ROMs, headlessly across a process pool.
+
+    :param frames: Default frame budget.
+    :param cycles: Default cycle budget.
+    :param ips: Default instructions executed per second.
+    :param sprite_mode: Default behaviour of sprites drawn past the edge of the display.
+    :param seed: Default seed of the random numbers drawn by each ROM.
+    :param workers: Number of worker processes.
+    :param json_lines: Print results as JSON.
+    :param source: ROM directory or manifest.
+    :return: None.
+    """
+    import json
+
+    from chipmul8.batch import discover_jobs, load_manifest, run_batch
+
+    load_jobs = discover_jobs if source.is_dir() else load_manifest
+
+    try:
+        jobs = load_jobs(
+            source, frames=frames, cycles=cycles, instructions_per_second=ips, sprite_mode=sprite_mode, seed=seed
+        )
+    except ValueError as e:
+        raise UsageError(str(e)) from None
+
+    faults = 0
+
+    for result in run_batch(jobs, workers=workers):
+        faults += result.fault is not None
+
+        if json_lines:
+            echo(json.dumps({**result._asdict(), "rom": str(result.rom)}))
+        else:
+            echo(
+                f"{result.rom}\t{result.display_hash or '-'}\t{result.cycles}\t{result.wall_time:.3f}s\t"
+                f"{result.fault or 'ok'}"
+            )
+
+    if faults:
+        raise Exit(1)
+
+
+@cli.command()
+@argument("movie_file", type=File("rb"))
+@argument("rom_file", type=File("rb"))
+def replay(*, movie_file: BufferedReader, rom_file: BufferedReader) -> None:
+    """
+    Replay a movie recorded with run --record, headlessly and as fast as possible, verifying its display checkpoints.
+
+    :param movie_file: Movie file.
+    :param rom_file: Rom file the movie was recorded against.
+    :return: None.
+    """
+    import time
+
+    from chipmul8.headless import display_hash
+    from chipmul8.movie import Movie, ReplayDivergedError
+    from chipmul8.movie import replay as replay_movie
+    from chipmul8.scheduler import TIMER_FREQUENCY
+
+    try:
+        movie = Movie.from_bytes(movie_file.read())
+        start = time.perf_counter()
+        cpu = replay_movie(movie, rom_file.read())
+    except ReplayDivergedError as e:
+        echo(str(e), err=True)
+        raise Exit(1) from None
+    except ValueError as e:
+        raise UsageError(str(e)) from None
+
+    elapsed = time.perf_counter() - start
+
+    echo(
+        f"Replayed {len(movie)} frames ({cpu.cycles} cycles) in {elapsed:.3f}s, "
+        f"{len(movie) / TIMER_FREQUENCY / max(elapsed, 1e-9):.0f}x real time"
+    )
+    echo(f"Display: {display_hash(cpu.display_memory)}")
+
+    if cpu.fault is not None:
+        echo(f"Fault executing opcode {cpu.current_op_code:#06x} at {cpu.program_counter:#05x}: {cpu.fault}", err=True)
+        raise Exit(1)
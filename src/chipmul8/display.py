@@ -0,0 +1,539 @@
+"""
+CHIP-8 framebuffers.
+
+The interpreter draws through a framebuffer backend: either a byte per pixel NumPy array, or one 64-bit integer per row
+which is expanded to pixels only when a consumer asks for them. Either can be bound to external storage, which is how
+the display becomes part of an interpreter's state block. SwapBuffer hands displays between threads.
+"""
+
+from __future__ import annotations
+
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from enum import StrEnum
+from typing import TYPE_CHECKING, ClassVar, Final
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import numpy.typing as npt
+
+DISPLAY_WIDTH: Final = 64
+DISPLAY_HEIGHT: Final = 32
+
+_row_mask: Final = (1 << DISPLAY_WIDTH) - 1
+
+# Dirty row mask with every display row set.
+ALL_ROWS: Final = (1 << DISPLAY_HEIGHT) - 1
+
+Color = tuple[int, int, int]
+
+# Colours of pixels that are off and on.
+DEFAULT_PALETTE: Final[tuple[Color, Color]] = ((255, 255, 255), (0, 0, 0))
+
+
+class SpriteMode(StrEnum):
+    """
+    Behaviour of sprite pixels drawn past the edge of the display.
+
+    In both modes the starting coordinate wraps around the display.
+    """
+
+    # Pixels past the edge are discarded.
+    CLIP = "clip"
+    # Pixels past the edge are drawn on the opposite side of the display.
+    WRAP = "wrap"
+
+
+def palette_lut(palette: tuple[Color, Color]) -> npt.NDArray[np.uint8]:
+    """
+    Build a lookup table converting pixels into RGB colours.
+
+    :param palette: Colours of pixels that are off and on.
+    :return: 2x3 table indexed by pixel value.
+    """
+    return np.array(palette, dtype=np.uint8)
+
+
+def render_rgb(
+    pixels: npt.NDArray[np.int8],
+    lut: npt.NDArray[np.uint8],
+    out: npt.NDArray[np.uint8],
+    start: int = 0,
+    stop: int = DISPLAY_HEIGHT,
+) -> npt.NDArray[np.uint8]:
+    """
+    Convert display pixels into RGB rows, bottom row first (the order OpenGL expects).
+
+    :param pixels: Display pixels, indexed [y, -x - 1].
+    :param lut: Lookup table from palette_lut.
+    :param out: 32x64x3 buffer the colours are written into.
+    :param start: First display row to convert.
+    :param stop: Display row following the last row to convert.
+    :return: The out buffer.
+    """
+    np.take(lut, pixels[start:stop][::-1, ::-1], axis=0, out=out[DISPLAY_HEIGHT - stop : DISPLAY_HEIGHT - start])
+    return out
+
+
+def dirty_row_runs(dirty_rows: int) -> list[tuple[int, int]]:
+    """
+    Split a dirty row mask into runs of consecutive rows.
+
+    :param dirty_rows: Mask with bit N set if display row N changed.
+    :return: (first row, row following the last row) of each run, top to bottom.
+    """
+    runs = []
+    row = 0
+
+    while dirty_rows:
+        # Skip clean rows, then measure the run of dirty rows that follows.
+        clean = (dirty_rows & -dirty_rows).bit_length() - 1
+        dirty_rows >>= clean
+        row += clean
+
+        length = (~dirty_rows & (dirty_rows + 1)).bit_length() - 1
+        dirty_rows >>= length
+        runs.append((row, row + length))
+        row += length
+
+    return runs
+
+
+class Framebuffer(ABC):
+    """
+    Monochrome 64x32 display.
+    """
+
+    # Number of bytes of storage the display occupies, see bind.
+    storage_size: ClassVar[int]
+
+    @abstractmethod
+    def clear(self) -> None:
+        """
+        Turn every pixel off.
+
+        :return: None.
+        """
+
+    @abstractmethod
+    def draw_sprite(  # noqa: PLR0913
+        self,
+        x: int,
+        y: int,
+        sprite: bytes | bytearray | memoryview,
+        mode: SpriteMode,
+        *,
+        start: int = 0,
+        height: int | None = None,
+    ) -> bool:
+        """
+        XOR an 8 pixel wide sprite onto the display.
+
+        Sprites can be drawn straight out of memory (start and height select the rows), without copying them.
+
+        :param x: X coordinate of the sprite's left edge, within the display.
+        :param y: Y coordinate of the sprite's top edge, within the display.
+        :param sprite: Sprite rows, the most significant bit of each row is its leftmost pixel.
+        :param mode: Behaviour of pixels drawn past the edge of the display.
+        :param start: Index of the sprite's first row.
+        :param height: Number of rows, defaults to every row from start.
+        :return: True if any pixel was turned off.
+        """
+
+    @abstractmethod
+    def to_array(self) -> npt.NDArray[np.int8]:
+        """
+        Display pixels, indexed [y, -x - 1] (each row is stored mirrored).
+
+        :return: 32x64 array of 0 / 1 pixels.
+        """
+
+    @abstractmethod
+    def to_bytes(self) -> bytes:
+        """
+        Serialise the display, 8 pixels per byte with the most significant bit leftmost, top row first.
+
+        Every backend uses the same layout, so displays can be moved between backends.
+
+        :return: Packed display rows.
+        """
+
+    @abstractmethod
+    def load_bytes(self, data: bytes | bytearray | memoryview) -> None:
+        """
+        Restore a display serialised by to_bytes.
+
+        :param data: Packed display rows.
+        :return: None.
+        """
+
+    @abstractmethod
+    def copy(self) -> Framebuffer:
+        """
+        Create an independent copy of the display.
+
+        :return: Framebuffer of the same type holding the same pixels.
+        """
+
+    @abstractmethod
+    def bind(self, storage: memoryview, *, adopt: bool = False) -> None:
+        """
+        Move the display into external storage (e.g. part of an interpreter's state block), keeping its pixels.
+
+        :param storage: Byte view of storage_size bytes, drawn into directly from then on.
+        :param adopt: Take on the pixels already in the storage instead, e.g. to view a display shared by another
+            process without writing to it.
+        :return: None.
+        """
+
+
+class ArrayFramebuffer(Framebuffer):
+    """
+    Framebuffer storing a byte per pixel.
+    """
+
+    storage_size: ClassVar[int] = DISPLAY_HEIGHT * DISPLAY_WIDTH
+
+    def __init__(self) -> None:
+        """
+        Initialise a blank display.
+        """
+        # Pixels are drawn through the buffer, NumPy views the same memory.
+        self.buffer: bytearray | memoryview = bytearray(self.storage_size)
+        self.pixels = np.frombuffer(self.buffer, dtype=np.int8).reshape(DISPLAY_HEIGHT, DISPLAY_WIDTH)
+
+    def clear(self) -> None:
+        """
+        Turn every pixel off.
+
+        :return: None.
+        """
+        self.pixels.fill(0)
+
+    def draw_sprite(  # noqa: PLR0913
+        self,
+        x: int,
+        y: int,
+        sprite: bytes | bytearray | memoryview,
+        mode: SpriteMode,
+        *,
+        start: int = 0,
+        height: int | None = None,
+    ) -> bool:
+        """
+        XOR an 8 pixel wide sprite onto the display.
+
+        Sprites can be drawn straight out of memory (start and height select the rows), without copying them.
+
+        :param x: X coordinate of the sprite's left edge, within the display.
+        :param y: Y coordinate of the sprite's top edge, within the display.
+        :param sprite: Sprite rows, the most significant bit of each row is its leftmost pixel.
+        :param mode: Behaviour of pixels drawn past the edge of the display.
+        :param start: Index of the sprite's first row.
+        :param height: Number of rows, defaults to every row from start.
+        :return: True if any pixel was turned off.
+        """
+        if height is None:
+            height = len(sprite) - start
+
+        pixels = self.buffer
+        wrap = mode == SpriteMode.WRAP
+        collision = 0
+        index = 0
+
+        # Plain integer arithmetic on the pixel bytes, sprites are too small to amortise NumPy's overhead.
+        while index < height:
+            row = y + index
+
+            if row >= DISPLAY_HEIGHT:
+                if not wrap:
+                    break
+
+                row -= DISPLAY_HEIGHT
+
+            # Rows are stored mirrored, column c of the row is at offset DISPLAY_WIDTH - 1 - c.
+            end = (row + 1) * DISPLAY_WIDTH - 1
+            bits = sprite[start + index]
+            column = x
+
+            while bits:
+                if bits & 0x80:
+                    if column >= DISPLAY_WIDTH:
+                        if not wrap:
+                            break
+
+                        column -= DISPLAY_WIDTH
+
+                    collision |= pixels[end - column]
+                    pixels[end - column] ^= 1
+
+                bits = (bits << 1) & 0xFF
+                column += 1
+
+            index += 1
+
+        return collision != 0
+
+    def to_array(self) -> npt.NDArray[np.int8]:
+        """
+        Display pixels, indexed [y, -x - 1] (each row is stored mirrored).
+
+        The returned array is the framebuffer's own storage.
+
+        :return: 32x64 array of 0 / 1 pixels.
+        """
+        return self.pixels
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialise the display, 8 pixels per byte with the most significant bit leftmost, top row first.
+
+        :return: Packed display rows.
+        """
+        return np.packbits(self.pixels[:, ::-1], axis=1).tobytes()
+
+    def load_bytes(self, data: bytes | bytearray | memoryview) -> None:
+        """
+        Restore a display serialised by to_bytes.
+
+        :param data: Packed display rows.
+        :return: None.
+        """
+        pixels = np.unpackbits(np.frombuffer(data, dtype=np.uint8)).reshape(DISPLAY_HEIGHT, DISPLAY_WIDTH)
+        self.pixels[:] = pixels[:, ::-1]
+
+    def copy(self) -> ArrayFramebuffer:
+        """
+        Create an independent copy of the display.
+
+        :return: Framebuffer holding the same pixels.
+        """
+        clone = ArrayFramebuffer.__new__(ArrayFramebuffer)
+        clone.buffer = bytearray(self.buffer)
+        clone.pixels = np.frombuffer(clone.buffer, dtype=np.int8).reshape(DISPLAY_HEIGHT, DISPLAY_WIDTH)
+
+        return clone
+
+    def bind(self, storage: memoryview, *, adopt: bool = False) -> None:
+        """
+        Move the display into external storage (e.g. part of an interpreter's state block), keeping its pixels.
+
+        :param storage: Byte view of storage_size bytes, drawn into directly from then on.
+        :param adopt: Take on the pixels already in the storage instead, e.g. to view a display shared by another
+            process without writing to it.
+        :return: None.
+        """
+        if not adopt:
+            storage[:] = self.buffer
+
+        self.buffer = storage
+        self.pixels = np.frombuffer(storage, dtype=np.int8).reshape(DISPLAY_HEIGHT, DISPLAY_WIDTH)
+
+
+class PackedFramebuffer(Framebuffer):
+    """
+    Framebuffer storing each row as a 64-bit integer, the most significant bit being the leftmost pixel.
+    """
+
+    storage_size: ClassVar[int] = DISPLAY_HEIGHT * 8
+
+    def __init__(self) -> None:
+        """
+        Initialise a blank display.
+        """
+        self.rows: array[int] | memoryview = array("Q", bytes(self.storage_size))
+        self._blank = array("Q", bytes(DISPLAY_HEIGHT * 8))
+
+    def clear(self) -> None:
+        """
+        Turn every pixel off.
+
+        :return: None.
+        """
+        self.rows[:] = self._blank
+
+    def draw_sprite(  # noqa: PLR0913
+        self,
+        x: int,
+        y: int,
+        sprite: bytes | bytearray | memoryview,
+        mode: SpriteMode,
+        *,
+        start: int = 0,
+        height: int | None = None,
+    ) -> bool:
+        """
+        XOR an 8 pixel wide sprite onto the display.
+
+        Sprites can be drawn straight out of memory (start and height select the rows), without copying them.
+
+        :param x: X coordinate of the sprite's left edge, within the display.
+        :param y: Y coordinate of the sprite's top edge, within the display.
+        :param sprite: Sprite rows, the most significant bit of each row is its leftmost pixel.
+        :param mode: Behaviour of pixels drawn past the edge of the display.
+        :param start: Index of the sprite's first row.
+        :param height: Number of rows, defaults to every row from start.
+        :return: True if any pixel was turned off.
+        """
+        if height is None:
+            height = len(sprite) - start
+
+        rows = self.rows
+        collision = 0
+        wrap = mode == SpriteMode.WRAP
+        index = 0
+
+        while index < height:
+            row = y + index
+
+            if row >= DISPLAY_HEIGHT:
+                if not wrap:
+                    break
+
+                row -= DISPLAY_HEIGHT
+
+            # Align the sprite with the left edge, then move it right by x (rotating if wrapping).
+            value = sprite[start + index] << (DISPLAY_WIDTH - 8)
+            shifted = value >> x
+
+            if wrap and x:
+                shifted |= (value << (DISPLAY_WIDTH - x)) & _row_mask
+
+            collision |= rows[row] & shifted
+            rows[row] ^= shifted
+            index += 1
+
+        return collision != 0
+
+    def to_array(self) -> npt.NDArray[np.int8]:
+        """
+        Display pixels, indexed [y, -x - 1] (each row is stored mirrored).
+
+        The returned array is a copy expanded from the packed rows.
+
+        :return: 32x64 array of 0 / 1 pixels.
+        """
+        packed = np.frombuffer(self.rows, dtype=np.uint64).astype(">u8").view(np.uint8)
+        pixels = np.unpackbits(packed).reshape(DISPLAY_HEIGHT, DISPLAY_WIDTH)
+
+        return pixels[:, ::-1].astype(np.int8)
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialise the display, 8 pixels per byte with the most significant bit leftmost, top row first.
+
+        :return: Packed display rows.
+        """
+        return np.frombuffer(self.rows, dtype=np.uint64).astype(">u8").tobytes()
+
+    def load_bytes(self, data: bytes | bytearray | memoryview) -> None:
+        """
+        Restore a display serialised by to_bytes.
+
+        :param data: Packed display rows.
+        :return: None.
+        """
+        self.rows[:] = array("Q", np.frombuffer(data, dtype=">u8").astype(np.uint64).tobytes())
+
+    def copy(self) -> PackedFramebuffer:
+        """
+        Create an independent copy of the display.
+
+        :return: Framebuffer holding the same pixels.
+        """
+        clone = PackedFramebuffer.__new__(PackedFramebuffer)
+        clone.rows = array("Q", self.rows)
+        clone._blank = self._blank  # noqa: SLF001
+
+        return clone
+
+    def bind(self, storage: memoryview, *, adopt: bool = False) -> None:
+        """
+        Move the display into external storage (e.g. part of an interpreter's state block), keeping its pixels.
+
+        :param storage: Byte view of storage_size bytes, aligned to 8 bytes, drawn into directly from then on.
+        :param adopt: Take on the pixels already in the storage instead, e.g. to view a display shared by another
+            process without writing to it.
+        :return: None.
+        """
+        rows = storage.cast("Q")
+
+        if not adopt:
+            rows[:] = self.rows
+
+        self.rows = rows
+
+
+class SwapBuffer:
+    """
+    Hands completed frames from the thread running an interpreter to the thread presenting them.
+
+    The interpreter thread copies each frame into the pending buffer, the presenting thread swaps it for the buffer it
+    presented last. Neither holds the lock for longer than copying a display, so presenting (e.g. a flip blocking on
+    vsync) never stalls the interpreter. Frames published faster than they're taken replace each other, their dirty
+    rows accumulating.
+    """
+
+    def __init__(self, framebuffer_type: type[Framebuffer] = ArrayFramebuffer) -> None:
+        """
+        :param framebuffer_type: Display backend of the interpreter.
+        """
+        size = framebuffer_type.storage_size
+
+        # Pending buffer first, then the buffer taken last.
+        self.buffers = [memoryview(bytearray(size)), memoryview(bytearray(size))]
+        self.framebuffers: list[Framebuffer] = []
+
+        for buffer in self.buffers:
+            framebuffer = framebuffer_type()
+            framebuffer.bind(buffer, adopt=True)
+            self.framebuffers.append(framebuffer)
+
+        self.dirty_rows = 0
+        self.pending = False
+        self.ready = threading.Condition()
+
+    def publish(self, display: bytes | bytearray | memoryview, dirty_rows: int) -> None:
+        """
+        Publish a frame, replacing the pending frame if it hasn't been taken yet.
+
+        :param display: Display storage, in the framebuffer backend's layout.
+        :param dirty_rows: Rows changed since the last frame published.
+        :return: None.
+        """
+        with self.ready:
+            self.buffers[0][:] = display
+            self.dirty_rows |= dirty_rows
+            self.pending = True
+            self.ready.notify()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        Wait for a frame to be published.
+
+        :param timeout: Seconds to wait at most, None waits indefinitely.
+        :return: True if a frame is pending.
+        """
+        with self.ready:
+            return self.ready.wait_for(lambda: self.pending, timeout)
+
+    def take(self) -> tuple[Framebuffer, int] | None:
+        """
+        Take the pending frame, it stays valid until the next one is taken.
+
+        :return: The frame's display and the rows changed since the frame taken before it, None if none is pending.
+        """
+        with self.ready:
+            if not self.pending:
+                return None
+
+            self.buffers.reverse()
+            self.framebuffers.reverse()
+
+            dirty_rows = self.dirty_rows
+            self.dirty_rows = 0
+            self.pending = False
+
+        return self.framebuffers[1], dirty_rows
@@ -4,22 +4,60 @@ Emulator game engine.
 
 from __future__ import annotations
 
+import threading
+from abc import ABC, abstractmethod
 from pathlib import Path
 from types import MappingProxyType
 from typing import TYPE_CHECKING, Final
 
+import numpy as np
 import pygame
-from OpenGL.GL import GL_COLOR_BUFFER_BIT, GL_RGB, GL_UNSIGNED_BYTE, glClear, glClearColor, glDrawPixels
-from pygame.locals import K_1, K_2, K_3, K_4, K_a, K_c, K_d, K_e, K_f, K_q, K_r, K_s, K_v, K_w, K_x, K_z
+from pygame.locals import (
+    K_1,
+    K_2,
+    K_3,
+    K_4,
+    K_BACKSPACE,
+    K_TAB,
+    K_a,
+    K_c,
+    K_d,
+    K_e,
+    K_f,
+    K_q,
+    K_r,
+    K_s,
+    K_v,
+    K_w,
+    K_x,
+    K_z,
+)
 
-from chipmul8.interpreter import Interpreter
+from chipmul8.display import (
+    ALL_ROWS,
+    DEFAULT_PALETTE,
+    Color,
+    SpriteMode,
+    SwapBuffer,
+    dirty_row_runs,
+    palette_lut,
+    render_rgb,
+)
+from chipmul8.interpreter import SAVE_STATE_RANDOM_SIZE, STATE_DISPLAY, Interpreter, StopReason
+from chipmul8.renderer import TextureRenderer
+from chipmul8.rewind import RewindBuffer
+from chipmul8.scheduler import TIMER_FREQUENCY, FrameScheduler
+from chipmul8.shared import MachineStatus
 
 if TYPE_CHECKING:
+    from collections.abc import Sequence
     from io import BufferedReader
 
-    import numpy as np
     import numpy.typing as npt
 
+    from chipmul8.movie import Movie
+    from chipmul8.shared import SharedMachine
+
 # fmt: off
 keymap: Final = MappingProxyType(
     {
@@ -35,46 +73,61 @@ keymap: Final = MappingProxyType(
 )
 # fmt: on
 
+# Held to step back through the rewind buffer, one frame per frame.
+REWIND_KEY: Final = K_BACKSPACE
+
+# Cycles through the machines presented by a RemoteGameEngine.
+NEXT_MACHINE_KEY: Final = K_TAB
+
+
+class EngineBase(ABC):
+    """
+    Window, renderer and event handling shared by the game engines.
+    """
 
-class GameEngine:
     clock: pygame.time.Clock
 
-    def __init__(self, rom_file: BufferedReader, invert_colors: bool = False) -> None:
+    def __init__(
+        self,
+        rom_name: str,
+        invert_colors: bool,
+        *,
+        palette: tuple[Color, Color],
+        use_pixel_buffer: bool,
+        scheduler: FrameScheduler,
+    ) -> None:
         """
-        Initialise the game engine.
+        Initialise the window and renderer state, before the window is created.
 
-        :param rom_file: Rom file.
+        :param rom_name: Window title.
         :param invert_colors: Invert display colour flag
+        :param palette: Colours of pixels that are off and on.
+        :param use_pixel_buffer: Upload frames to the GPU through a pixel buffer object.
+        :param scheduler: Scheduler pacing the game loop.
         """
         self.display_width: int = 64
         self.display_height: int = 32
         self.pixel_size: int = 10
 
-        self._invert_colors = invert_colors
-
-        Interpreter.initialize()
-        self.cpu = Interpreter()
-
-        rom_path = Path(rom_file.name)
-
-        self.cpu.load_rom(rom_file)
-
-        self.rom_name = rom_path.name[: len(rom_path.suffix) + 2]
+        # Inverting colours swaps the off and on entries of the palette.
+        self.palette = palette_lut(palette[::-1] if invert_colors else palette)
+        self.rom_name = rom_name
 
         self.window: pygame.Surface | None = None
         self.started = False
 
-        self.temp_display = bytearray(self.display_width * self.display_height * 3)
+        self.renderer = TextureRenderer(self.display_width, self.display_height, use_pixel_buffer=use_pixel_buffer)
+        self.rgb_display = np.zeros(shape=(self.display_height, self.display_width, 3), dtype=np.uint8)
+        self.scheduler = scheduler
 
     @property
+    @abstractmethod
     def display(self) -> npt.NDArray[np.int8]:
         """
-        Retrieve interpreter display buffer.
+        Retrieve the display presented.
 
-        :return: Interpreter display buffer.
-        :rtype: ndarray
+        :return: Display buffer.
         """
-        return self.cpu.display_memory
 
     def create_window(self) -> None:
         """
@@ -84,25 +137,191 @@ class GameEngine:
         """
         pygame.init()
 
-        self.window = pygame.display.set_mode(
-            (self.display_width, self.display_height), pygame.DOUBLEBUF | pygame.OPENGL | pygame.RESIZABLE
-        )
+        window_size = (self.display_width * self.pixel_size, self.display_height * self.pixel_size)
+
+        self.window = pygame.display.set_mode(window_size, pygame.DOUBLEBUF | pygame.OPENGL | pygame.RESIZABLE)
 
         pygame.display.set_caption(self.rom_name)
 
+        self.renderer.create(*window_size)
+
         self.clock = pygame.time.Clock()
 
-    def _pixel_color(self, value: int) -> int:
+    @abstractmethod
+    def draw(self) -> None:
         """
-        Determine pixel colour.
+        Present the latest frame, if it changed.
 
-        :param value: Interpreter display pixel (1 if filled, 0 is not filled).
-        :return: Pixel colour value.
+        :return: None.
         """
-        if self._invert_colors:
-            return 255 if value == 1 else 0
 
-        return 0 if value == 1 else 255
+    def render(self, display: npt.NDArray[np.int8], dirty_rows: int) -> None:
+        """
+        Upload the rows of a display changed since the last frame was presented, and present it.
+
+        :param display: Display pixels.
+        :param dirty_rows: Rows changed since the last frame was presented.
+        :return: None.
+        """
+        # Only convert and upload the rows changed since the last frame was presented.
+        for start, stop in dirty_row_runs(dirty_rows):
+            render_rgb(display, self.palette, self.rgb_display, start, stop)
+            self.renderer.upload(self.rgb_display, start, stop)
+
+        self.renderer.present()
+
+        # Update display.
+        pygame.display.flip()
+
+    def resize(self, width: int, height: int) -> None:
+        """
+        Scale the display to a resized window.
+
+        :param width: Window width in pixels.
+        :param height: Window height in pixels.
+        :return: None.
+        """
+        self.renderer.resize(width, height)
+
+        # Re-present the last frame, the texture still holds it.
+        self.renderer.present()
+        pygame.display.flip()
+
+    @abstractmethod
+    def _key(self, key: int, down: bool = True) -> None:
+        """
+        Handle key press.
+
+        :param key: Key on which the event was registered.
+        :param down: Flag indicating whether the key registered was registered on the up or down stroke.
+        :return: None.
+        """
+
+    def handle_event(self, event: pygame.event.Event) -> bool:
+        """
+        Handle a window event.
+
+        :param event: Event to handle.
+        :return: False once the window has been closed.
+        """
+        if event.type == pygame.QUIT:
+            pygame.display.quit()
+            pygame.quit()
+            return False
+
+        if event.type == pygame.VIDEORESIZE:
+            self.resize(event.w, event.h)
+        elif event.type == pygame.KEYDOWN:
+            self._key(event.key)
+        elif event.type == pygame.KEYUP:
+            self._key(event.key, down=False)
+
+        return True
+
+    def poll_events(self, *, idle: bool) -> list[pygame.event.Event]:
+        """
+        Retrieve pending window events.
+
+        :param idle: Only input can change the machine, block until an event arrives rather than returning none.
+        :return: Events.
+        """
+        events = pygame.event.get()
+
+        if idle and not events:
+            events = [pygame.event.wait()]
+            self.scheduler.resume()
+
+        return events
+
+    @abstractmethod
+    def start(self) -> None:
+        """
+        Start the game loop, returning once the window is closed.
+
+        :return: None.
+        """
+
+
+class GameEngine(EngineBase):
+    """
+    Runs an interpreter in a window.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        rom_file: BufferedReader,
+        invert_colors: bool = False,
+        *,
+        instructions_per_second: int = 700,
+        sprite_mode: SpriteMode = SpriteMode.CLIP,
+        palette: tuple[Color, Color] = DEFAULT_PALETTE,
+        use_pixel_buffer: bool = False,
+        rewind_seconds: int = 300,
+        seed: int | None = None,
+        movie: Movie | None = None,
+        threaded: bool = False,
+    ) -> None:
+        """
+        Initialise the game engine.
+
+        :param rom_file: Rom file.
+        :param invert_colors: Invert display colour flag
+        :param instructions_per_second: Interpreter speed.
+        :param sprite_mode: Behaviour of sprites drawn past the edge of the display.
+        :param palette: Colours of pixels that are off and on.
+        :param use_pixel_buffer: Upload frames to the GPU through a pixel buffer object.
+        :param rewind_seconds: Seconds of play kept for rewinding, 0 disables rewinding.
+        :param seed: Seed of the random numbers drawn by CXNN.
+        :param movie: Movie to record every frame into, it must have been created with the same seed.
+        :param threaded: Run the interpreter on its own thread, handing frames to the main thread to present.
+        """
+        rom_path = Path(rom_file.name)
+
+        super().__init__(
+            rom_path.name[: len(rom_path.suffix) + 2],
+            invert_colors,
+            palette=palette,
+            use_pixel_buffer=use_pixel_buffer,
+            scheduler=FrameScheduler(instructions_per_second),
+        )
+
+        self.instructions_per_second = instructions_per_second
+
+        Interpreter.initialize()
+        self.cpu = Interpreter(sprite_mode=sprite_mode, seed=seed)
+
+        self.cpu.load_rom(rom_file)
+
+        # Keys held and whether the rewind key is, as of the last event. Only applied to the machine at the start of a
+        # frame, so a threaded interpreter never sees keys change mid-frame, which movies and rewinding couldn't
+        # reproduce. Written by the main thread alone, as whole ints and bools.
+        self.key_mask = 0
+        self.rewind_held = False
+
+        # A save state is captured at the start of every frame while not rewinding.
+        self.rewind = RewindBuffer(rewind_seconds * TIMER_FREQUENCY, tail_size=SAVE_STATE_RANDOM_SIZE)
+        self.rewinding = False
+
+        # Number of frames executed, less those rewound.
+        self.frame = 0
+        self.movie = movie
+
+        # Threaded, the interpreter thread publishes frames here. Key events wake it while idle, and it stores the
+        # exception it stopped on for the main thread to raise.
+        self.swap = SwapBuffer(type(self.cpu.framebuffer)) if threaded else None
+        self.woken = threading.Event()
+        self.stopped = threading.Event()
+        self.error: Exception | None = None
+
+    @property
+    def display(self) -> npt.NDArray[np.int8]:
+        """
+        Retrieve interpreter display buffer.
+
+        :return: Interpreter display buffer.
+        :rtype: ndarray
+        """
+        return self.cpu.display_memory
 
     def draw(self) -> None:
         """
@@ -110,27 +329,24 @@ class GameEngine:
 
         :return: None.
         """
-        if self.cpu.frame_ready:
-            for index, value in enumerate(reversed(self.display.ravel())):
-                r = index * 3
-                g = r + 1
-                b = r + 2
+        if self.swap is not None:
+            frame = self.swap.take()
 
-                pixel_color = self._pixel_color(value)
+            if frame is not None:
+                framebuffer, dirty_rows = frame
+                self.render(framebuffer.to_array(), dirty_rows)
 
-                self.temp_display[r] = pixel_color
-                self.temp_display[g] = pixel_color
-                self.temp_display[b] = pixel_color
+            return
 
-            glClearColor(0, 0, 0, 1)
-            glClear(GL_COLOR_BUFFER_BIT)
+        self.cpu.frame_ready = False
 
-            glDrawPixels(*(self.display_width, self.display_height), GL_RGB, GL_UNSIGNED_BYTE, self.temp_display)
+        if not self.cpu.dirty_rows:
+            # Nothing changed since the last frame was presented.
+            return
 
-            # Update display.
-            pygame.display.flip()
+        self.render(self.display, self.cpu.dirty_rows)
 
-            self.cpu.frame_ready = False
+        self.cpu.dirty_rows = 0
 
     def _key(self, key: int, down: bool = True) -> None:
         """
@@ -141,7 +357,36 @@ class GameEngine:
         :return: None.
         """
         if key in keymap:
-            self.cpu.keyboard[keymap[key]] = down
+            bit = 1 << keymap[key]
+            self.key_mask = self.key_mask | bit if down else self.key_mask & ~bit
+        elif key == REWIND_KEY:
+            self.rewind_held = down
+
+        # An idle interpreter thread waits on input.
+        self.woken.set()
+
+    def rewind_frame(self) -> bool:
+        """
+        Restore the state captured at the start of the previous frame, if any remain.
+
+        :return: True if a frame was rewound.
+        """
+        state = self.rewind.pop()
+
+        if state is None:
+            return False
+
+        self.cpu.load_state(state)
+        # Keep the keys that are physically held, rather than those held when the state was captured.
+        self.cpu.key_mask = self.key_mask
+        self.cpu.dirty_rows = ALL_ROWS
+
+        self.frame -= 1
+
+        if self.movie is not None:
+            self.movie.truncate(self.frame)
+
+        return True
 
     def start(self) -> None:
         """
@@ -149,20 +394,271 @@ class GameEngine:
 
         :return: None.
         """
-        while True:
-            # Trigger an interpreter cycle to process the next instruction.
-            self.cpu.emulate()
+        if self.swap is not None:
+            self.start_threaded(self.swap)
+            return
+
+        scheduler = self.scheduler
+        scheduler.resume()
+        idle = False
 
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.display.quit()
-                    pygame.quit()
+        while True:
+            for event in self.poll_events(idle=idle):
+                if not self.handle_event(event):
                     return
-                elif event.type == pygame.VIDEORESIZE:
-                    print(event.size)
-                elif event.type == pygame.KEYDOWN:
-                    self._key(event.key)
-                elif event.type == pygame.KEYUP:
-                    self._key(event.key, down=False)
+
+            idle = self.emulate_frame()
 
             self.draw()
+
+            scheduler.wait()
+
+    def emulate_frame(self) -> bool:
+        """
+        Rewind a frame while rewinding, otherwise execute one.
+
+        :return: True if only input can change the machine now.
+        """
+        key_mask = self.key_mask
+
+        # Only rebuild the keyboard when the held keys change.
+        if key_mask != self.cpu.key_mask:
+            self.cpu.key_mask = key_mask
+
+        self.rewinding = self.rewind_held
+
+        if self.rewinding:
+            if self.rewind_frame():
+                # Rates which aren't a multiple of 60 vary the cycles per frame, replay the rewound frames' share.
+                self.scheduler.frame = self.frame
+
+            return False
+
+        if self.rewind.capacity:
+            self.rewind.push(self.cpu.save_state())
+
+        # Execute a frame worth of instructions, the display is presented at most once per frame.
+        reason = self.cpu.run_frame(self.scheduler.cycles_for_next_frame())
+        self.frame += 1
+
+        # Faulting frames are recorded too, so the movie reproduces the fault.
+        if self.movie is not None:
+            self.movie.record_frame(self.cpu)
+
+        if reason == StopReason.FAULT:
+            msg = f"Executing opcode: {hex(self.cpu.current_op_code)}: {self.cpu.fault}"
+            raise RuntimeError(msg) from self.cpu.fault
+
+        # Waiting on a key, or looping idle, with no delay timer left to count down.
+        return reason in (StopReason.IDLE, StopReason.KEY_WAIT) and not self.cpu.delay_register
+
+    def start_threaded(self, swap: SwapBuffer) -> None:
+        """
+        Game loop with the interpreter on its own thread: the main thread, which owns the window and its OpenGL
+        context, handles events and presents the frames published to the swap buffer.
+
+        :param swap: Swap buffer the interpreter thread publishes to.
+        :return: None.
+        """
+        thread = threading.Thread(target=self.emulate, args=(swap,), name="chipmul8-interpreter", daemon=True)
+        thread.start()
+
+        try:
+            while thread.is_alive():
+                for event in self.poll_events(idle=False):
+                    if not self.handle_event(event):
+                        return
+
+                # Sleep until a frame is published, waking at 60 Hz regardless to poll events.
+                if swap.wait(1 / TIMER_FREQUENCY):
+                    self.draw()
+        finally:
+            self.stopped.set()
+            self.woken.set()
+            thread.join()
+
+        if self.error is not None:
+            raise self.error
+
+    def emulate(self, swap: SwapBuffer) -> None:
+        """
+        Interpreter thread: execute frames at the scheduled rate until stopped, publishing each one that changed the
+        display.
+
+        :param swap: Swap buffer to publish frames to.
+        :return: None.
+        """
+        scheduler = self.scheduler
+        scheduler.resume()
+
+        try:
+            while not self.stopped.is_set():
+                # Cleared before running, so a key pressed during the frame wakes the wait below.
+                self.woken.clear()
+
+                idle = self.emulate_frame()
+
+                if self.cpu.dirty_rows:
+                    swap.publish(memoryview(self.cpu.state)[STATE_DISPLAY:], self.cpu.dirty_rows)
+                    self.cpu.dirty_rows = 0
+
+                self.cpu.frame_ready = False
+
+                if idle:
+                    self.woken.wait()
+                    scheduler.resume()
+                else:
+                    scheduler.wait()
+        except Exception as e:
+            self.error = e
+
+
+class RemoteGameEngine(EngineBase):
+    """
+    Presents interpreters running in other processes and sends them keys, through shared memory (see chipmul8.shared).
+
+    Tab cycles through the machines, keys go to the one shown.
+    """
+
+    def __init__(
+        self,
+        machines: Sequence[SharedMachine],
+        rom_name: str,
+        invert_colors: bool = False,
+        *,
+        palette: tuple[Color, Color] = DEFAULT_PALETTE,
+        use_pixel_buffer: bool = False,
+    ) -> None:
+        """
+        Initialise the game engine.
+
+        :param machines: Shared machines to present, their interpreter processes are started by the caller.
+        :param rom_name: Window title.
+        :param invert_colors: Invert display colour flag
+        :param palette: Colours of pixels that are off and on.
+        :param use_pixel_buffer: Upload frames to the GPU through a pixel buffer object.
+        """
+        # Frames are presented at most once per 60 Hz frame, the interpreters pace themselves.
+        super().__init__(
+            rom_name, invert_colors, palette=palette, use_pixel_buffer=use_pixel_buffer, scheduler=FrameScheduler()
+        )
+
+        self.machines = machines
+        self.current = 0
+        self.key_mask = 0
+
+        # Frame of the machine shown held by the texture, -1 uploads the next frame whole.
+        self.presented = -1
+
+    @property
+    def display(self) -> npt.NDArray[np.int8]:
+        """
+        Retrieve the display of the machine shown, as last published.
+
+        :return: Display buffer.
+        """
+        machine = self.machines[self.current]
+
+        return machine.frame(machine.published)[0].to_array()
+
+    def create_window(self) -> None:
+        """
+        Create game window.
+
+        :return: None.
+        """
+        super().create_window()
+        self.show_machine(self.current)
+
+    def show_machine(self, index: int) -> None:
+        """
+        Present another machine, moving the keys held over to it.
+
+        :param index: Index of the machine.
+        :return: None.
+        """
+        self.machines[self.current].key_mask = 0
+        self.current = index
+        self.machines[index].key_mask = self.key_mask
+        self.presented = -1
+
+        if len(self.machines) > 1:
+            pygame.display.set_caption(f"{self.rom_name} [{index + 1}/{len(self.machines)}]")
+
+    def draw(self) -> None:
+        """
+        Render the latest frame published by the machine shown to the game screen.
+
+        :return: None.
+        """
+        machine = self.machines[self.current]
+        frame = machine.published
+
+        if not frame or frame == self.presented:
+            # Nothing changed since the last frame was presented.
+            return
+
+        framebuffer, dirty_rows = machine.frame(frame)
+
+        if frame != self.presented + 1:
+            # Frames were skipped, only the changes of the last one are known.
+            dirty_rows = ALL_ROWS
+
+        display = framebuffer.to_array()
+
+        for start, stop in dirty_row_runs(dirty_rows):
+            render_rgb(display, self.palette, self.rgb_display, start, stop)
+            self.renderer.upload(self.rgb_display, start, stop)
+
+        if machine.overwritten(frame):
+            # The interpreter lapped the frame while it was read, upload the next one whole instead.
+            self.presented = -1
+            return
+
+        self.presented = frame
+        self.renderer.present()
+
+        # Update display.
+        pygame.display.flip()
+
+    def _key(self, key: int, down: bool = True) -> None:
+        """
+        Handle key press.
+
+        :param key: Key on which the event was registered.
+        :param down: Flag indicating whether the key registered was registered on the up or down stroke.
+        :return: None.
+        """
+        if key in keymap:
+            bit = 1 << keymap[key]
+            self.key_mask = self.key_mask | bit if down else self.key_mask & ~bit
+            self.machines[self.current].key_mask = self.key_mask
+        elif key == NEXT_MACHINE_KEY and down:
+            self.show_machine((self.current + 1) % len(self.machines))
+
+    def start(self) -> None:
+        """
+        Start the game loop, asking every interpreter process to stop once the window is closed.
+
+        :return: None.
+        """
+        scheduler = self.scheduler
+        scheduler.resume()
+
+        try:
+            while True:
+                for event in self.poll_events(idle=False):
+                    if not self.handle_event(event):
+                        return
+
+                self.draw()
+
+                machine = self.machines[self.current]
+
+                if machine.status == MachineStatus.FAULTED:
+                    raise RuntimeError(machine.message)
+
+                scheduler.wait()
+        finally:
+            for machine in self.machines:
+                machine.stop()
@@ -0,0 +1,222 @@
+"""
+Gym-style environments for driving the interpreter from agents and bots.
+
+Actions are 16-bit key masks (bit N set while key N is held). Observations are views of the display, not copies, so
+stepping an environment doesn't allocate display-sized arrays; copy an observation to keep it past the next step.
+"""
+
+from __future__ import annotations
+
+from io import BytesIO
+from random import Random
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from chipmul8.display import SpriteMode
+from chipmul8.interpreter import Interpreter, StopReason
+from chipmul8.scheduler import FrameScheduler
+from chipmul8.vector import VectorInterpreter
+
+if TYPE_CHECKING:
+    import numpy.typing as npt
+
+
+def key_mask(*keys: int) -> int:
+    """
+    Build an action holding the provided keys.
+
+    :param keys: Keys (0 - F) to hold down.
+    :return: Key mask.
+    """
+    mask = 0
+
+    for key in keys:
+        mask |= 1 << key
+
+    return mask
+
+
+class Environment:
+    """
+    Single CHIP-8 environment.
+
+    Each step holds an action for frame_skip 60 Hz frames. With sticky actions, every frame repeats the previous
+    frame's action instead with the given probability.
+    """
+
+    def __init__(
+        self,
+        rom: bytes,
+        *,
+        frame_skip: int = 4,
+        sticky_action_probability: float = 0.0,
+        instructions_per_second: int = 700,
+        sprite_mode: SpriteMode = SpriteMode.CLIP,
+    ) -> None:
+        """
+        :param rom: Rom contents.
+        :param frame_skip: Number of frames each step runs for.
+        :param sticky_action_probability: Probability of a frame repeating the previous frame's action.
+        :param instructions_per_second: Number of instructions executed per second of emulated time.
+        :param sprite_mode: Behaviour of sprites drawn past the edge of the display.
+        """
+        self.rom = rom
+        self.frame_skip = frame_skip
+        self.sticky_action_probability = sticky_action_probability
+        self.instructions_per_second = instructions_per_second
+        self.sprite_mode = sprite_mode
+
+        self.random = Random()
+        self.reset()
+
+    @property
+    def observation(self) -> npt.NDArray[np.int8]:
+        """
+        The display, indexed [y, -x - 1]. This is the framebuffer's own storage and changes as the environment steps.
+
+        :return: 32x64 array of 0 / 1 pixels.
+        """
+        return self.cpu.display_memory
+
+    def reset(self, seed: int | None = None) -> npt.NDArray[np.int8]:
+        """
+        Restart the rom on a fresh machine.
+
+        :param seed: Seed for sticky actions and CXNN.
+        :return: Initial observation.
+        """
+        self.cpu = Interpreter(sprite_mode=self.sprite_mode, seed=seed)
+        self.cpu.load_rom(BytesIO(self.rom))
+        self.scheduler = FrameScheduler(self.instructions_per_second)
+
+        if seed is not None:
+            self.random.seed(seed)
+
+        self.action = 0
+        self.held = 0
+        self.terminated = False
+
+        return self.observation
+
+    def step(self, action: int) -> npt.NDArray[np.int8]:
+        """
+        Hold an action for frame_skip frames, stopping early if an instruction faults (see terminated).
+
+        :param action: Key mask to hold.
+        :return: Observation.
+        """
+        cpu = self.cpu
+        sticky_action_probability = self.sticky_action_probability
+
+        for _ in range(self.frame_skip):
+            if self.terminated:
+                break
+
+            if not sticky_action_probability or self.random.random() >= sticky_action_probability:
+                self.action = action
+
+            # Only rebuild the keyboard when the held keys change.
+            if self.action != self.held:
+                cpu.key_mask = self.held = self.action
+
+            self.terminated = cpu.run_frame(self.scheduler.cycles_for_next_frame()) == StopReason.FAULT
+
+        return cpu.display_memory
+
+
+class VectorEnvironment:
+    """
+    Batch of environments stepped together on a :class:`~chipmul8.vector.VectorInterpreter`.
+
+    Environments that fault stop executing and are reported by terminated; the rest carry on.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        rom: bytes,
+        environments: int,
+        *,
+        frame_skip: int = 4,
+        sticky_action_probability: float = 0.0,
+        instructions_per_second: int = 700,
+        sprite_mode: SpriteMode = SpriteMode.CLIP,
+    ) -> None:
+        """
+        :param rom: Rom contents.
+        :param environments: Number of environments.
+        :param frame_skip: Number of frames each step runs for.
+        :param sticky_action_probability: Probability of a frame repeating the previous frame's action.
+        :param instructions_per_second: Number of instructions executed per second of emulated time.
+        :param sprite_mode: Behaviour of sprites drawn past the edge of the display.
+        """
+        self.rom = rom
+        self.environments = environments
+        self.frame_skip = frame_skip
+        self.sticky_action_probability = sticky_action_probability
+        self.instructions_per_second = instructions_per_second
+        self.sprite_mode = sprite_mode
+
+        # Buffers reused by every step.
+        self.actions = np.zeros(environments, dtype=np.int64)
+        self._uniform = np.zeros(environments)
+        self._fresh = np.zeros(environments, dtype=np.bool_)
+
+        self.reset()
+
+    @property
+    def observations(self) -> npt.NDArray[np.int8]:
+        """
+        Every environment's display, indexed [environment, y, -x - 1]. This is the interpreter's own storage.
+
+        :return: Nx32x64 array of 0 / 1 pixels.
+        """
+        return self.vector.pixels
+
+    @property
+    def terminated(self) -> npt.NDArray[np.bool_]:
+        """
+        Which environments faulted. This is the interpreter's own storage.
+
+        :return: N flags.
+        """
+        return self.vector.faulted
+
+    def reset(self, seed: int | None = None) -> npt.NDArray[np.int8]:
+        """
+        Restart the rom in every environment.
+
+        :param seed: Seed for sticky actions and CXNN.
+        :return: Initial observations.
+        """
+        self.random = np.random.default_rng(seed)
+        self.vector = VectorInterpreter(self.environments, sprite_mode=self.sprite_mode)
+        self.vector.random = self.random
+        self.vector.load_rom(self.rom)
+        self.scheduler = FrameScheduler(self.instructions_per_second)
+        self.actions.fill(0)
+
+        return self.observations
+
+    def step(self, actions: npt.NDArray[np.integer]) -> npt.NDArray[np.int8]:
+        """
+        Hold each environment's action for frame_skip frames.
+
+        :param actions: Key mask of each environment.
+        :return: Observations.
+        """
+        vector = self.vector
+        sticky_action_probability = self.sticky_action_probability
+
+        for _ in range(self.frame_skip):
+            if sticky_action_probability:
+                self.random.random(out=self._uniform)
+                np.greater_equal(self._uniform, sticky_action_probability, out=self._fresh)
+                np.copyto(self.actions, actions, where=self._fresh)
+            else:
+                np.copyto(self.actions, actions)
+
+            np.copyto(vector.key_mask, self.actions)
+            vector.run_frame(self.scheduler.cycles_for_next_frame())
+
+        return vector.pixels
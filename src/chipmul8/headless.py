@@ -0,0 +1,212 @@
+"""
+Headless execution of the interpreter.
+
+Runs a ROM without a window for a fixed number of frames or cycles, feeding it scripted input, and renders the final
+machine state as text or PNG. Nothing here imports pygame or OpenGL.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import struct
+import zlib
+from typing import TYPE_CHECKING, Final
+
+import numpy as np
+
+from chipmul8.display import DEFAULT_PALETTE, palette_lut
+from chipmul8.interpreter import StopReason
+from chipmul8.scheduler import FrameScheduler
+
+if TYPE_CHECKING:
+    import numpy.typing as npt
+
+    from chipmul8.display import Color
+    from chipmul8.interpreter import Interpreter
+
+_png_signature: Final = b"\x89PNG\r\n\x1a\n"
+
+# PNG colour types, by the number of channels per pixel.
+_png_color_types: Final = {1: 0, 3: 2}
+
+
+def parse_input_script(script: str) -> dict[int, int]:
+    """
+    Parse an input script into the keys held down from each frame onwards.
+
+    Each line holds a frame number followed by the keys pressed from that frame onwards, as hex digits (e.g. ``30 5A``
+    holds keys 5 and A from frame 30), or ``-`` to release every key. Blank lines and ``#`` comments are ignored.
+
+    :param script: Input script source.
+    :return: Mapping of frame number to key mask.
+    """
+    inputs: dict[int, int] = {}
+
+    for line_number, line in enumerate(script.splitlines(), start=1):
+        fields = line.split("#", 1)[0].split()
+
+        if not fields:
+            continue
+
+        try:
+            frame_text, keys = fields
+            frame = int(frame_text)
+
+            if frame < 0:
+                raise ValueError  # noqa: TRY301
+
+            inputs[frame] = 0 if keys == "-" else sum(1 << int(key, 16) for key in set(keys.upper()))
+        except ValueError:
+            msg = f"Line {line_number}: expected '<frame> <hex keys>' or '<frame> -', got {line.strip()!r}"
+            raise ValueError(msg) from None
+
+    return inputs
+
+
+def run_headless(
+    cpu: Interpreter,
+    *,
+    frames: int | None = None,
+    cycles: int | None = None,
+    inputs: dict[int, int] | None = None,
+    instructions_per_second: int = 700,
+) -> StopReason:
+    """
+    Run the interpreter as fast as possible, frame by frame, until a budget is exhausted or an instruction faults.
+
+    :param cpu: Interpreter with a ROM loaded.
+    :param frames: Maximum number of 60 Hz frames to run.
+    :param cycles: Maximum number of instructions to execute, counting from cpu.cycles.
+    :param inputs: Mapping of frame number to the key mask held from that frame onwards.
+    :param instructions_per_second: Number of instructions executed per second of emulated time.
+    :return: Reason the last frame stopped, FAULT if an instruction faulted (see cpu.fault).
+    """
+    if frames is None and cycles is None:
+        msg = "A frame or cycle budget is required"
+        raise ValueError(msg)
+
+    scheduler = FrameScheduler(instructions_per_second)
+    inputs = inputs or {}
+
+    cycle_limit = None if cycles is None else cpu.cycles + cycles
+    frame = 0
+    reason = StopReason.BUDGET
+
+    while (frames is None or frame < frames) and (cycle_limit is None or cpu.cycles < cycle_limit):
+        if frame in inputs:
+            cpu.key_mask = inputs[frame]
+
+        budget = scheduler.cycles_for_next_frame()
+
+        if cycle_limit is not None:
+            budget = min(budget, cycle_limit - cpu.cycles)
+
+        reason = cpu.run_frame(budget)
+        frame += 1
+
+        if reason == StopReason.FAULT:
+            break
+
+    return reason
+
+
+def format_display(pixels: npt.NDArray[np.int8]) -> str:
+    """
+    Render the display as text, one line per row with ``#`` for pixels that are on.
+
+    :param pixels: Display pixels, indexed [y, -x - 1].
+    :return: Display text.
+    """
+    return "".join("".join(".#"[pixel] for pixel in row) + "\n" for row in pixels[:, ::-1].tolist())
+
+
+def display_hash(pixels: npt.NDArray[np.int8]) -> str:
+    """
+    Fingerprint the display, identical displays hash identically whichever framebuffer backend drew them.
+
+    :param pixels: Display pixels, indexed [y, -x - 1].
+    :return: Hex SHA-256 digest of the packed pixels.
+    """
+    return hashlib.sha256(np.packbits(pixels.astype(np.uint8)).tobytes()).hexdigest()
+
+
+def format_registers(cpu: Interpreter) -> str:
+    """
+    Render the registers, timers and stack as text.
+
+    :param cpu: Interpreter to inspect.
+    :return: Register text.
+    """
+    registers = " ".join(f"V{index:X}={value:02X}" for index, value in enumerate(cpu.registers.memory))
+    stack = " ".join(f"{address:03X}" for address in cpu.stack[: cpu.stack_pointer]) or "-"
+
+    return (
+        f"{registers}\n"
+        f"I={cpu.register_i:03X} PC={cpu.program_counter:03X} SP={cpu.stack_pointer:X} "
+        f"DT={cpu.delay_register:02X} ST={cpu.sound_register:02X}\n"
+        f"Stack: {stack}\n"
+        f"Cycles: {cpu.cycles}\n"
+    )
+
+
+def format_memory(memory: bytes | bytearray | memoryview, width: int = 16) -> str:
+    """
+    Render memory as a hex dump.
+
+    :param memory: Memory to dump.
+    :param width: Number of bytes per line.
+    :return: Hex dump text.
+    """
+    return "".join(
+        f"{address:03X}: {memory[address : address + width].hex(' ').upper()}\n"
+        for address in range(0, len(memory), width)
+    )
+
+
+def encode_png(image: npt.NDArray[np.uint8]) -> bytes:
+    """
+    Encode an 8-bit greyscale (height x width) or RGB (height x width x 3) image as a PNG.
+
+    :param image: Image pixels, top row first.
+    :return: PNG file contents.
+    """
+    height, width = image.shape[:2]
+    channels = 1 if image.ndim == 2 else image.shape[2]
+
+    # Every scanline is prefixed with filter type 0 (none).
+    scanlines = np.zeros((height, width * channels + 1), dtype=np.uint8)
+    scanlines[:, 1:] = image.reshape(height, width * channels)
+
+    def chunk(chunk_type: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, _png_color_types[channels], 0, 0, 0)
+
+    return (
+        _png_signature
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(scanlines.tobytes()))
+        + chunk(b"IEND", b"")
+    )
+
+
+def display_png(pixels: npt.NDArray[np.int8], palette: tuple[Color, Color] = DEFAULT_PALETTE) -> bytes:
+    """
+    Encode the display as an RGB PNG.
+
+    :param pixels: Display pixels, indexed [y, -x - 1].
+    :param palette: Colours of pixels that are off and on.
+    :return: PNG file contents.
+    """
+    return encode_png(palette_lut(palette)[pixels[:, ::-1]])
+
+
+def memory_png(memory: bytes | bytearray | memoryview, width: int = 64) -> bytes:
+    """
+    Encode memory as a greyscale PNG, one pixel per byte.
+
+    :param memory: Memory to dump, its length must be a multiple of width.
+    :param width: Number of bytes per image row.
+    :return: PNG file contents.
+    """
+    return encode_png(np.frombuffer(bytes(memory), dtype=np.uint8).reshape(-1, width))
@@ -2,13 +2,23 @@
 CHIP-8 Interpreter.
 """
 
-from io import BufferedReader
+from __future__ import annotations
+
+import struct
+from array import array
+from enum import IntEnum
+from operator import methodcaller
 from random import Random
-from typing import Final
+from types import MappingProxyType
+from typing import TYPE_CHECKING, BinaryIO, Final
+
+from chipmul8.display import ALL_ROWS, DISPLAY_HEIGHT, DISPLAY_WIDTH, ArrayFramebuffer, Framebuffer, SpriteMode
 
-import numpy as np
+if TYPE_CHECKING:
+    from collections.abc import Callable, Mapping
 
-random = Random()
+    import numpy as np
+    import numpy.typing as npt
 
 # fmt: off
 font_list: Final = [
@@ -35,17 +45,48 @@ font_list: Final = [
 ]
 # fmt: on
 
+# Number of backward jumps between checks for idle loops, see Interpreter.idle_period.
+IDLE_CHECK_INTERVAL: Final = 4
+
+# Save states start with the scalar registers: magic, I, PC, SP, delay timer, sound timer, current opcode, dirty rows,
+# key mask, cycles and frame ready. RAM, V0 - VF, the stack, the display and the RNG state follow as raw bytes.
+_state_magic: Final = b"C8S\x01"
+_state_header: Final = struct.Struct("<4sIHhBBHIHQ?")
+_state_stack: Final = struct.Struct("<16H")
+_state_display_size: Final = DISPLAY_WIDTH * DISPLAY_HEIGHT // 8
+# Mersenne Twister state (624 words and a position), then whether a gauss() value is cached and the value.
+_state_random: Final = struct.Struct("<625I?d")
+# Size of the RNG state ending every save state, see RewindBuffer.
+SAVE_STATE_RANDOM_SIZE: Final = _state_random.size
+
+MEMORY_SIZE: Final = 4096
+
+# An interpreter keeps its guest state in one block: a header of scalar registers (I, PC, SP, delay timer, sound timer,
+# current opcode, dirty rows, cycles and frame ready, see Interpreter.sync_state), V0 - VF, the stack, the keys, RAM,
+# then the display in its framebuffer's own layout (see Framebuffer.bind). Offsets keep every typed view aligned.
+_block_header: Final = struct.Struct("<IHhBBHIQ?7x")
+STATE_REGISTERS: Final = _block_header.size
+STATE_STACK: Final = STATE_REGISTERS + 16
+STATE_KEYS: Final = STATE_STACK + 16 * 2
+STATE_RAM: Final = STATE_KEYS + 16
+STATE_DISPLAY: Final = STATE_RAM + MEMORY_SIZE
+
 
 class MemoryBase:
     """
     Generic memory object.
+
+    The bytes are stored in MemoryBase.memory, a plain bytearray. Instructions index it directly (see Interpreter.memory
+    and Interpreter.v) and mask only results that can overflow, item access here wraps every value written and remains
+    for code outside the hot path.
     """
 
-    def __init__(self, allocated_memory: int):
+    def __init__(self, allocated_memory: int, storage: memoryview | None = None):
         """
         :param allocated_memory: Number o bytes of memory to allocate.
+        :param storage: Byte view of existing storage to use instead (e.g. part of an interpreter's state block).
         """
-        self.memory = bytearray(allocated_memory)
+        self.memory = bytearray(allocated_memory) if storage is None else storage
 
     @staticmethod
     def wrap_integer(number: int) -> int:
@@ -86,36 +127,231 @@ class MemoryBase:
         """
         return self.memory[item]
 
+    def copy(self) -> MemoryBase:
+        """
+        Create an independent copy of the memory.
+
+        :return: Memory holding the same values.
+        """
+        clone = type(self).__new__(type(self))
+        clone.memory = bytearray(self.memory)
+
+        return clone
+
+    def load(self, address: int, data: bytes | bytearray | memoryview) -> None:
+        """
+        Copies a block of bytes into memory, in one slice assignment.
+
+        :param address: Address of the first byte.
+        :param data: Bytes to copy.
+        :return: None.
+        """
+        end = address + len(data)
+
+        # Slice assignment past the end would grow (or, for views, reject) the memory rather than raise IndexError.
+        if address < 0 or end > len(self.memory):
+            msg = f"{len(data)} bytes at 0x{address:03X} don't fit in {len(self.memory)} bytes of memory"
+            raise IndexError(msg)
+
+        self.memory[address:end] = data
+
+
+# Opcode family => (mask selecting a handler within the family, {masked opcode: (handler name, operands)})
+# fmt: off
+op_code_handlers: Final[Mapping[int, tuple[int, Mapping[int, tuple[str, tuple[str, ...]]]]]] = MappingProxyType(
+    {
+        0x0000: (0x00FF, {0x00E0: ("sub_op_code_00e0", ()), 0x00EE: ("sub_op_code_00ee", ())}),
+        0x1000: (0xF000, {0x1000: ("opcode_1000", ("nnn",))}),
+        0x2000: (0xF000, {0x2000: ("opcode_2000", ("nnn",))}),
+        0x3000: (0xF000, {0x3000: ("opcode_3000", ("x", "nn"))}),
+        0x4000: (0xF000, {0x4000: ("opcode_4000", ("x", "nn"))}),
+        0x5000: (0xF000, {0x5000: ("opcode_5000", ("x", "y"))}),
+        0x6000: (0xF000, {0x6000: ("opcode_6000", ("x", "nn"))}),
+        0x7000: (0xF000, {0x7000: ("opcode_7000", ("x", "nn"))}),
+        0x8000: (
+            0xF00F,
+            {
+                0x8000: ("sub_op_code_8000", ("x", "y")),
+                0x8001: ("sub_op_code_8001", ("x", "y")),
+                0x8002: ("sub_op_code_8002", ("x", "y")),
+                0x8003: ("sub_op_code_8003", ("x", "y")),
+                0x8004: ("sub_op_code_8004", ("x", "y")),
+                0x8005: ("sub_op_code_8005", ("x", "y")),
+                0x8006: ("sub_op_code_8006", ("x", "y")),
+                0x8007: ("sub_op_code_8007", ("x", "y")),
+                0x800E: ("sub_op_code_800e", ("x", "y")),
+            },
+        ),
+        0x9000: (0xF000, {0x9000: ("opcode_9000", ("x", "y"))}),
+        0xA000: (0xF000, {0xA000: ("opcode_a000", ("nnn",))}),
+        0xB000: (0xF000, {0xB000: ("opcode_b000", ("nnn",))}),
+        0xC000: (0xF000, {0xC000: ("opcode_c000", ("x", "nn"))}),
+        0xD000: (0xF000, {0xD000: ("opcode_d000", ("x", "y", "n"))}),
+        0xE000: (0xF0FF, {0xE09E: ("sub_op_code_ex9e", ("x",)), 0xE0A1: ("sub_op_code_exa1", ("x",))}),
+        0xF000: (
+            0xF0FF,
+            {
+                0xF007: ("sub_op_code_fx07", ("x",)),
+                0xF00A: ("sub_op_code_fx0a", ("x",)),
+                0xF015: ("sub_op_code_fx15", ("x",)),
+                0xF018: ("sub_op_code_fx18", ("x",)),
+                0xF01E: ("sub_op_code_fx1e", ("x",)),
+                0xF029: ("sub_op_code_fx29", ("x",)),
+                0xF033: ("sub_op_code_fx33", ("x",)),
+                0xF055: ("sub_op_code_fx55", ("x",)),
+                0xF065: ("sub_op_code_fx65", ("x",)),
+            },
+        ),
+    }
+)
+# fmt: on
+
+
+def decode_operands(op_code: int) -> dict[str, int]:
+    """
+    Extract every operand field from an opcode.
+
+    :param op_code: Opcode to decode.
+    :return: Mapping of operand name (x, y, n, nn, nnn) to value.
+    """
+    return {
+        "x": (op_code & 0x0F00) >> 8,
+        "y": (op_code & 0x00F0) >> 4,
+        "n": op_code & 0x000F,
+        "nn": op_code & 0x00FF,
+        "nnn": op_code & 0x0FFF,
+    }
+
+
+class StopReason(IntEnum):
+    """
+    Reason :meth:`Interpreter.run` returned.
+    """
+
+    # The cycle budget was exhausted.
+    BUDGET = 0
+    # A sprite was drawn (DXYN), the display is ready to be presented.
+    FRAME = 1
+    # FX0A is waiting for a key press.
+    KEY_WAIT = 2
+    # An instruction raised an exception, see Interpreter.fault.
+    FAULT = 3
+    # The rest of the budget was spent in an idle loop, which only a timer tick or a change of keys can break.
+    IDLE = 4
+
 
 class Interpreter:
     """
     Chip8 Interpreter.
+
+    Guest state lives in a single block (see STATE_REGISTERS and friends), the attributes for RAM, V0 - VF, the stack,
+    the keys and the display are typed views of it. Snapshotting, hashing or comparing machines is therefore one buffer
+    operation on Interpreter.snapshot. Attributes are slots, __dict__ is only there for instrumentation (profilers,
+    trace recorders) overriding methods on a single instance, and is never allocated otherwise.
     """
 
-    instruction_set: dict[str, str]
+    __slots__ = (
+        "__dict__",
+        "current_op_code",
+        "cycles",
+        "delay_register",
+        "dirty_rows",
+        "fault",
+        "frame_ready",
+        "framebuffer",
+        "idle_countdown",
+        "idle_cycles",
+        "idle_delay_register",
+        "idle_jump",
+        "idle_register_i",
+        "idle_registers",
+        "idle_side_effects",
+        "idle_sound_register",
+        "idle_stack_pointer",
+        "idle_view",
+        "keyboard",
+        "memory",
+        "program_counter",
+        "ram",
+        "random",
+        "register_i",
+        "registers",
+        "side_effects",
+        "sound_register",
+        "sprite_mode",
+        "stack",
+        "stack_pointer",
+        "state",
+        "v",
+    )
+
+    dispatch_table: tuple[Callable[[Interpreter], None], ...]
+    stop_table: bytes
 
     @classmethod
     def initialize(cls) -> None:
         """
-        Loads op codes.
+        Decodes every possible opcode into the dispatch table.
+
+        Each entry calls the handler for that opcode with its operands already extracted, so executing an
+        instruction is a single index and call. The table is built once per class and reused afterwards.
 
         :return: None.
         """
-        cls.instruction_set = {
-            op_code_lookup[7:]: op_code_lookup
-            for op_code_lookup in cls.__dict__
-            if str(op_code_lookup).startswith("opcode_")
-        }
+        if "dispatch_table" not in cls.__dict__:
+            cls.dispatch_table = tuple(cls.decode(op_code) for op_code in range(0x10000))
+            # Jumps (1NNN) are checked for idle loops.
+            cls.stop_table = bytes(
+                StopReason.FRAME
+                if op_code & 0xF000 == 0xD000
+                else StopReason.KEY_WAIT
+                if op_code & 0xF0FF == 0xF00A
+                else StopReason.IDLE
+                if op_code & 0xF000 == 0x1000
+                else StopReason.BUDGET
+                for op_code in range(0x10000)
+            )
+
+    @staticmethod
+    def decode(op_code: int) -> Callable[[Interpreter], None]:
+        """
+        Resolve an opcode to its handler.
 
-    def __init__(self, start_address: int = 0x200):
+        :param op_code: Opcode to decode.
+        :return: Callable taking the interpreter, invoking the opcode handler with its decoded operands.
+        """
+        mask, handlers = op_code_handlers[op_code & 0xF000]
+
+        if (op_code & mask) not in handlers:
+            return methodcaller("unknown_op_code", op_code)
+
+        handler, operands = handlers[op_code & mask]
+        decoded_operands = decode_operands(op_code)
+
+        return methodcaller(handler, *(decoded_operands[operand] for operand in operands))
+
+    def __init__(
+        self,
+        start_address: int = 0x200,
+        sprite_mode: SpriteMode = SpriteMode.CLIP,
+        framebuffer: Framebuffer | None = None,
+        seed: int | None = None,
+    ):
         """
         :param start_address: Interpreter memory start location.
         :type start_address: int
+        :param sprite_mode: Behaviour of sprites drawn past the edge of the display.
+        :param framebuffer: Display backend, defaults to a byte per pixel array.
+        :param seed: Seed of the random numbers drawn by CXNN, None seeds from the operating system.
         """
-        self.ram = MemoryBase(4096)
-        self.registers = MemoryBase(16)
+        self.initialize()
+
+        self.sprite_mode = sprite_mode
+        self.random = Random(seed)
+
+        framebuffer = framebuffer if framebuffer is not None else ArrayFramebuffer()
+        self.bind_state(bytearray(STATE_DISPLAY + framebuffer.storage_size), framebuffer)
 
-        self.stack = [0] * 16
         self.register_i = 0
         self.program_counter = start_address
         self.stack_pointer = 0
@@ -124,25 +360,274 @@ class Interpreter:
         self.sound_register = 0
 
         self.current_op_code = 0
+        self.frame_ready = False
 
-        self.display_memory = np.zeros(shape=(32, 64), dtype=np.int8)
+        # Bit N is set when display row N changed since the display was last presented.
+        self.dirty_rows = ALL_ROWS
 
-        self.keyboard = [False] * 16
-        self.frame_ready = False
+        self.cycles = 0
+        self.fault: Exception | None = None
+
+        # Number of instructions executed whose effects can't be repeated harmlessly (CXNN, DXYN, FX33 and FX55),
+        # loops executing any of them aren't idle.
+        self.side_effects = 0
+
+        # Machine state the last time a backward jump was checked, see idle_period.
+        self.idle_countdown = IDLE_CHECK_INTERVAL
+        self.reset_idle()
+
+        self.ram.load(0, bytes(font_list))
+
+    def bind_state(self, state: bytearray | memoryview, framebuffer: Framebuffer) -> None:
+        """
+        Lay the machine out over a state block, creating the views of it instructions read and write.
+
+        The block's RAM, registers, stack and keys are used as they are, the display is moved into it from the
+        framebuffer. Scalar registers aren't read from the header, see restore.
+
+        :param state: State block of STATE_DISPLAY bytes plus the framebuffer's storage_size.
+        :param framebuffer: Display backend, bound to the block's display.
+        :return: None.
+        """
+        view = memoryview(state)
+        self.state = state
+
+        # MemoryBase item access stays available, instructions index the views directly.
+        self.ram = MemoryBase(MEMORY_SIZE, view[STATE_RAM:STATE_DISPLAY])
+        self.registers = MemoryBase(16, view[STATE_REGISTERS:STATE_STACK])
+        self.memory = self.ram.memory
+        self.v = self.registers.memory
+        self.stack = view[STATE_STACK:STATE_KEYS].cast("H")
+        self.keyboard = view[STATE_KEYS:STATE_RAM]
+
+        # Everything an idle loop has to leave unchanged, apart from the scalar registers: V0 - VF, the stack and keys.
+        self.idle_view = view[STATE_REGISTERS:STATE_RAM]
+
+        framebuffer.bind(view[STATE_DISPLAY:])
+        self.framebuffer = framebuffer
+
+    def sync_state(self) -> bytearray | memoryview:
+        """
+        Write the scalar registers into the header of the state block, which then holds the whole guest.
+
+        The scalar registers are plain attributes while the machine runs, as every instruction updates them and reading
+        or writing them through a view costs several times more.
+
+        :return: The state block.
+        """
+        _block_header.pack_into(
+            self.state,
+            0,
+            self.register_i,
+            self.program_counter,
+            self.stack_pointer,
+            self.delay_register,
+            self.sound_register,
+            self.current_op_code,
+            self.dirty_rows,
+            self.cycles,
+            self.frame_ready,
+        )
+
+        return self.state
+
+    def snapshot(self) -> bytes:
+        """
+        Copy the state block, e.g. to hash or compare machines.
+
+        Unlike save_state, snapshots are a raw copy: they leave out the CXNN generator and are only compatible with
+        machines using the same framebuffer backend, but cost a single copy.
+
+        :return: Snapshot of the guest.
+        """
+        return bytes(self.sync_state())
+
+    def restore(self, snapshot: bytes | bytearray | memoryview) -> None:
+        """
+        Restore the guest from a snapshot.
+
+        :param snapshot: Snapshot from Interpreter.snapshot of a machine with the same framebuffer backend.
+        :return: None.
+        """
+        if len(snapshot) != len(self.state):
+            msg = "Snapshot of a machine with a different layout"
+            raise ValueError(msg)
+
+        self.state[:] = snapshot
+
+        (
+            self.register_i,
+            self.program_counter,
+            self.stack_pointer,
+            self.delay_register,
+            self.sound_register,
+            self.current_op_code,
+            self.dirty_rows,
+            self.cycles,
+            self.frame_ready,
+        ) = _block_header.unpack_from(self.state)
+
+        self.fault = None
+        self.reset_idle()
+
+    @property
+    def display_memory(self) -> npt.NDArray[np.int8]:
+        """
+        Display pixels, indexed [y, -x - 1].
+
+        :return: 32x64 array of 0 / 1 pixels.
+        """
+        return self.framebuffer.to_array()
+
+    @property
+    def key_mask(self) -> int:
+        """
+        Keys currently held down.
+
+        :return: Mask with bit N set if key N is pressed.
+        """
+        return sum(1 << key for key, pressed in enumerate(self.keyboard) if pressed)
+
+    @key_mask.setter
+    def key_mask(self, mask: int) -> None:
+        """
+        Set which keys are held down.
+
+        :param mask: Mask with bit N set if key N is pressed.
+        :return: None.
+        """
+        self.keyboard[:] = bytes(mask >> key & 1 for key in range(16))
+
+    def save_state(self) -> bytes:
+        """
+        Serialise the machine into a save state.
+
+        Memory, registers and the display are copied in bulk. The state includes the random number generator used by
+        CXNN, so execution resumes identically after loading.
+
+        :return: Save state.
+        """
+        _, random_words, gauss_next = self.random.getstate()
+
+        return b"".join(
+            (
+                _state_header.pack(
+                    _state_magic,
+                    self.register_i,
+                    self.program_counter,
+                    self.stack_pointer,
+                    self.delay_register,
+                    self.sound_register,
+                    self.current_op_code,
+                    self.dirty_rows,
+                    self.key_mask,
+                    self.cycles,
+                    self.frame_ready,
+                ),
+                self.memory,
+                self.v,
+                _state_stack.pack(*self.stack),
+                self.framebuffer.to_bytes(),
+                _state_random.pack(*random_words, gauss_next is not None, gauss_next or 0.0),
+            )
+        )
+
+    def load_state(self, state: bytes | bytearray | memoryview) -> None:
+        """
+        Restore the machine from a save state.
+
+        Compiled blocks (see chipmul8.jit) aren't part of the state, an attached block compiler discards them.
+
+        :param state: Save state from save_state.
+        :return: None.
+        """
+        view = memoryview(state)
+        ram = self.memory
+        registers = self.v
+
+        size = (
+            _state_header.size
+            + len(ram)
+            + len(registers)
+            + _state_stack.size
+            + _state_display_size
+            + _state_random.size
+        )
+
+        # Checked before unpacking, which raises struct.error on short input.
+        if len(view) != size or bytes(view[: len(_state_magic)]) != _state_magic:
+            msg = "Not a chipmul8 save state"
+            raise ValueError(msg)
+
+        fields = _state_header.unpack_from(view)
+
+        (
+            _,
+            self.register_i,
+            self.program_counter,
+            self.stack_pointer,
+            self.delay_register,
+            self.sound_register,
+            self.current_op_code,
+            self.dirty_rows,
+            self.key_mask,
+            self.cycles,
+            self.frame_ready,
+        ) = fields
+
+        offset = _state_header.size
+        ram[:] = view[offset : offset + len(ram)]
+        offset += len(ram)
+        registers[:] = view[offset : offset + len(registers)]
+        offset += len(registers)
+        self.stack[:] = array("H", _state_stack.unpack_from(view, offset))
+        offset += _state_stack.size
+        self.framebuffer.load_bytes(view[offset : offset + _state_display_size])
+        offset += _state_display_size
+
+        *random_words, has_gauss_next, gauss_next = _state_random.unpack_from(view, offset)
+        self.random.setstate((3, tuple(random_words), gauss_next if has_gauss_next else None))
+
+        self.fault = None
+        self.reset_idle()
+
+    def fork(self) -> Interpreter:
+        """
+        Create an independent copy of the machine, e.g. to explore different inputs from the same point.
+
+        Only the mutable guest state is copied (the state block and the CXNN generator), everything else is shared,
+        which is far cheaper than copy.deepcopy.
+
+        :return: Interpreter in the same state.
+        """
+        child = type(self).__new__(type(self))
+
+        for name in Interpreter.__slots__:
+            if name != "__dict__":
+                setattr(child, name, getattr(self, name))
+
+        # Instrumentation (profilers, trace recorders) overrides class attributes per instance, forks start without it.
+        if vars(self):
+            vars(child).update((name, value) for name, value in vars(self).items() if not hasattr(type(self), name))
+
+        child.bind_state(bytearray(self.state), self.framebuffer.copy())
+        child.random = Random()
+        child.random.setstate(self.random.getstate())
+        child.reset_idle()
 
-        for index, font_item in enumerate(font_list):
-            self.ram.set_address(address=index, value=font_item)
+        return child
 
-    def load_rom(self, rom_file: BufferedReader) -> None:
+    def load_rom(self, rom_file: BinaryIO) -> None:
         """
         Loads a rom into memory.
 
         :param rom_file: Rom file.
-        :type rom_file: _io.BufferedReader
+        :type rom_file: BinaryIO
         :return: None.
         """
-        for index, line in enumerate(rom_file.read()):
-            self.ram.set_address(0x200 + index, line)
+        self.ram.load(0x200, rom_file.read())
+
+        self.reset_idle()
 
     def emulate(self) -> None:
         """
@@ -150,368 +635,517 @@ class Interpreter:
 
         :return: None.
         """
-        self.current_op_code = self.ram[self.program_counter] << 8 | self.ram[self.program_counter + 1]
+        memory = self.memory
+        self.current_op_code = memory[self.program_counter] << 8 | memory[self.program_counter + 1]
         self.execute_op_code()
 
+    def tick_timers(self) -> None:
+        """
+        Decrements the delay and sound timers, called at 60 Hz independently of the instruction rate.
+
+        :return: None.
+        """
         if self.delay_register > 0:
             self.delay_register -= 1
 
         if self.sound_register > 0:
             self.sound_register -= 1
 
+    def run(self, max_cycles: int) -> StopReason:
+        """
+        Executes up to max_cycles emulation cycles.
+
+        Returns early once a sprite has been drawn, FX0A is waiting on a key press or an instruction faults. Idle loops
+        are fast-forwarded (see idle_period), their skipped iterations still count as executed. The number of cycles
+        executed is accumulated in Interpreter.cycles.
+
+        :param max_cycles: Maximum number of cycles to execute.
+        :return: Reason execution stopped.
+        """
+        dispatch_table = self.dispatch_table
+        stop_table = self.stop_table
+        memory = self.memory
+
+        cycles = 0
+        reason = StopReason.BUDGET
+
+        idle_countdown = self.idle_countdown
+
+        try:
+            while cycles < max_cycles:
+                program_counter = self.program_counter
+                op_code = memory[program_counter] << 8 | memory[program_counter + 1]
+                self.current_op_code = op_code
+
+                dispatch_table[op_code](self)
+                cycles += 1
+
+                stop = stop_table[op_code]
+
+                if stop:
+                    if stop == StopReason.IDLE:
+                        # Only backward jumps can close a loop, every few are checked.
+                        if self.program_counter <= program_counter:
+                            idle_countdown -= 1
+
+                            if not idle_countdown:
+                                idle_countdown = IDLE_CHECK_INTERVAL
+                                period = self.idle_period(program_counter, self.cycles + cycles)
+
+                                if period:
+                                    # Skip every whole period that fits in the budget, the rest executes as normal.
+                                    skipped = (max_cycles - cycles) // period * period
+                                    cycles += skipped
+                                    # The next period is measured from here, as if the skipped ones had executed.
+                                    self.idle_cycles += skipped
+                                    reason = StopReason.IDLE
+                    # FX0A only stops execution while it is still waiting, i.e. the program counter didn't move.
+                    elif stop == StopReason.FRAME or self.program_counter == program_counter:
+                        reason = StopReason(stop)
+                        break
+        except Exception as e:
+            self.fault = e
+            reason = StopReason.FAULT
+
+        self.cycles += cycles
+        self.idle_countdown = idle_countdown
+
+        return reason
+
+    def reset_idle(self) -> None:
+        """
+        Forget the state recorded by idle_period, required whenever memory is changed from outside the guest.
+
+        :return: None.
+        """
+        self.idle_jump = -1
+        self.idle_cycles = 0
+        self.idle_register_i = -1
+        self.idle_stack_pointer = -1
+        self.idle_delay_register = -1
+        self.idle_sound_register = -1
+        self.idle_side_effects = -1
+        self.idle_registers = bytearray(len(self.idle_view))
+
+    def idle_period(self, jump: int, cycles: int) -> int:
+        """
+        Check a backward jump for an idle loop.
+
+        A loop is idle once the machine takes the same jump twice in the same state (registers, I, stack, timers and
+        keys), having executed nothing with side effects in between. From then on every period executes the same
+        instructions and leaves the machine in the same state until a timer ticks or the keys change, so whole periods
+        can be skipped without changing the outcome. Timer waits (FX07 / 3XNN / 1NNN), key polls and jumps to self
+        are all idle loops.
+
+        :param jump: Address of the jump.
+        :param cycles: Value of Interpreter.cycles once the jump is accounted for.
+        :return: Number of cycles per period if the loop is idle, otherwise 0.
+        """
+        if (
+            jump == self.idle_jump
+            and self.register_i == self.idle_register_i
+            and self.stack_pointer == self.idle_stack_pointer
+            and self.delay_register == self.idle_delay_register
+            and self.sound_register == self.idle_sound_register
+            and self.side_effects == self.idle_side_effects
+            and self.idle_view == self.idle_registers
+        ):
+            period = cycles - self.idle_cycles
+            # Stay armed, the loop is checked again from this jump.
+            self.idle_cycles = cycles
+
+            return period
+
+        # Recorded field by field and copied in place, so checking for idle loops doesn't allocate.
+        self.idle_jump = jump
+        self.idle_cycles = cycles
+        self.idle_register_i = self.register_i
+        self.idle_stack_pointer = self.stack_pointer
+        self.idle_delay_register = self.delay_register
+        self.idle_sound_register = self.sound_register
+        self.idle_side_effects = self.side_effects
+        self.idle_registers[:] = self.idle_view
+
+        return 0
+
+    def run_frame(self, max_cycles: int) -> StopReason:
+        """
+        Executes one 60 Hz frame: up to max_cycles emulation cycles followed by a timer tick.
+
+        Sprites drawn during the frame don't end it, Interpreter.frame_ready reports whether the display changed.
+
+        :param max_cycles: Number of cycles executed per frame.
+        :return: Reason execution stopped, FRAME if the budget was exhausted after drawing a sprite.
+        """
+        remaining = max_cycles
+        drawn = False
+
+        while True:
+            start = self.cycles
+            reason = self.run(remaining)
+            remaining -= self.cycles - start
+
+            if reason != StopReason.FRAME:
+                break
+
+            drawn = True
+
+        self.tick_timers()
+
+        if drawn and reason == StopReason.BUDGET:
+            return StopReason.FRAME
+
+        return reason
+
     def execute_op_code(self) -> None:
         """
         Executes the current opcode.
 
         :return: None.
         """
-        lookup_code = hex(self.current_op_code & 0xF000)[2:]
-
         try:
-            getattr(self, self.instruction_set[lookup_code])()
+            self.dispatch_table[self.current_op_code](self)
         except Exception as e:
             print(f"Executing opcode: {hex(self.current_op_code)}")
             print(e)
 
-    def opcode_0(self) -> None:
+    def unknown_op_code(self, op_code: int) -> None:
         """
-        00EN
+        Handler for opcodes outside the instruction set.
 
+        :param op_code: Opcode that could not be decoded.
         :return: None.
         """
+        msg = f"Unknown opcode: {op_code:#06x}"
+        raise ValueError(msg)
 
-        def sub_op_code_00e0() -> None:
-            """
-            00E0
-
-            Clear the screen.
-
-            :return: None.
-            """
-            self.display_memory = np.zeros(shape=(32, 64), dtype=np.int8)
-            self.program_counter += 2
+    def sub_op_code_00e0(self) -> None:
+        """
+        00E0
 
-        def sub_op_code_00ee() -> None:
-            """
-            00EE
+        Clear the screen.
 
-            Return from subroutine.
+        :return: None.
+        """
+        self.framebuffer.clear()
+        self.dirty_rows = ALL_ROWS
+        self.program_counter += 2
 
-            :return: None
-            """
-            self.program_counter = self.stack[self.stack_pointer - 1]
-            self.stack_pointer -= 1
-            self.program_counter += 2
+    def sub_op_code_00ee(self) -> None:
+        """
+        00EE
 
-        sub_op_code_lookup = {0x00E0: sub_op_code_00e0, 0x00EE: sub_op_code_00ee}
+        Return from subroutine.
 
-        sub_op_code = sub_op_code_lookup[(self.current_op_code & 0x00FF)]
-        sub_op_code()
+        :return: None
+        """
+        self.program_counter = self.stack[self.stack_pointer - 1]
+        self.stack_pointer -= 1
+        self.program_counter += 2
 
-    def opcode_1000(self) -> None:
+    def opcode_1000(self, nnn: int) -> None:
         """
         1NNN
 
         goto NNN;
 
+        :param nnn: Value of NNN in current opcode (1NNN).
         :return: None
         :rtype: None
         """
-        self.program_counter = self.current_op_code & 0x0FFF
+        self.program_counter = nnn
 
-    def opcode_2000(self) -> None:
+    def opcode_2000(self, nnn: int) -> None:
         """
         2NNN
 
         Calls subroutine at NNN.
 
+        :param nnn: Value of NNN in current opcode (2NNN).
         :return: None.
         """
         self.stack[self.stack_pointer] = self.program_counter
         self.stack_pointer += 1
-        self.program_counter = self.current_op_code & 0x0FFF
+        self.program_counter = nnn
 
-    def opcode_3000(self) -> None:
+    def opcode_3000(self, x: int, nn: int) -> None:
         """
         3XNN
 
         Skips the next instruction if VX equals NN.
 
+        :param x: Value of X in current opcode (3XNN).
+        :param nn: Value of NN in current opcode (3XNN).
         :return: None.
         """
-        if self.registers[(self.current_op_code & 0x0F00) >> 8] == self.current_op_code & 0x00FF:
+        if self.v[x] == nn:
             self.program_counter += 4
             return
 
         self.program_counter += 2
 
-    def opcode_4000(self) -> None:
+    def opcode_4000(self, x: int, nn: int) -> None:
         """
         4XNN
 
         Skips the next instruction if VX does not equal NN.
 
+        :param x: Value of X in current opcode (4XNN).
+        :param nn: Value of NN in current opcode (4XNN).
         :return: None.
         """
-        if self.registers[(self.current_op_code & 0x0F00) >> 8] != self.current_op_code & 0x00FF:
+        if self.v[x] != nn:
             self.program_counter += 4
             return
 
         self.program_counter += 2
 
-    def opcode_5000(self) -> None:
+    def opcode_5000(self, x: int, y: int) -> None:
         """
         5XY0
 
         Skips the next instruction if VX equals VY.
 
+        :param x: Value of X in current opcode (5XY0).
+        :param y: Value of Y in current opcode (5XY0).
         :return: None.
         """
-        if self.registers[(self.current_op_code & 0x0F00) >> 8] == self.registers[(self.current_op_code & 0x00F0) >> 4]:
+        if self.v[x] == self.v[y]:
             self.program_counter += 4
             return
 
         self.program_counter += 2
 
-    def opcode_6000(self) -> None:
+    def opcode_6000(self, x: int, nn: int) -> None:
         """
         6XNN
 
         Sets VX to NN.
 
+        :param x: Value of X in current opcode (6XNN).
+        :param nn: Value of NN in current opcode (6XNN).
         :return: None
         """
-        self.registers[(self.current_op_code & 0x0F00) >> 8] = self.current_op_code & 0x00FF
+        self.v[x] = nn
 
         self.program_counter += 2
 
-    def opcode_7000(self) -> None:
+    def opcode_7000(self, x: int, nn: int) -> None:
         """
         7XNN
 
         Adds NN to VX. (Carry flag is not changed).
 
+        :param x: Value of X in current opcode (7XNN).
+        :param nn: Value of NN in current opcode (7XNN).
         :return: None
         """
-        register_address = (self.current_op_code & 0x0F00) >> 8
-
-        self.registers[register_address] = self.registers[register_address] + self.current_op_code & 0x00FF
+        self.v[x] = (self.v[x] + nn) & 0xFF
 
         self.program_counter += 2
 
-    def opcode_8000(self) -> None:
+    def sub_op_code_8000(self, x: int, y: int) -> None:
         """
-        8XYN
+        8XY0
 
-        :return: None
-        """
-
-        def sub_op_code_8000(x: int, y: int) -> None:
-            """
-            8XY0
-
-            Sets VX to the value of VY.
+        Sets VX to the value of VY.
 
-            :param x: Value of X in current opcode (8XYN).
-            :param y: Value of Y in current opcode (8XYN).
-            :return: None.
-            """
-            self.registers[x] = self.registers[y]
-            self.program_counter += 2
-
-        def sub_op_code_8001(x: int, y: int) -> None:
-            """
-            8XY1
+        :param x: Value of X in current opcode (8XYN).
+        :param y: Value of Y in current opcode (8XYN).
+        :return: None.
+        """
+        self.v[x] = self.v[y]
+        self.program_counter += 2
 
-            Sets VX to VX or VY.
+    def sub_op_code_8001(self, x: int, y: int) -> None:
+        """
+        8XY1
 
-            :param x: Value of X in current opcode (8XYN).
-            :param y: Value of Y in current opcode (8XYN).
-            :return: None.
-            """
-            self.registers[x] = self.registers[x] | self.registers[y]
-            self.program_counter += 2
+        Sets VX to VX or VY.
 
-        def sub_op_code_8002(x: int, y: int) -> None:
-            """
-            8XY2
+        :param x: Value of X in current opcode (8XYN).
+        :param y: Value of Y in current opcode (8XYN).
+        :return: None.
+        """
+        self.v[x] = self.v[x] | self.v[y]
+        self.program_counter += 2
 
-            Sets VX to VX and VY.
+    def sub_op_code_8002(self, x: int, y: int) -> None:
+        """
+        8XY2
 
-            :param x: Value of X in current opcode (8XYN).
-            :param y: Value of Y in current opcode (8XYN).
-            :return: None.
-            """
-            self.registers[x] = self.registers[x] & self.registers[y]
-            self.program_counter += 2
+        Sets VX to VX and VY.
 
-        def sub_op_code_8003(x: int, y: int) -> None:
-            """
-            8XY3
+        :param x: Value of X in current opcode (8XYN).
+        :param y: Value of Y in current opcode (8XYN).
+        :return: None.
+        """
+        self.v[x] = self.v[x] & self.v[y]
+        self.program_counter += 2
 
-            Sets VX to VX xor VY.
+    def sub_op_code_8003(self, x: int, y: int) -> None:
+        """
+        8XY3
 
-            :param x: Value of X in current opcode (8XYN).
-            :param y: Value of Y in current opcode (8XYN).
-            :return: None.
-            """
-            self.registers[x] = self.registers[x] ^ self.registers[y]
-            self.program_counter += 2
+        Sets VX to VX xor VY.
 
-        def sub_op_code_8004(x: int, y: int) -> None:
-            """
-            8XY4
+        :param x: Value of X in current opcode (8XYN).
+        :param y: Value of Y in current opcode (8XYN).
+        :return: None.
+        """
+        self.v[x] = self.v[x] ^ self.v[y]
+        self.program_counter += 2
 
-            Adds VY to VX. VF is set to 1 when there is a carry, and to 0 when there isn't.
+    def sub_op_code_8004(self, x: int, y: int) -> None:
+        """
+        8XY4
 
-            :param x: Value of X in current opcode (8XYN).
-            :param y: Value of Y in current opcode (8XYN).
-            :return: None.
-            """
-            if self.registers[y] > (0xFF - self.registers[x]):
-                self.registers[0xF] = 1
-            else:
-                self.registers[0xF] = 0
+        Adds VY to VX. VF is set to 1 when there is a carry, and to 0 when there isn't.
 
-            self.registers[x] = self.registers[x] + self.registers[y]
+        :param x: Value of X in current opcode (8XYN).
+        :param y: Value of Y in current opcode (8XYN).
+        :return: None.
+        """
+        registers = self.v
 
-            self.program_counter += 2
+        if registers[y] > (0xFF - registers[x]):
+            registers[0xF] = 1
+        else:
+            registers[0xF] = 0
 
-        def sub_op_code_8005(x: int, y: int) -> None:
-            """
-            8XY5
+        registers[x] = (registers[x] + registers[y]) & 0xFF
 
-            VY is subtracted from VX. VF is set to 0 when there is a borrow, and to 0 where there isn't.
+        self.program_counter += 2
 
-            :param x: Value of X in current opcode (8XYN).
-            :param y: Value of Y in current opcode (8XYN).
-            :return: None.
-            """
-            if self.registers[y] > self.registers[x]:
-                self.registers[0xF] = 0
-            else:
-                self.registers[0xF] = 1
+    def sub_op_code_8005(self, x: int, y: int) -> None:
+        """
+        8XY5
 
-            self.registers[x] = self.registers[x] - self.registers[y]
+        VY is subtracted from VX. VF is set to 0 when there is a borrow, and to 0 where there isn't.
 
-            self.program_counter += 2
+        :param x: Value of X in current opcode (8XYN).
+        :param y: Value of Y in current opcode (8XYN).
+        :return: None.
+        """
+        registers = self.v
 
-        def sub_op_code_8006(x: int, y: int) -> None:
-            """
-            8XY6
+        if registers[y] > registers[x]:
+            registers[0xF] = 0
+        else:
+            registers[0xF] = 1
 
-            Stores the least significant bit of VX in VF and then shifts VX to the right by 1.
+        registers[x] = (registers[x] - registers[y]) & 0xFF
 
-            :param x: Value of X in current opcode (8XYN).
-            :param y: Value of Y in current opcode (8XYN).
-            :return: None.
-            """
-            _ = y
-            self.registers[0xF] = self.registers[x] & 0x1
-            self.registers[x] >>= 0x1
+        self.program_counter += 2
 
-            self.program_counter += 2
+    def sub_op_code_8006(self, x: int, y: int) -> None:
+        """
+        8XY6
 
-        def sub_op_code_8007(x: int, y: int) -> None:
-            """
-            8XY7
+        Stores the least significant bit of VX in VF and then shifts VX to the right by 1.
 
-            Sets VX to VY minus VX. VF is set to 0 when there is a borrow, and 1 when there isn't.
+        :param x: Value of X in current opcode (8XYN).
+        :param y: Value of Y in current opcode (8XYN).
+        :return: None.
+        """
+        _ = y
+        registers = self.v
+        registers[0xF] = registers[x] & 0x1
+        registers[x] >>= 0x1
 
-            :param x: Value of X in current opcode (8XYN).
-            :param y: Value of Y in current opcode (8XYN).
-            :return: None.
-            """
-            if self.registers[x] > self.registers[y]:
-                self.registers[0xF] = 0
-            else:
-                self.registers[0xF] = 1
+        self.program_counter += 2
 
-            self.registers[x] = self.registers[y] - self.registers[x]
+    def sub_op_code_8007(self, x: int, y: int) -> None:
+        """
+        8XY7
 
-            self.program_counter += 2
+        Sets VX to VY minus VX. VF is set to 0 when there is a borrow, and 1 when there isn't.
 
-        def sub_op_code_800e(x: int, y: int) -> None:
-            """
-            8XYE
+        :param x: Value of X in current opcode (8XYN).
+        :param y: Value of Y in current opcode (8XYN).
+        :return: None.
+        """
+        registers = self.v
 
-            Stores the most significant bit of VX in VF and then shifts VX to the left by 1.
+        if registers[x] > registers[y]:
+            registers[0xF] = 0
+        else:
+            registers[0xF] = 1
 
-            :param x: Value of X in current opcode (8XYN).
-            :param y: Value of Y in current opcode (8XYN).
-            :return: None.
-            """
-            _ = y
-            self.registers[0xF] = self.registers[x] >> 7
-            self.registers[x] <<= 1
+        registers[x] = (registers[y] - registers[x]) & 0xFF
 
-            self.program_counter += 2
+        self.program_counter += 2
 
-        sub_op_code_lookup = {
-            0x8000: sub_op_code_8000,
-            0x8001: sub_op_code_8001,
-            0x8002: sub_op_code_8002,
-            0x8003: sub_op_code_8003,
-            0x8004: sub_op_code_8004,
-            0x8005: sub_op_code_8005,
-            0x8006: sub_op_code_8006,
-            0x8007: sub_op_code_8007,
-            0x800E: sub_op_code_800e,
-        }
+    def sub_op_code_800e(self, x: int, y: int) -> None:
+        """
+        8XYE
 
-        x_value = (self.current_op_code & 0x0F00) >> 8
-        y_value = (self.current_op_code & 0x00F0) >> 4
+        Stores the most significant bit of VX in VF and then shifts VX to the left by 1.
 
-        sub_op_code = sub_op_code_lookup[(self.current_op_code & 0xF00F)]
+        :param x: Value of X in current opcode (8XYN).
+        :param y: Value of Y in current opcode (8XYN).
+        :return: None.
+        """
+        _ = y
+        registers = self.v
+        registers[0xF] = registers[x] >> 7
+        registers[x] = (registers[x] << 1) & 0xFF
 
-        sub_op_code(x_value, y_value)
+        self.program_counter += 2
 
-    def opcode_9000(self) -> None:
+    def opcode_9000(self, x: int, y: int) -> None:
         """
         9XY0
 
         Skips the next instruction if VX doesn't equal VY.
 
+        :param x: Value of X in current opcode (9XY0).
+        :param y: Value of Y in current opcode (9XY0).
         :return: None.
         """
-        if self.registers[(self.current_op_code & 0x0F00) >> 8] != self.registers[(self.current_op_code & 0x00F0) >> 4]:
+        if self.v[x] != self.v[y]:
             self.program_counter += 4
         else:
             self.program_counter += 2
 
-    def opcode_a000(self) -> None:
+    def opcode_a000(self, nnn: int) -> None:
         """
         ANNN
 
         Sets I to the address NNN.
 
+        :param nnn: Value of NNN in current opcode (ANNN).
         :return: None.
         """
-        self.register_i = self.current_op_code & 0x0FFF
+        self.register_i = nnn
         self.program_counter += 2
 
-    def opcode_b000(self) -> None:
+    def opcode_b000(self, nnn: int) -> None:
         """
         BNNN
 
         Jumps to the address NNN plus V0.
 
+        :param nnn: Value of NNN in current opcode (BNNN).
         :return: None.
         """
-        self.program_counter = (self.current_op_code & 0x0FFF) + self.registers[0x0]
+        self.program_counter = nnn + self.v[0x0]
 
-    def opcode_c000(self) -> None:
+    def opcode_c000(self, x: int, nn: int) -> None:
         """
         CXNN
 
         Sets VX to the result of a bitwise and operation on a random number (Typically: 0 to 255) and NN.
 
+        :param x: Value of X in current opcode (CXNN).
+        :param nn: Value of NN in current opcode (CXNN).
         :return: None.
         """
-        self.registers[(self.current_op_code & 0x0F00) >> 8] = (self.current_op_code & 0x00FF) & random.randint(0, 255)
+        self.v[x] = nn & self.random.randint(0, 255)
+        self.side_effects += 1
         self.program_counter += 2
 
-    def opcode_d000(self) -> None:
+    def opcode_d000(self, x: int, y: int, n: int) -> None:
         """
         DXYN
 
@@ -520,243 +1154,222 @@ class Interpreter:
         I value does not change after the execution of this instruction.
         As described above, VF is set to 1 if any screen pixels are flipped from set to unset when the sprite is drawn,
         and to 0 if that does not happen.
+        Pixels past the edge of the display are clipped or wrapped depending on the sprite mode.
 
+        :param x: Value of X in current opcode (DXYN).
+        :param y: Value of Y in current opcode (DXYN).
+        :param n: Value of N in current opcode (DXYN).
         :return: None.
         """
-        x_coordinate = self.registers[(self.current_op_code & 0x0F00) >> 8]
-        y_coordinate = self.registers[(self.current_op_code & 0x00F0) >> 4]
-        height = self.current_op_code & 0x000F
+        registers = self.v
+        memory = self.memory
+        x_coordinate = registers[x] % 64
+        y_coordinate = registers[y] % 32
 
-        self.registers[0xF] = 0x0
+        # Drawn straight out of RAM, rows past the end of memory are skipped (FX1E can move I past it entirely).
+        height = max(0, min(n, len(memory) - self.register_i))
 
-        for y_sprite_coordinate in range(0, height):
-            sprite_row = self.ram[self.register_i + y_sprite_coordinate]
+        registers[0xF] = self.framebuffer.draw_sprite(
+            x_coordinate, y_coordinate, memory, self.sprite_mode, start=self.register_i, height=height
+        )
 
-            for x_sprite_coordinate, bit in enumerate(f"{sprite_row:08b}"):
-                if int(bit) == 0x1:
-                    x = x_sprite_coordinate + x_coordinate
-                    y = y_sprite_coordinate + y_coordinate
+        rows = ((1 << height) - 1) << y_coordinate
 
-                    try:
-                        if self.display_memory[y, -x - 1] == 0:
-                            self.registers[0xF] = 1
+        if self.sprite_mode == SpriteMode.WRAP:
+            # Rows drawn past the bottom edge wrap around to the top.
+            rows |= rows >> 32
 
-                        self.display_memory[y, -x - 1] ^= 1
-                    except Exception:
-                        print(self.registers)
-                        exit()
+        self.dirty_rows |= rows & ALL_ROWS
+        self.side_effects += 1
 
         self.frame_ready = True
         self.program_counter += 2
 
-    def opcode_e000(self) -> None:
+    def sub_op_code_ex9e(self, x: int) -> None:
         """
-        EXNN
+        EX9E
 
+        Skips the next instruction if the key stored in VX is pressed.
+
+        :param x: Value of X from opcode (EX9E).
         :return: None.
         """
+        if self.keyboard[self.v[x]]:
+            self.program_counter += 4
+        else:
+            self.program_counter += 2
 
-        def sub_op_code_ex9e(x: int) -> None:
-            """
-            EX9E
-
-            Skips the next instruction if the key stored in VX is pressed.
-
-            :param x: Value of X from opcode (EX9E).
-            :return: None.
-            """
-            if self.keyboard[self.registers[x]]:
-                self.program_counter += 4
-            else:
-                self.program_counter += 2
-
-        def sub_op_code_exa1(x: int) -> None:
-            """
-            EXA1
-
-            Skips the next instruction if the key stored in VX isn't pressed.
-
-            :param x: Value if X from opcode (EXA1).
-            :return: None.
-            """
-            if not self.keyboard[self.registers[x]]:
-                self.program_counter += 4
-            else:
-                self.program_counter += 2
-
-        sub_op_code_lookup = {0xE09E: sub_op_code_ex9e, 0xE0A1: sub_op_code_exa1}
-
-        sub_op_code = sub_op_code_lookup[(self.current_op_code & 0xF0FF)]
-        x_value = (self.current_op_code & 0x0F00) >> 8
+    def sub_op_code_exa1(self, x: int) -> None:
+        """
+        EXA1
 
-        sub_op_code(x_value)
+        Skips the next instruction if the key stored in VX isn't pressed.
 
-    def opcode_f000(self) -> None:
+        :param x: Value if X from opcode (EXA1).
+        :return: None.
         """
-        FXNN
+        if not self.keyboard[self.v[x]]:
+            self.program_counter += 4
+        else:
+            self.program_counter += 2
 
-        :return: None.
+    def sub_op_code_fx07(self, x: int) -> None:
         """
+        FX07
 
-        def sub_op_code_fx07(x: int) -> None:
-            """
-            FX07
+        Sets VX to the value of the delay timer.
 
-            Sets VX to the value of the delay timer.
+        :param x: X value from current opcode (FXNN).
+        :return: None.
+        """
+        self.v[x] = self.delay_register
+        self.program_counter += 2
 
-            :param x: X value from current opcode (FXNN).
-            :return: None.
-            """
-            self.registers[x] = self.delay_register
-            self.program_counter += 2
+    def sub_op_code_fx0a(self, x: int) -> None:
+        """
+        FX0A
 
-        def sub_op_code_fx0a(x: int) -> None:
-            """
-            FX0A
+        A key press is awaited, and then stored in VX (Blocking operation).
 
-            A key press is awaited, and then stored in VX (Blocking operation).
+        :param x: X value from current opcode (FXNN).
+        :return: None.
+        """
+        for key, pressed in enumerate(self.keyboard):
+            if pressed:
+                self.v[x] = key
+                self.program_counter += 2
+                break
 
-            :param x: X value from current opcode (FXNN).
-            :return: None.
-            """
-            current_program_counter = self.program_counter
+    def sub_op_code_fx15(self, x: int) -> None:
+        """
+        FX15
 
-            for index, key in enumerate(self.keyboard):
-                if key:
-                    self.registers[x] = index
-                    self.program_counter += 2
-                    break
+        Sets the delay timer to VX.
 
-            if self.program_counter <= current_program_counter:
-                return
+        :param x: X value from current opcode (FXNN).
+        :return: None.
+        """
+        self.delay_register = self.v[x]
 
-        def sub_op_code_fx15(x: int) -> None:
-            """
-            FX15
+        self.program_counter += 2
 
-            Sets the delay timer to VX.
+    def sub_op_code_fx18(self, x: int) -> None:
+        """
+        FX18
 
-            :param x: X value from current opcode (FXNN).
-            :return: None.
-            """
-            self.delay_register = self.registers[x]
+        Sets the sound timer to VX.
 
-            self.program_counter += 2
+        :param x: X value from current opcode (FXNN).
+        :return: None.
+        """
+        self.sound_register = self.v[x]
 
-        def sub_op_code_fx18(x: int) -> None:
-            """
-            FX18
+        self.program_counter += 2
 
-            Sets the sound timer to VX.
+    def sub_op_code_fx1e(self, x: int) -> None:
+        """
+        FX1E
 
-            :param x: X value from current opcode (FXNN).
-            :return: None.
-            """
-            self.sound_register = self.registers[x]
+        Adds "VX" to "I".
 
-            self.program_counter += 2
+        VF is set to 1 when there is a range overflow (I+VX>0xFFF), and to 0 when there isn't.
 
-        def sub_op_code_fx1e(x: int) -> None:
-            """
-            FX1E
+        :param x: X value from current opcode (FXNN).
+        :return: None.
+        """
+        registers = self.v
+        self.register_i += registers[x]
 
-            Adds "VX" to "I".
+        if self.register_i + registers[x] > 0xFFF:
+            registers[0xF] = 1
+        else:
+            registers[0xF] = 0
 
-            VF is set to 1 when there is a range overflow (I+VX>0xFFF), and to 0 when there isn't.
+        self.program_counter += 2
 
-            :param x: X value from current opcode (FXNN).
-            :return: None.
-            """
-            self.register_i += self.registers[x]
+    def sub_op_code_fx29(self, x: int) -> None:
+        """
+        FX29
 
-            if self.register_i + self.registers[x] > 0xFFF:
-                self.registers[0xF] = 1
-            else:
-                self.registers[0xF] = 0
+        Sets I to the location of the sprite for the character in VX.
+        Characters 0-F (in hexadecimal) are represented by a 4x5 font.
 
-            self.program_counter += 2
+        :param x: X value from current opcode (FXNN).
+        :return: None.
+        """
+        # Each sprite is 5 bytes long (each sprite will use up 5 memory addresses)
+        self.register_i = self.v[x] * 0x5
 
-        def sub_op_code_fx29(x: int) -> None:
-            """
-            FX29
+        self.program_counter += 2
 
-            Sets I to the location of the sprite for the character in VX.
-            Characters 0-F (in hexadecimal) are represented by a 4x5 font.
+    def sub_op_code_fx33(self, x: int) -> None:
+        """
+        FX33
 
-            :param x: X value from current opcode (FXNN).
-            :return: None.
-            """
-            # Each sprite is 5 bytes long (each sprite will use up 5 memory addresses)
-            self.register_i = self.registers[x] * 0x5
+        Stores the binary-coded decimal representation of VX, with the most significant of three digits at the
+        address in I, the middle digit at I plus 1, and the least significant digit at I plus 2.
 
-            self.program_counter += 2
+        :param x: X value from current opcode (FXNN).
+        :return: None.
+        """
+        value = self.v[x]
+        memory = self.memory
+        address = self.register_i
 
-        def sub_op_code_fx33(x: int) -> None:
-            """
-            FX33
+        memory[address] = value // 100
+        memory[address + 1] = value // 10 % 10
+        memory[address + 2] = value % 10
 
-            Stores the binary-coded decimal representation of VX, with the most significant of three digits at the
-            address in I, the middle digit at I plus 1, and the least significant digit at I plus 2.
+        self.side_effects += 1
 
-            :param x: X value from current opcode (FXNN).
-            :return: None.
-            """
-            int_string = f"{self.registers[x]:03}"
+        self.program_counter += 2
 
-            for index, character in enumerate(int_string):
-                self.ram.set_address(self.register_i + index, int(character))
+    def sub_op_code_fx55(self, x: int) -> None:
+        """
+        FX55
 
-            self.program_counter += 2
+        Stores V0 to VX (including VX) in memory starting at address I.
+        The offset from I is increased by 1 for each value written, but I itself is left unmodified.
 
-        def sub_op_code_fx55(x: int) -> None:
-            """
-            FX55
+        :param x: X value from current opcode (FXNN).
+        :return: None.
+        """
+        memory = self.memory
+        address = self.register_i
+        # Copied as one slice, clamped to the end of memory (views can't change size) so the bytes that fit are still
+        # copied before faulting.
+        count = max(min(x + 1, len(memory) - address), 0)
 
-            Stores V0 to VX (including VX) in memory starting at address I.
-            The offset from I is increased by 1 for each value written, but I itself is left unmodified.
+        memory[address : address + count] = self.v[:count]
 
-            :param x: X value from current opcode (FXNN).
-            :return: None.
-            """
-            temp_i = self.register_i
+        if count <= x:
+            msg = f"FX55 stores past the end of memory at 0x{address + count:03X}"
+            raise IndexError(msg)
 
-            for index in range(0x0, x + 0x1):
-                self.ram.set_address(temp_i, self.registers[index])
-                temp_i += 1
+        self.side_effects += 1
 
-            self.program_counter += 2
+        self.program_counter += 2
 
-        def sub_op_code_fx65(x: int) -> None:
-            """
-            FX65
+    def sub_op_code_fx65(self, x: int) -> None:
+        """
+        FX65
 
-            Fills V0 to VX (including VX) with values from memory starting at address I.
-            The offset from I is increased by 1 for each value written, but I itself is left unmodified.
+        Fills V0 to VX (including VX) with values from memory starting at address I.
+        The offset from I is increased by 1 for each value written, but I itself is left unmodified.
 
-            :param x: X value from current opcode (FXNN).
-            :return: None.
-            """
-            temp_i = self.register_i
+        :param x: X value from current opcode (FXNN).
+        :return: None.
+        """
+        memory = self.memory
+        address = self.register_i
+        # Copied as one slice, clamped to the end of memory (views can't change size) so the bytes that fit are still
+        # copied before faulting.
+        count = max(min(x + 1, len(memory) - address), 0)
 
-            for index in range(0x0, x + 0x1):
-                self.registers[index] = self.ram[temp_i]
-                temp_i += 1
+        self.v[:count] = memory[address : address + count]
 
-            self.program_counter += 2
+        if count <= x:
+            msg = f"FX65 loads past the end of memory at 0x{address + count:03X}"
+            raise IndexError(msg)
 
-        sub_op_code_lookup = {
-            0xF007: sub_op_code_fx07,
-            0xF00A: sub_op_code_fx0a,
-            0xF015: sub_op_code_fx15,
-            0xF018: sub_op_code_fx18,
-            0xF01E: sub_op_code_fx1e,
-            0xF029: sub_op_code_fx29,
-            0xF033: sub_op_code_fx33,
-            0xF055: sub_op_code_fx55,
-            0xF065: sub_op_code_fx65,
-        }
-
-        sub_op_code = sub_op_code_lookup[(self.current_op_code & 0xF0FF)]
-        x_value = (self.current_op_code & 0x0F00) >> 8
-
-        sub_op_code(x_value)
+        self.program_counter += 2
@@ -0,0 +1,475 @@
+"""
+Basic-block compiler for the CHIP-8 interpreter.
+
+Straight-line runs of instructions are translated into Python source with the registers held in locals, compiled
+once and cached by their entry address. Instructions that touch the display, keyboard, timers or memory are left to
+the interpreter, which keeps the compiled code free of side effects outside of the registers, I, PC, the stack and
+the CXNN generator.
+
+BlockCompiler.attach replaces the interpreter's run, which executes exactly as Interpreter.run does (same budget,
+stop reasons, faults, idle loop fast-forwarding, cycles and side effects) a compiled block at a time wherever one fits
+in what's left of the budget.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Final, NamedTuple
+
+from chipmul8.interpreter import IDLE_CHECK_INTERVAL, StopReason
+from chipmul8.profiler import replace_attributes, restore_attributes
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from chipmul8.interpreter import Interpreter
+
+# Size of the regions used to track which compiled blocks need to be discarded when the guest writes to memory.
+PAGE_SIZE: Final = 0x100
+
+
+def _register(index: int) -> str:
+    """
+    Local variable name holding a register within a compiled block.
+
+    :param index: Register index.
+    :return: Variable name.
+    """
+    return f"v{index:x}"
+
+
+def _can_fault(op_code: int) -> bool:
+    """
+    Whether a compiled instruction can raise, i.e. 2NNN overflowing the stack or FX65 loading past the end of memory.
+
+    :param op_code: Opcode.
+    :return: True if the instruction can raise.
+    """
+    return op_code & 0xF000 == 0x2000 or op_code & 0xF0FF == 0xF065
+
+
+class Block(NamedTuple):
+    """
+    Compiled basic block.
+    """
+
+    # Executes the block, only committing the registers and I once every instruction succeeded.
+    function: Callable[[Interpreter], None]
+    # Number of instructions executed.
+    length: int
+    # Address following the block's last instruction.
+    end: int
+    # Address of the backward jump (1NNN) ending the block, checked for idle loops, otherwise -1.
+    jump: int
+
+
+class BlockCompiler:
+    """
+    Execution backend compiling basic blocks of CHIP-8 code into Python functions.
+    """
+
+    def __init__(self, cpu: Interpreter, max_block_length: int = 64) -> None:
+        """
+        :param cpu: Interpreter the compiled blocks execute against.
+        :param max_block_length: Maximum number of instructions compiled into a single block.
+        """
+        self.cpu = cpu
+        self.max_block_length = max_block_length
+
+        # Blocks by entry address, None where the first instruction has to be interpreted.
+        self.blocks: dict[int, Block | None] = {}
+        # Blocks cut short to fit the end of a budget, by entry address then length.
+        self.truncated: dict[int, dict[int, Block]] = {}
+        # Entry addresses of the blocks covering each page.
+        self.pages: dict[int, set[int]] = {}
+
+        self.replaced: dict[str, Any] | None = None
+
+    def attach(self) -> None:
+        """
+        Execute the interpreter through compiled blocks, until detached.
+
+        :return: None.
+        """
+        cpu = self.cpu
+        reset_idle = cpu.reset_idle
+
+        # The interpreter resets its idle loop state whenever memory is changed from outside the guest (loading a ROM
+        # or a state), which invalidates every block too.
+        def reset() -> None:
+            reset_idle()
+            self.reset()
+
+        self.replaced = replace_attributes(cpu, {"run": self.run, "reset_idle": reset})
+        self.reset()
+
+    def detach(self) -> None:
+        """
+        Execute the interpreter through its dispatch table again.
+
+        :return: None.
+        """
+        if self.replaced is not None:
+            restore_attributes(self.cpu, ("run", "reset_idle"), self.replaced)
+            self.replaced = None
+
+    def run(self, max_cycles: int) -> StopReason:  # noqa: PLR0912
+        """
+        Executes up to max_cycles instructions exactly as Interpreter.run does, running compiled blocks wherever they
+        fit in what's left of the budget and interpreting the rest.
+
+        :param max_cycles: Maximum number of cycles to execute.
+        :return: Reason execution stopped.
+        """
+        cpu = self.cpu
+        blocks = self.blocks
+        dispatch_table = cpu.dispatch_table
+        stop_table = cpu.stop_table
+        memory = cpu.memory
+
+        cycles = 0
+        reason = StopReason.BUDGET
+
+        idle_countdown = cpu.idle_countdown
+
+        try:
+            while cycles < max_cycles:
+                program_counter = cpu.program_counter
+                block = blocks[program_counter] if program_counter in blocks else self.compile_block(program_counter)
+
+                if block is not None and block.length > max_cycles - cycles:
+                    block = self.truncated_block(program_counter, max_cycles - cycles)
+
+                jump = -1
+
+                if block is not None:
+                    try:
+                        block.function(cpu)
+                    except Exception:
+                        # Nothing was committed, the interpreter re-executes from the entry address and reports the
+                        # faulting instruction. Blocks drawing random numbers end before any instruction that can
+                        # raise, so none are drawn twice.
+                        block = None
+                    else:
+                        cycles += block.length
+                        jump = block.jump
+
+                if block is None:
+                    op_code = memory[program_counter] << 8 | memory[program_counter + 1]
+                    cpu.current_op_code = op_code
+
+                    # Writes into compiled code discard its blocks, before executing so faulting writes do too.
+                    match op_code & 0xF0FF:
+                        case 0xF033:
+                            self.invalidate(cpu.register_i, cpu.register_i + 3)
+                        case 0xF055:
+                            self.invalidate(cpu.register_i, cpu.register_i + ((op_code & 0x0F00) >> 8) + 1)
+
+                    dispatch_table[op_code](cpu)
+                    cycles += 1
+
+                    stop = stop_table[op_code]
+
+                    if stop == StopReason.IDLE:
+                        if cpu.program_counter <= program_counter:
+                            jump = program_counter
+                    # FX0A only stops execution while it is still waiting, i.e. the program counter didn't move.
+                    elif stop and (stop == StopReason.FRAME or cpu.program_counter == program_counter):
+                        reason = StopReason(stop)
+                        break
+
+                # Only backward jumps can close a loop, every few are checked, as in Interpreter.run.
+                if jump >= 0:
+                    idle_countdown -= 1
+
+                    if not idle_countdown:
+                        idle_countdown = IDLE_CHECK_INTERVAL
+                        period = cpu.idle_period(jump, cpu.cycles + cycles)
+
+                        if period:
+                            skipped = (max_cycles - cycles) // period * period
+                            cycles += skipped
+                            cpu.idle_cycles += skipped
+                            reason = StopReason.IDLE
+        except Exception as e:
+            cpu.fault = e
+            reason = StopReason.FAULT
+
+        cpu.cycles += cycles
+        cpu.idle_countdown = idle_countdown
+
+        return reason
+
+    def invalidate(self, start: int, end: int) -> None:
+        """
+        Discard compiled blocks covering a range of memory.
+
+        :param start: First address written.
+        :param end: Address following the last address written.
+        :return: None.
+        """
+        for page in range(start // PAGE_SIZE, (end - 1) // PAGE_SIZE + 1):
+            for entry in self.pages.pop(page, ()):
+                self.blocks.pop(entry, None)
+                self.truncated.pop(entry, None)
+
+    def reset(self) -> None:
+        """
+        Discard every compiled block.
+
+        :return: None.
+        """
+        self.blocks.clear()
+        self.truncated.clear()
+        self.pages.clear()
+
+    def compile_block(self, entry: int) -> Block | None:
+        """
+        Compile and cache the basic block starting at the provided address.
+
+        :param entry: Address of the first instruction in the block.
+        :return: Compiled block, or None if the first instruction has to be interpreted.
+        """
+        block = self._compile(entry, self.max_block_length)
+        self.blocks[entry] = block
+        self._track(entry, entry + 2 if block is None else block.end)
+
+        return block
+
+    def truncated_block(self, entry: int, length: int) -> Block:
+        """
+        Compile and cache the first instructions of a block, to execute the end of a budget.
+
+        :param entry: Address of the first instruction in the block, which can be compiled.
+        :param length: Number of instructions, less than the block's.
+        :return: Compiled block.
+        """
+        truncated = self.truncated.setdefault(entry, {})
+        block = truncated.get(length)
+
+        if block is None:
+            block = self._compile(entry, length)
+
+            if block is None:
+                msg = f"No block can be compiled at {entry:#05x}"
+                raise ValueError(msg)
+
+            truncated[length] = block
+            self._track(entry, block.end)
+
+        return block
+
+    def _compile(self, entry: int, max_length: int) -> Block | None:
+        """
+        Compile the basic block starting at the provided address.
+
+        :param entry: Address of the first instruction in the block.
+        :param max_length: Maximum number of instructions compiled.
+        :return: Compiled block, or None if the first instruction has to be interpreted.
+        """
+        source = self.generate_source(entry, max_length)
+
+        if source is None:
+            return None
+
+        code, end, length, jump = source
+
+        namespace: dict[str, object] = {}
+        exec(compile(code, f"<chip8 block {entry:#05x}>", "exec"), namespace)  # noqa: S102
+
+        function: Callable[[Interpreter], None] = namespace["block"]  # type: ignore[assignment]
+
+        return Block(function, length, end, jump)
+
+    def _track(self, entry: int, end: int) -> None:
+        """
+        Record the pages a block covers, so writes to them discard it.
+
+        :param entry: Address of the first instruction in the block.
+        :param end: Address following the block.
+        :return: None.
+        """
+        for page in range(entry // PAGE_SIZE, (end - 1) // PAGE_SIZE + 1):
+            self.pages.setdefault(page, set()).add(entry)
+
+    def generate_source(self, entry: int, max_length: int) -> tuple[str, int, int, int] | None:
+        """
+        Generate Python source for the basic block starting at the provided address.
+
+        :param entry: Address of the first instruction in the block.
+        :param max_length: Maximum number of instructions in the block.
+        :return: Block source, the address following the block, its number of instructions and the address of the
+            backward jump ending it (-1 if none), or None if no instruction can be compiled.
+        """
+        memory = self.cpu.memory
+
+        body: list[str] = []
+        used: set[int] = set()
+        written: set[int] = set()
+        register_i_written = False
+        draws = 0
+        next_address: str | None = None
+        backward_jump = -1
+
+        address = entry
+        count = 0
+        op_code = 0
+
+        while count < max_length and address + 1 < len(memory):
+            op_code = memory[address] << 8 | memory[address + 1]
+
+            # Random numbers can't be put back, so a block drawing them never re-executes on the interpreter.
+            if draws and _can_fault(op_code):
+                break
+
+            statement = self._translate(op_code, address)
+
+            if statement is None:
+                break
+
+            lines, reads, writes, writes_i, jump = statement
+
+            body.extend(lines)
+            used.update(reads, writes)
+            written.update(writes)
+            register_i_written |= writes_i
+            draws += op_code & 0xF000 == 0xC000
+
+            address += 2
+            count += 1
+
+            if jump is not None:
+                next_address = jump
+
+                if op_code & 0xF000 == 0x1000 and op_code & 0x0FFF <= address - 2:
+                    backward_jump = address - 2
+
+                break
+
+        if count == 0:
+            return None
+
+        if next_address is None:
+            next_address = str(address)
+            op_code = memory[address - 2] << 8 | memory[address - 1]
+
+        source = [
+            "def block(cpu):",
+            "    registers = cpu.v",
+            "    i = cpu.register_i",
+        ]
+
+        if draws:
+            source.append("    randint = cpu.random.randint")
+
+        source.extend(f"    {_register(index)} = registers[{index}]" for index in sorted(used))
+        source.extend(f"    {line}" for line in body)
+        source.extend(f"    registers[{index}] = {_register(index)}" for index in sorted(written))
+
+        if register_i_written:
+            source.append("    cpu.register_i = i")
+
+        if draws:
+            source.append(f"    cpu.side_effects += {draws}")
+
+        source.extend(
+            [
+                f"    cpu.program_counter = {next_address}",
+                f"    cpu.current_op_code = {op_code}",
+            ]
+        )
+
+        return "\n".join(source) + "\n", address, count, backward_jump
+
+    @staticmethod
+    def _translate(  # noqa: PLR0911, PLR0912
+        op_code: int, address: int
+    ) -> tuple[list[str], set[int], set[int], bool, str | None] | None:
+        """
+        Translate a single instruction into Python statements.
+
+        Statements are emitted in the same order as the interpreter's handlers update state, so register aliasing
+        (e.g. X or Y being VF) behaves identically.
+
+        :param op_code: Opcode to translate.
+        :param address: Address of the instruction.
+        :return: Statements, registers read, registers written, whether I is written and the expression for the next
+            program counter if the instruction ends the block; None if the instruction has to be interpreted.
+        """
+        x = (op_code & 0x0F00) >> 8
+        y = (op_code & 0x00F0) >> 4
+        nn = op_code & 0x00FF
+        nnn = op_code & 0x0FFF
+
+        vx = _register(x)
+        vy = _register(y)
+        vf = _register(0xF)
+
+        skip = f"{address + 4} if {{}} else {address + 2}"
+
+        match op_code & 0xF000, op_code & 0xF00F, op_code & 0xF0FF:
+            case 0x0000, _, _ if op_code & 0x00FF == 0xEE:
+                lines = [
+                    "next_address = cpu.stack[cpu.stack_pointer - 1] + 2",
+                    "cpu.stack_pointer -= 1",
+                ]
+                return lines, set(), set(), False, "next_address"
+            case 0x1000, _, _:
+                return [], set(), set(), False, str(nnn)
+            case 0x2000, _, _:
+                lines = [
+                    f"cpu.stack[cpu.stack_pointer] = {address}",
+                    "cpu.stack_pointer += 1",
+                ]
+                return lines, set(), set(), False, str(nnn)
+            case 0x3000, _, _:
+                return [], {x}, set(), False, skip.format(f"{vx} == {nn}")
+            case 0x4000, _, _:
+                return [], {x}, set(), False, skip.format(f"{vx} != {nn}")
+            case 0x5000, _, _:
+                return [], {x, y}, set(), False, skip.format(f"{vx} == {vy}")
+            case 0x6000, _, _:
+                return [f"{vx} = {nn}"], set(), {x}, False, None
+            case 0x7000, _, _:
+                return [f"{vx} = ({vx} + {nn}) & 0xFF"], {x}, {x}, False, None
+            case 0x8000, 0x8000, _:
+                return [f"{vx} = {vy}"], {y}, {x}, False, None
+            case 0x8000, 0x8001, _:
+                return [f"{vx} = {vx} | {vy}"], {x, y}, {x}, False, None
+            case 0x8000, 0x8002, _:
+                return [f"{vx} = {vx} & {vy}"], {x, y}, {x}, False, None
+            case 0x8000, 0x8003, _:
+                return [f"{vx} = {vx} ^ {vy}"], {x, y}, {x}, False, None
+            case 0x8000, 0x8004, _:
+                lines = [f"{vf} = 1 if {vy} > 0xFF - {vx} else 0", f"{vx} = ({vx} + {vy}) & 0xFF"]
+                return lines, {x, y}, {x, 0xF}, False, None
+            case 0x8000, 0x8005, _:
+                lines = [f"{vf} = 0 if {vy} > {vx} else 1", f"{vx} = ({vx} - {vy}) & 0xFF"]
+                return lines, {x, y}, {x, 0xF}, False, None
+            case 0x8000, 0x8006, _:
+                lines = [f"{vf} = {vx} & 0x1", f"{vx} = {vx} >> 1"]
+                return lines, {x}, {x, 0xF}, False, None
+            case 0x8000, 0x8007, _:
+                lines = [f"{vf} = 0 if {vx} > {vy} else 1", f"{vx} = ({vy} - {vx}) & 0xFF"]
+                return lines, {x, y}, {x, 0xF}, False, None
+            case 0x8000, 0x800E, _:
+                lines = [f"{vf} = {vx} >> 7", f"{vx} = ({vx} << 1) & 0xFF"]
+                return lines, {x}, {x, 0xF}, False, None
+            case 0x9000, _, _:
+                return [], {x, y}, set(), False, skip.format(f"{vx} != {vy}")
+            case 0xA000, _, _:
+                return [f"i = {nnn}"], set(), set(), True, None
+            case 0xB000, _, _:
+                return [], {0}, set(), False, f"{nnn} + {_register(0)}"
+            case 0xC000, _, _:
+                return [f"{vx} = {nn} & randint(0, 255)"], set(), {x}, False, None
+            case 0xF000, _, 0xF01E:
+                lines = [f"i = i + {vx}", f"{vf} = 1 if i + {vx} > 0xFFF else 0"]
+                return lines, {x}, {0xF}, True, None
+            case 0xF000, _, 0xF029:
+                return [f"i = {vx} * 0x5"], {x}, set(), True, None
+            case 0xF000, _, 0xF065:
+                lines = [f"{_register(index)} = memory[i + {index}]" for index in range(x + 1)]
+                lines.insert(0, "memory = cpu.memory")
+                return lines, set(), set(range(x + 1)), False, None
+
+        return None
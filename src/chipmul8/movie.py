@@ -0,0 +1,240 @@
+"""
+Input movies: recordings of the keys held each frame, replayed deterministically.
+
+A movie names the ROM it was recorded against (by SHA-256), the seed of the interpreter's CXNN generator, the
+instruction rate and sprite mode, and holds the key mask of every frame. Given those, a replay executes exactly the
+same instructions as the recording. A short hash of the display is recorded every checkpoint_interval frames, so a
+replay that diverges from its recording is caught within a second of emulated time rather than at the end.
+
+Nothing here imports pygame or OpenGL.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import struct
+import zlib
+from io import BytesIO
+from typing import TYPE_CHECKING, Final
+
+from chipmul8.display import SpriteMode
+from chipmul8.interpreter import Interpreter, StopReason
+from chipmul8.scheduler import TIMER_FREQUENCY, FrameScheduler
+
+if TYPE_CHECKING:
+    from chipmul8.display import Framebuffer
+
+# Movie files start with: magic, ROM SHA-256, seed, instructions per second, sprite mode, checkpoint interval and
+# number of frames. The zlib compressed key masks (16-bit, one per frame) and checkpoints follow.
+_movie_magic: Final = b"C8M\x01"
+_movie_header: Final = struct.Struct("<4s32sQIBHI")
+_sprite_modes: Final = tuple(SpriteMode)
+
+# Size of the display hash recorded at each checkpoint.
+CHECKPOINT_SIZE: Final = 8
+
+
+class ReplayDivergedError(Exception):
+    """
+    A replay's display no longer matches the recording.
+    """
+
+    def __init__(self, frame: int) -> None:
+        """
+        :param frame: Number of frames replayed when the mismatch was detected.
+        """
+        super().__init__(f"Replay diverged from the recording by frame {frame}")
+        self.frame = frame
+
+
+def rom_hash(rom: bytes) -> bytes:
+    """
+    Identify a ROM.
+
+    :param rom: Rom contents.
+    :return: SHA-256 digest of the ROM.
+    """
+    return hashlib.sha256(rom).digest()
+
+
+def checkpoint(cpu: Interpreter) -> bytes:
+    """
+    Fingerprint the display, identical displays hash identically whichever framebuffer backend drew them.
+
+    :param cpu: Interpreter to inspect.
+    :return: Display hash.
+    """
+    return hashlib.blake2b(cpu.framebuffer.to_bytes(), digest_size=CHECKPOINT_SIZE).digest()
+
+
+class Movie:
+    """
+    Recording of the keys held during each frame of a run.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        rom_hash: bytes,
+        seed: int,
+        *,
+        instructions_per_second: int = 700,
+        sprite_mode: SpriteMode = SpriteMode.CLIP,
+        checkpoint_interval: int = TIMER_FREQUENCY,
+        key_masks: list[int] | None = None,
+        checkpoints: list[bytes] | None = None,
+    ) -> None:
+        """
+        :param rom_hash: SHA-256 digest of the ROM, see rom_hash.
+        :param seed: Seed of the interpreter's CXNN generator.
+        :param instructions_per_second: Number of instructions executed per second of emulated time.
+        :param sprite_mode: Behaviour of sprites drawn past the edge of the display.
+        :param checkpoint_interval: Number of frames between display checkpoints.
+        :param key_masks: Key mask held during each frame.
+        :param checkpoints: Display hash after every checkpoint_interval frames.
+        """
+        self.rom_hash = rom_hash
+        self.seed = seed
+        self.instructions_per_second = instructions_per_second
+        self.sprite_mode = sprite_mode
+        self.checkpoint_interval = checkpoint_interval
+
+        self.key_masks = key_masks if key_masks is not None else []
+        self.checkpoints = checkpoints if checkpoints is not None else []
+
+    def __len__(self) -> int:
+        """
+        Number of frames recorded.
+
+        :return: Number of frames.
+        """
+        return len(self.key_masks)
+
+    def create_interpreter(self, framebuffer: Framebuffer | None = None) -> Interpreter:
+        """
+        Create an interpreter configured as the recording was, without a ROM loaded.
+
+        :param framebuffer: Display backend, defaults to a byte per pixel array.
+        :return: Interpreter.
+        """
+        return Interpreter(sprite_mode=self.sprite_mode, framebuffer=framebuffer, seed=self.seed)
+
+    def record_frame(self, cpu: Interpreter) -> None:
+        """
+        Record a frame, called after the frame has run with the keys held throughout it.
+
+        :param cpu: Interpreter being recorded.
+        :return: None.
+        """
+        self.key_masks.append(cpu.key_mask)
+
+        if len(self.key_masks) % self.checkpoint_interval == 0:
+            self.checkpoints.append(checkpoint(cpu))
+
+    def truncate(self, frames: int) -> None:
+        """
+        Discard every frame after the first frames, e.g. after rewinding.
+
+        :param frames: Number of frames to keep.
+        :return: None.
+        """
+        del self.key_masks[frames:]
+        del self.checkpoints[frames // self.checkpoint_interval :]
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialise the movie.
+
+        :return: Movie file contents.
+        """
+        header = _movie_header.pack(
+            _movie_magic,
+            self.rom_hash,
+            self.seed,
+            self.instructions_per_second,
+            _sprite_modes.index(self.sprite_mode),
+            self.checkpoint_interval,
+            len(self.key_masks),
+        )
+        body = struct.pack(f"<{len(self.key_masks)}H", *self.key_masks) + b"".join(self.checkpoints)
+
+        return header + zlib.compress(body)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Movie:
+        """
+        Load a movie serialised by to_bytes.
+
+        :param data: Movie file contents.
+        :return: Movie.
+        """
+        msg = "Not a chipmul8 movie"
+
+        if len(data) < _movie_header.size or not data.startswith(_movie_magic):
+            raise ValueError(msg)
+
+        _, digest, seed, instructions_per_second, sprite_mode, checkpoint_interval, frames = _movie_header.unpack_from(
+            data
+        )
+
+        try:
+            body = zlib.decompress(data[_movie_header.size :])
+        except zlib.error:
+            raise ValueError(msg) from None
+
+        if (
+            not checkpoint_interval
+            or sprite_mode >= len(_sprite_modes)
+            or len(body) != frames * 2 + frames // checkpoint_interval * CHECKPOINT_SIZE
+        ):
+            raise ValueError(msg)
+
+        checkpoints = body[frames * 2 :]
+
+        return cls(
+            digest,
+            seed,
+            instructions_per_second=instructions_per_second,
+            sprite_mode=_sprite_modes[sprite_mode],
+            checkpoint_interval=checkpoint_interval,
+            key_masks=list(struct.unpack_from(f"<{frames}H", body)),
+            checkpoints=[
+                checkpoints[offset : offset + CHECKPOINT_SIZE] for offset in range(0, len(checkpoints), CHECKPOINT_SIZE)
+            ],
+        )
+
+
+def replay(movie: Movie, rom: bytes, framebuffer: Framebuffer | None = None) -> Interpreter:
+    """
+    Replay a movie as fast as possible, verifying every checkpoint.
+
+    Replay stops early if an instruction faults, which is where a recording of a faulting ROM ends.
+
+    :param movie: Movie to replay.
+    :param rom: Rom contents, must be the ROM the movie was recorded against.
+    :param framebuffer: Display backend, defaults to a byte per pixel array.
+    :return: Interpreter in its final state.
+    """
+    if rom_hash(rom) != movie.rom_hash:
+        msg = "The movie was recorded against a different ROM"
+        raise ValueError(msg)
+
+    cpu = movie.create_interpreter(framebuffer)
+    cpu.load_rom(BytesIO(rom))
+
+    scheduler = FrameScheduler(movie.instructions_per_second)
+    checkpoints = iter(movie.checkpoints)
+    checkpoint_interval = movie.checkpoint_interval
+    held = 0
+
+    for frame, key_mask in enumerate(movie.key_masks, start=1):
+        # Only rebuild the keyboard when the held keys change.
+        if key_mask != held:
+            cpu.key_mask = held = key_mask
+
+        if cpu.run_frame(scheduler.cycles_for_next_frame()) == StopReason.FAULT:
+            break
+
+        if frame % checkpoint_interval == 0 and checkpoint(cpu) != next(checkpoints):
+            raise ReplayDivergedError(frame)
+
+    return cpu
@@ -0,0 +1,558 @@
+"""
+Profilers: where the emulator spends its time (host) and where the ROM spends its cycles (guest).
+
+The host profiler counts the executions and host nanoseconds of every opcode handler, and times the phases of the
+game loop (emulating, polling events, drawing and sleeping). The guest profiler counts executions per address and
+attributes cycles to the CHIP-8 subroutines they were spent in, following 2NNN calls and 00EE returns.
+
+Both work by replacing attributes on the instances being profiled, an interpreter's dispatch table and methods of the
+interpreter and game engine, so the interpreter's own loop is unchanged and costs nothing extra while no profiler is
+attached. They can be attached to the same interpreter, attach the host profiler first to keep the guest profiler's
+bookkeeping out of its timings, and detach in the reverse order.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import Counter, defaultdict
+from functools import cache
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Final
+
+import numpy as np
+
+from chipmul8.headless import encode_png
+from chipmul8.interpreter import Interpreter, StopReason, op_code_handlers
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from chipmul8.engine import GameEngine
+
+# Operand => characters replacing its nibbles in an opcode pattern (e.g. 8XY4), and the nibbles it occupies.
+_operand_nibbles: Final = MappingProxyType(
+    {"x": ("X", 1), "y": ("Y", 2), "n": ("N", 3), "nn": ("NN", 2), "nnn": ("NNN", 1)}
+)
+
+
+# Number of addresses in the guest's address space.
+ADDRESS_SPACE: Final = 0x1000
+
+# Stack entry of the subroutines called before the guest profiler was attached (or a state was loaded).
+UNKNOWN_SUBROUTINE: Final = -1
+
+
+def replace_attributes(target: object, attributes: dict[str, Any]) -> dict[str, Any]:
+    """
+    Set instance attributes, e.g. to instrument methods.
+
+    :param target: Instance to modify.
+    :param attributes: Attribute name => new value.
+    :return: The instance attributes replaced, to pass to restore_attributes. Attributes the instance didn't set
+        itself (i.e. the class's) are absent.
+    """
+    replaced = {name: vars(target)[name] for name in attributes if name in vars(target)}
+
+    for name, value in attributes.items():
+        setattr(target, name, value)
+
+    return replaced
+
+
+def restore_attributes(target: object, names: tuple[str, ...], replaced: dict[str, Any]) -> None:
+    """
+    Undo replace_attributes.
+
+    :param target: Instance modified.
+    :param names: Names of the attributes replaced.
+    :param replaced: Return value of replace_attributes.
+    :return: None.
+    """
+    for name in names:
+        if name in replaced:
+            setattr(target, name, replaced[name])
+        else:
+            delattr(target, name)
+
+
+def op_code_pattern(op_code: int) -> str:
+    """
+    Name the instruction an opcode decodes to, in the usual notation (e.g. 0x8AB4 => 8XY4).
+
+    :param op_code: Opcode.
+    :return: Instruction pattern, or "unknown" if the opcode isn't an instruction.
+    """
+    mask, handlers = op_code_handlers[op_code & 0xF000]
+
+    if (op_code & mask) not in handlers:
+        return "unknown"
+
+    _, operands = handlers[op_code & mask]
+    pattern = list(f"{op_code & mask:04X}")
+
+    for operand in operands:
+        characters, nibble = _operand_nibbles[operand]
+        pattern[nibble : nibble + len(characters)] = characters
+
+    return "".join(pattern)
+
+
+@cache
+def op_code_patterns() -> tuple[str, ...]:
+    """
+    Pattern of every opcode, computed once.
+
+    :return: op_code_pattern of each opcode, indexed by opcode.
+    """
+    return tuple(map(op_code_pattern, range(0x10000)))
+
+
+class HostProfiler:
+    """
+    Profiles interpreters and game engines it's attached to.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialise empty statistics, the wall clock starts now (see start_clock).
+        """
+        self.start = time.perf_counter_ns()
+
+        # Instruction pattern => [executions, nanoseconds].
+        self.instructions: defaultdict[str, list[int]] = defaultdict(lambda: [0, 0])
+        # Game loop phase => [calls, nanoseconds].
+        self.phases: defaultdict[str, list[int]] = defaultdict(lambda: [0, 0])
+
+        # Interpreters attached and the cycle count each was attached at.
+        self.interpreters: list[tuple[Interpreter, int]] = []
+        # Instance => attributes replaced when attaching to it.
+        self.replaced: dict[int, dict[str, Any]] = {}
+
+    def start_clock(self) -> None:
+        """
+        Restart the wall clock, e.g. once every profiler is attached (instrumenting takes a moment).
+
+        :return: None.
+        """
+        self.start = time.perf_counter_ns()
+
+    def timed(self, phase: str, function: Callable[..., Any]) -> Callable[..., Any]:
+        """
+        Wrap a function, accumulating its calls and duration into a phase.
+
+        :param phase: Phase name.
+        :param function: Function to time.
+        :return: Timed function.
+        """
+        statistics = self.phases[phase]
+        perf_counter_ns = time.perf_counter_ns
+
+        def timed_function(*args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+            start = perf_counter_ns()
+
+            try:
+                return function(*args, **kwargs)
+            finally:
+                statistics[0] += 1
+                statistics[1] += perf_counter_ns() - start
+
+        return timed_function
+
+    def instrument(self, handler: Callable[[Interpreter], None], pattern: str) -> Callable[[Interpreter], None]:
+        """
+        Wrap a dispatch table entry, accumulating its executions and duration.
+
+        :param handler: Dispatch table entry.
+        :param pattern: Instruction pattern the entry is counted under.
+        :return: Instrumented entry.
+        """
+        statistics = self.instructions[pattern]
+        perf_counter_ns = time.perf_counter_ns
+
+        def instrumented(cpu: Interpreter) -> None:
+            start = perf_counter_ns()
+            handler(cpu)
+            statistics[0] += 1
+            statistics[1] += perf_counter_ns() - start
+
+        return instrumented
+
+    def attach(self, cpu: Interpreter) -> None:
+        """
+        Profile an interpreter's instructions, and its frames as the emulate phase.
+
+        :param cpu: Interpreter to profile.
+        :return: None.
+        """
+        self.replaced[id(cpu)] = replace_attributes(
+            cpu,
+            {
+                "dispatch_table": tuple(map(self.instrument, cpu.dispatch_table, op_code_patterns())),
+                "run_frame": self.timed("emulate", cpu.run_frame),
+            },
+        )
+
+        self.interpreters.append((cpu, cpu.cycles))
+
+    def attach_engine(self, engine: GameEngine) -> None:
+        """
+        Profile a game engine: its interpreter and each phase of its game loop.
+
+        :param engine: Game engine to profile.
+        :return: None.
+        """
+        self.attach(engine.cpu)
+
+        self.replaced[id(engine)] = replace_attributes(
+            engine, {"poll_events": self.timed("events", engine.poll_events), "draw": self.timed("draw", engine.draw)}
+        )
+        self.replaced[id(engine.scheduler)] = replace_attributes(
+            engine.scheduler, {"wait": self.timed("sleep", engine.scheduler.wait)}
+        )
+
+    def detach(self, cpu: Interpreter) -> None:
+        """
+        Stop profiling an interpreter, restoring its dispatch table.
+
+        :param cpu: Interpreter to stop profiling.
+        :return: None.
+        """
+        restore_attributes(cpu, ("dispatch_table", "run_frame"), self.replaced.pop(id(cpu)))
+
+    def report(self) -> dict[str, Any]:
+        """
+        Summarise the statistics gathered so far.
+
+        :return: JSON serialisable report.
+        """
+        wall_time = (time.perf_counter_ns() - self.start) / 1e9
+        executed = sum(count for count, _ in self.instructions.values())
+        cycles = sum(cpu.cycles - start for cpu, start in self.interpreters)
+        frames = self.phases["emulate"][0] if "emulate" in self.phases else 0
+        instruction_time = sum(nanoseconds for _, nanoseconds in self.instructions.values())
+
+        families: defaultdict[str, list[int]] = defaultdict(lambda: [0, 0])
+
+        for pattern, (count, nanoseconds) in self.instructions.items():
+            family = families[f"{pattern[0]}XXX" if pattern != "unknown" else pattern]
+            family[0] += count
+            family[1] += nanoseconds
+
+        def rows(statistics: dict[str, list[int]], total: int, unit: str) -> list[dict[str, Any]]:
+            return [
+                {
+                    "name": name,
+                    unit: count,
+                    "seconds": nanoseconds / 1e9,
+                    "nanoseconds_per_call": nanoseconds / count if count else 0.0,
+                    "share": nanoseconds / total if total else 0.0,
+                }
+                for name, (count, nanoseconds) in sorted(statistics.items(), key=lambda item: -item[1][1])
+                if count
+            ]
+
+        return {
+            "wall_time": wall_time,
+            "instructions_executed": executed,
+            "cycles": cycles,
+            "frames": frames,
+            "instructions_per_second": executed / wall_time if wall_time else 0.0,
+            "cycles_per_second": cycles / wall_time if wall_time else 0.0,
+            "frames_per_second": frames / wall_time if wall_time else 0.0,
+            "phases": rows(self.phases, int(wall_time * 1e9), "calls"),
+            "families": rows(families, instruction_time, "executions"),
+            "instructions": rows(self.instructions, instruction_time, "executions"),
+        }
+
+
+class GuestProfiler:
+    """
+    Profiles the ROMs run by the interpreters it's attached to.
+
+    Subroutines are identified by their entry address (the main program by the address execution was at when the
+    profiler was attached). Cycles spent in fast-forwarded idle loops count towards the subroutine the loop is in, but
+    not towards the execution counts of its addresses, which only count instructions actually executed.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialise empty statistics.
+        """
+        # Address => number of instructions executed there.
+        self.executions = [0] * ADDRESS_SPACE
+        # Stack of subroutine entry addresses, outermost first => cycles spent with it as the call stack.
+        self.stacks: Counter[tuple[int, ...]] = Counter()
+        # (caller, callee) => number of calls.
+        self.calls: Counter[tuple[int, int]] = Counter()
+        # Entry address of the main program and the current call stack.
+        self.main = UNKNOWN_SUBROUTINE
+        self.stack: tuple[int, ...] = ()
+        # Number of instructions executed, in a list so every dispatch table entry can share it.
+        self.executed = [0]
+        # Cycles fast-forwarded through idle loops.
+        self.skipped_cycles = 0
+
+        # Interpreters attached.
+        self.interpreters: list[Interpreter] = []
+        # Instance => attributes replaced when attaching to it.
+        self.replaced: dict[int, dict[str, Any]] = {}
+
+    def instrument(self, handler: Callable[[Interpreter], None], op_code: int) -> Callable[[Interpreter], None]:
+        """
+        Wrap a dispatch table entry, counting its executions by address and call stack.
+
+        :param handler: Dispatch table entry.
+        :param op_code: Opcode the entry executes.
+        :return: Instrumented entry.
+        """
+        executions = self.executions
+        stacks = self.stacks
+        executed = self.executed
+
+        def counted(cpu: Interpreter) -> None:
+            program_counter = cpu.program_counter
+            handler(cpu)
+            executions[program_counter] += 1
+            stacks[self.stack] += 1
+            executed[0] += 1
+
+        if op_code & 0xF000 == 0x2000:
+
+            def called(cpu: Interpreter) -> None:
+                counted(cpu)
+                self.enter(cpu)
+
+            return called
+
+        if op_code == 0x00EE:
+
+            def returned(cpu: Interpreter) -> None:
+                counted(cpu)
+                self.leave(cpu)
+
+            return returned
+
+        return counted
+
+    def enter(self, cpu: Interpreter) -> None:
+        """
+        Push the subroutine just called (2NNN).
+
+        :param cpu: Interpreter profiled.
+        :return: None.
+        """
+        stack = self.synchronise(cpu.stack_pointer - 1)
+        self.calls[stack[-1], cpu.program_counter] += 1
+        self.stack = (*stack, cpu.program_counter)
+
+    def leave(self, cpu: Interpreter) -> None:
+        """
+        Pop the subroutine just returned from (00EE).
+
+        :param cpu: Interpreter profiled.
+        :return: None.
+        """
+        self.stack = self.synchronise(cpu.stack_pointer)
+
+    def synchronise(self, depth: int) -> tuple[int, ...]:
+        """
+        Fit the call stack to the interpreter's stack depth, which differs after calls the profiler didn't see.
+
+        :param depth: Number of subroutine calls the interpreter's stack holds.
+        :return: Call stack with the main program and depth subroutines.
+        """
+        # Returning with an empty stack leaves the stack pointer negative.
+        depth = max(depth, 0)
+        stack = self.stack[: depth + 1] or (self.main,)
+
+        return stack + (UNKNOWN_SUBROUTINE,) * (depth + 1 - len(stack))
+
+    def attach(self, cpu: Interpreter) -> None:
+        """
+        Profile an interpreter.
+
+        :param cpu: Interpreter to profile.
+        :return: None.
+        """
+        run = cpu.run
+        executed = self.executed
+
+        def counted_run(max_cycles: int) -> StopReason:
+            cycles = cpu.cycles
+            instructions = executed[0]
+            reason = run(max_cycles)
+
+            # Cycles executed without dispatching an instruction were fast-forwarded.
+            skipped = cpu.cycles - cycles - (executed[0] - instructions)
+
+            if skipped:
+                self.stacks[self.stack] += skipped
+                self.skipped_cycles += skipped
+
+            return reason
+
+        if not self.stack:
+            self.main = cpu.program_counter
+
+        self.stack = self.synchronise(cpu.stack_pointer)
+        self.replaced[id(cpu)] = replace_attributes(
+            cpu,
+            {
+                "dispatch_table": tuple(
+                    self.instrument(handler, op_code) for op_code, handler in enumerate(cpu.dispatch_table)
+                ),
+                "run": counted_run,
+            },
+        )
+        self.interpreters.append(cpu)
+
+    def detach(self, cpu: Interpreter) -> None:
+        """
+        Stop profiling an interpreter, restoring its dispatch table.
+
+        :param cpu: Interpreter to stop profiling.
+        :return: None.
+        """
+        restore_attributes(cpu, ("dispatch_table", "run"), self.replaced.pop(id(cpu)))
+
+    def name(self, address: int) -> str:
+        """
+        Name a subroutine in reports.
+
+        :param address: Entry address.
+        :return: Subroutine name.
+        """
+        if address == self.main:
+            return "main"
+
+        if address == UNKNOWN_SUBROUTINE:
+            return "unknown"
+
+        return f"sub_{address:03X}"
+
+    def subroutines(self) -> list[dict[str, Any]]:
+        """
+        Cycles spent in each subroutine.
+
+        Inclusive cycles include the subroutines it called, exclusive cycles don't.
+
+        :return: Subroutine rows, most inclusive cycles first.
+        """
+        inclusive: Counter[int] = Counter()
+        exclusive: Counter[int] = Counter()
+        calls: Counter[int] = Counter()
+
+        for stack, cycles in self.stacks.items():
+            exclusive[stack[-1]] += cycles
+
+            # Recursive subroutines only count once per stack.
+            for address in set(stack):
+                inclusive[address] += cycles
+
+        for (_, callee), count in self.calls.items():
+            calls[callee] += count
+
+        return [
+            {
+                "name": self.name(address),
+                "calls": calls[address],
+                "inclusive_cycles": cycles,
+                "exclusive_cycles": exclusive[address],
+            }
+            for address, cycles in inclusive.most_common()
+        ]
+
+    def folded_stacks(self) -> str:
+        """
+        Export the cycles spent in each call stack in the folded format read by flame graph tools.
+
+        :return: One "main;sub_2A0;sub_31C <cycles>" line per call stack.
+        """
+        return "".join(
+            ";".join(map(self.name, stack)) + f" {cycles}\n" for stack, cycles in sorted(self.stacks.items())
+        )
+
+    def heatmap(self, memory: bytes | bytearray | memoryview, width: int = 64) -> bytes:
+        """
+        Render a heatmap of RAM as an RGB PNG, one pixel per byte.
+
+        Executed instructions glow from red to yellow (on a log scale of their execution counts), over the rest of
+        memory dimly shown in blue.
+
+        :param memory: RAM of the interpreter profiled, its length must be a multiple of width.
+        :param width: Number of bytes per image row.
+        :return: PNG file contents.
+        """
+        ram = np.frombuffer(bytes(memory), dtype=np.uint8)
+        counts = np.array(self.executions, dtype=np.float64)
+
+        # An instruction occupies its address and the next.
+        executions = counts.copy()
+        executions[1:] = np.maximum(counts[1:], counts[:-1])
+
+        heat = np.log1p(executions)
+        heat /= max(heat.max(), 1.0)
+
+        image = np.zeros((len(ram), 3), dtype=np.uint8)
+        image[:, 2] = ram // 4
+        hot = executions > 0
+        image[hot, 0] = 96 + (heat[hot] * 159).astype(np.uint8)
+        image[hot, 1] = (heat[hot] * 255).astype(np.uint8)
+        image[hot, 2] = 0
+
+        return encode_png(image.reshape(-1, width, 3))
+
+    def report(self, hottest: int = 32) -> dict[str, Any]:
+        """
+        Summarise the statistics gathered so far.
+
+        :param hottest: Number of most executed addresses to list.
+        :return: JSON serialisable report.
+        """
+        addresses = sorted(
+            (address for address, count in enumerate(self.executions) if count),
+            key=lambda address: -self.executions[address],
+        )
+
+        return {
+            "instructions_executed": self.executed[0],
+            "skipped_cycles": self.skipped_cycles,
+            "subroutines": self.subroutines(),
+            "calls": [
+                {"caller": self.name(caller), "callee": self.name(callee), "calls": count}
+                for (caller, callee), count in self.calls.most_common()
+            ],
+            "addresses": [
+                {"address": f"{address:03X}", "executions": self.executions[address]} for address in addresses[:hottest]
+            ],
+        }
+
+
+def format_report(report: dict[str, Any]) -> str:
+    """
+    Render a profiler report as tables.
+
+    :param report: Report from HostProfiler.report.
+    :return: Report text.
+    """
+    lines = [
+        f"Wall time: {report['wall_time']:.3f}s, {report['frames']} frames ({report['frames_per_second']:.1f} fps)",
+        (
+            f"Instructions: {report['instructions_executed']} executed ({report['instructions_per_second']:,.0f}/s), "
+            f"{report['cycles']} cycles including fast-forwarded idle loops ({report['cycles_per_second']:,.0f}/s)"
+        ),
+    ]
+
+    for title, section, unit in (
+        ("Phase", "phases", "calls"),
+        ("Family", "families", "executions"),
+        ("Instruction", "instructions", "executions"),
+    ):
+        lines.extend(["", f"{title:<12} {unit.capitalize():>12} {'Seconds':>10} {'ns/call':>10} {'Share':>7}"])
+        lines.extend(
+            f"{row['name']:<12} {row[unit]:>12} {row['seconds']:>10.3f} {row['nanoseconds_per_call']:>10.0f} "
+            f"{row['share']:>7.1%}"
+            for row in report[section]
+        )
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,164 @@
+"""
+OpenGL renderer drawing the display as a scaled, textured quad.
+"""
+
+from __future__ import annotations
+
+import ctypes
+from typing import TYPE_CHECKING
+
+from OpenGL.GL import (
+    GL_CLAMP_TO_EDGE,
+    GL_COLOR_BUFFER_BIT,
+    GL_NEAREST,
+    GL_PIXEL_UNPACK_BUFFER,
+    GL_QUADS,
+    GL_RGB,
+    GL_STREAM_DRAW,
+    GL_TEXTURE_2D,
+    GL_TEXTURE_MAG_FILTER,
+    GL_TEXTURE_MIN_FILTER,
+    GL_TEXTURE_WRAP_S,
+    GL_TEXTURE_WRAP_T,
+    GL_UNPACK_ALIGNMENT,
+    GL_UNSIGNED_BYTE,
+    glBegin,
+    glBindBuffer,
+    glBindTexture,
+    glBufferData,
+    glBufferSubData,
+    glClear,
+    glClearColor,
+    glEnable,
+    glEnd,
+    glGenBuffers,
+    glGenTextures,
+    glPixelStorei,
+    glTexCoord2f,
+    glTexImage2D,
+    glTexParameteri,
+    glTexSubImage2D,
+    glVertex2f,
+    glViewport,
+)
+
+if TYPE_CHECKING:
+    import numpy as np
+    import numpy.typing as npt
+
+
+class TextureRenderer:
+    """
+    Uploads the display into a persistent texture and draws it as a nearest-filtered quad scaled to the window.
+    """
+
+    def __init__(self, width: int, height: int, use_pixel_buffer: bool = False) -> None:
+        """
+        :param width: Display width in pixels.
+        :param height: Display height in pixels.
+        :param use_pixel_buffer: Stream uploads through a pixel buffer object.
+        """
+        self.width = width
+        self.height = height
+        self.use_pixel_buffer = use_pixel_buffer
+
+        self.texture = 0
+        self.pixel_buffer = 0
+
+    def create(self, window_width: int, window_height: int) -> None:
+        """
+        Allocate the texture, requires a current OpenGL context.
+
+        :param window_width: Window width in pixels.
+        :param window_height: Window height in pixels.
+        :return: None.
+        """
+        self.texture = glGenTextures(1)
+
+        glEnable(GL_TEXTURE_2D)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+
+        # RGB rows are tightly packed, 64 * 3 bytes isn't guaranteed to be a multiple of the default alignment.
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, self.width, self.height, 0, GL_RGB, GL_UNSIGNED_BYTE, None)
+
+        if self.use_pixel_buffer:
+            self.pixel_buffer = glGenBuffers(1)
+
+        glClearColor(0, 0, 0, 1)
+
+        self.resize(window_width, window_height)
+
+    def resize(self, window_width: int, window_height: int) -> None:
+        """
+        Scale the display to the window, letterboxing to keep the display's aspect ratio.
+
+        :param window_width: Window width in pixels.
+        :param window_height: Window height in pixels.
+        :return: None.
+        """
+        scale = min(window_width / self.width, window_height / self.height)
+
+        viewport_width = round(self.width * scale)
+        viewport_height = round(self.height * scale)
+
+        glViewport(
+            (window_width - viewport_width) // 2,
+            (window_height - viewport_height) // 2,
+            viewport_width,
+            viewport_height,
+        )
+
+    def upload(self, rgb_display: npt.NDArray[np.uint8], start: int = 0, stop: int | None = None) -> None:
+        """
+        Upload display rows into the texture.
+
+        :param rgb_display: Display height x width x 3 colours, bottom row first.
+        :param start: First display row (counting from the top) to upload.
+        :param stop: Display row following the last row to upload, defaults to the bottom row.
+        :return: None.
+        """
+        if stop is None:
+            stop = self.height
+
+        # Texture rows are stored bottom row first, like rgb_display.
+        y_offset = self.height - stop
+        height = stop - start
+        rows = rgb_display[y_offset : self.height - start]
+
+        if not self.use_pixel_buffer:
+            glTexSubImage2D(GL_TEXTURE_2D, 0, 0, y_offset, self.width, height, GL_RGB, GL_UNSIGNED_BYTE, rows)
+            return
+
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, self.pixel_buffer)
+
+        # Orphan the previous storage so the driver doesn't wait for the last upload to finish.
+        glBufferData(GL_PIXEL_UNPACK_BUFFER, rows.nbytes, None, GL_STREAM_DRAW)
+        glBufferSubData(GL_PIXEL_UNPACK_BUFFER, 0, rows.nbytes, rows)
+
+        glTexSubImage2D(GL_TEXTURE_2D, 0, 0, y_offset, self.width, height, GL_RGB, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+
+    def present(self) -> None:
+        """
+        Draw the texture over the viewport.
+
+        :return: None.
+        """
+        glClear(GL_COLOR_BUFFER_BIT)
+
+        glBegin(GL_QUADS)
+        glTexCoord2f(0, 0)
+        glVertex2f(-1, -1)
+        glTexCoord2f(1, 0)
+        glVertex2f(1, -1)
+        glTexCoord2f(1, 1)
+        glVertex2f(1, 1)
+        glTexCoord2f(0, 1)
+        glVertex2f(-1, 1)
+        glEnd()
@@ -0,0 +1,142 @@
+"""
+Rewind buffer holding recent save states.
+
+Consecutive save states differ in a handful of bytes, so each state is stored as the XOR against the keyframe that
+opens its segment, compressed. The XOR is almost entirely zeros and compresses to a few dozen bytes, which lets
+minutes of per-frame states fit in a few megabytes.
+
+The RNG state at the end of a save state is the exception: every 624 random numbers drawn it's regenerated whole, and
+from then on it no longer matches the keyframe's at all. It's split off and stored as the XOR against the previous
+state's instead, so each regeneration is stored once rather than in every state until the next keyframe. Popping walks
+these back from the newest state, which is kept whole.
+"""
+
+from __future__ import annotations
+
+import zlib
+from collections import deque
+from typing import Final
+
+# zlib level used for deltas, they're tiny and compressed every frame.
+_delta_compression: Final = 1
+
+
+def _xor(first: bytes, second: bytes) -> bytes:
+    """
+    XOR two equally sized byte strings.
+
+    :param first: First bytes.
+    :param second: Second bytes.
+    :return: XOR of both.
+    """
+    return (int.from_bytes(first, "little") ^ int.from_bytes(second, "little")).to_bytes(len(first), "little")
+
+
+class RewindBuffer:
+    """
+    Bounded stack of save states, newest last.
+
+    States are grouped into segments opened by a keyframe. Once the buffer is over capacity its oldest segment is
+    dropped as a whole, as the states within it can't be restored without the keyframe.
+    """
+
+    def __init__(self, capacity: int, keyframe_interval: int = 60, tail_size: int = 0) -> None:
+        """
+        :param capacity: Number of states to keep.
+        :param keyframe_interval: Number of states per keyframe.
+        :param tail_size: Number of bytes at the end of each state stored against the previous state rather than the
+            keyframe, see SAVE_STATE_RANDOM_SIZE.
+        """
+        self.capacity = capacity
+        self.keyframe_interval = keyframe_interval
+        self.tail_size = tail_size
+
+        # (compressed keyframe, compressed deltas against the keyframe, compressed tail deltas against the previous
+        # state, one per state in the segment) per segment, oldest first.
+        self.segments: deque[tuple[bytes, list[bytes], list[bytes]]] = deque()
+        self.length = 0
+
+        # Uncompressed keyframe of the newest segment and tail of the newest state.
+        self._keyframe = b""
+        self._tail = bytes(tail_size)
+
+    def __len__(self) -> int:
+        """
+        Number of states held.
+
+        :return: Number of states.
+        """
+        return self.length
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Compressed size of the states held.
+
+        :return: Number of bytes.
+        """
+        return sum(
+            len(keyframe) + sum(map(len, deltas)) + sum(map(len, tails)) for keyframe, deltas, tails in self.segments
+        )
+
+    def push(self, state: bytes) -> None:
+        """
+        Add the newest state.
+
+        :param state: Save state, every state must have the same size.
+        :return: None.
+        """
+        split = len(state) - self.tail_size
+        state, tail = state[:split], state[split:]
+
+        if not self.segments or len(self.segments[-1][1]) + 1 >= self.keyframe_interval:
+            self.segments.append((zlib.compress(state), [], []))
+            self._keyframe = state
+        else:
+            self.segments[-1][1].append(zlib.compress(_xor(state, self._keyframe), _delta_compression))
+
+        if self.tail_size:
+            self.segments[-1][2].append(zlib.compress(_xor(tail, self._tail), _delta_compression))
+            self._tail = tail
+
+        self.length += 1
+
+        while self.length > self.capacity and len(self.segments) > 1:
+            self.length -= 1 + len(self.segments.popleft()[1])
+
+    def pop(self) -> bytes | None:
+        """
+        Remove and return the newest state.
+
+        :return: Save state, None if the buffer is empty.
+        """
+        if not self.segments:
+            return None
+
+        self.length -= 1
+        _, deltas, tails = self.segments[-1]
+        tail = self._tail
+
+        if self.tail_size:
+            # The oldest state's delta is against a state already dropped, that's only wrong once the buffer is empty.
+            self._tail = _xor(tail, zlib.decompress(tails.pop()))
+
+        if deltas:
+            return _xor(zlib.decompress(deltas.pop()), self._keyframe) + tail
+
+        state = self._keyframe
+        self.segments.pop()
+        self._keyframe = zlib.decompress(self.segments[-1][0]) if self.segments else b""
+
+        return state + tail
+
+    def clear(self) -> None:
+        """
+        Remove every state.
+
+        :return: None.
+        """
+        self.segments.clear()
+        self.length = 0
+        self._keyframe = b""
+        self._tail = bytes(self.tail_size)
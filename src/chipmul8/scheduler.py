@@ -0,0 +1,68 @@
+"""
+Frame scheduler pacing the interpreter against the 60 Hz timers.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Final
+
+# CHIP-8 delay and sound timers, as well as the display, run at 60 Hz.
+TIMER_FREQUENCY: Final = 60
+
+
+class FrameScheduler:
+    """
+    Splits an instruction rate into 60 Hz frames and paces them against the host clock.
+    """
+
+    def __init__(self, instructions_per_second: int = 700, max_lag: int = 5) -> None:
+        """
+        :param instructions_per_second: Number of instructions executed per second of emulated time.
+        :param max_lag: Number of frames the host may fall behind before the schedule is reset instead of caught up.
+        """
+        self.instructions_per_second = instructions_per_second
+        self.max_lag = max_lag
+
+        self.frame = 0
+        self.frame_duration = 1 / TIMER_FREQUENCY
+        self.deadline = time.perf_counter()
+
+    def cycles_for_next_frame(self) -> int:
+        """
+        Number of instructions to execute in the next frame.
+
+        Rates which aren't a multiple of 60 alternate between the two nearest whole numbers of instructions, so every
+        second of emulated time executes exactly instructions_per_second instructions.
+
+        :return: Number of instructions.
+        """
+        frame = self.frame % TIMER_FREQUENCY
+        self.frame += 1
+
+        return (frame + 1) * self.instructions_per_second // TIMER_FREQUENCY - (
+            frame * self.instructions_per_second // TIMER_FREQUENCY
+        )
+
+    def wait(self) -> None:
+        """
+        Sleep until the next frame is due.
+
+        :return: None.
+        """
+        self.deadline += self.frame_duration
+        remaining = self.deadline - time.perf_counter()
+
+        if remaining > 0:
+            time.sleep(remaining)
+        elif -remaining > self.max_lag * self.frame_duration:
+            # Too far behind to catch up (e.g. the window was dragged), resume from now instead of fast-forwarding.
+            self.deadline = time.perf_counter()
+
+    def resume(self) -> None:
+        """
+        Pace the following frames from now, after deliberately not running frames for a while (e.g. while idle).
+
+        :return: None.
+        """
+        self.deadline = time.perf_counter()
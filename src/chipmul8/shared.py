@@ -0,0 +1,409 @@
+"""
+Shared memory link between an interpreter process and the processes presenting it.
+
+A segment holds a header, the interpreter's whole state block (see Interpreter.bind_state) and two display buffers.
+The interpreter process runs the machine on the state block in place, and publishes a frame by copying the display
+into the back buffer and counting it, the parity of the frame number naming its buffer. Presenting processes read
+the front buffer straight out of the segment and write the keys they hold into the header as a bitmask. Nothing is
+pickled or sent through a pipe per frame, the only copy is the display into the back buffer (2 KiB, or 256 bytes
+packed), as XOR drawing has to keep going from the previous frame.
+
+Publishing never waits on readers. The interpreter counts a frame as started before writing its buffer and as
+published once written, so a reader checks after reading a frame that the frame two after it, which reuses its buffer,
+hasn't been started in the meantime.
+
+This module doesn't import pygame, the interpreter process only needs the interpreter.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+from enum import IntEnum
+from io import BytesIO
+from multiprocessing.shared_memory import SharedMemory
+from typing import TYPE_CHECKING, Final
+
+from chipmul8.display import ArrayFramebuffer, Framebuffer, PackedFramebuffer, SpriteMode
+from chipmul8.interpreter import STATE_DISPLAY, Interpreter, StopReason
+from chipmul8.scheduler import FrameScheduler
+
+if TYPE_CHECKING:
+    from multiprocessing.process import BaseProcess
+
+# Framebuffer backends a segment can hold, by the index stored in its header.
+_layouts: Final[tuple[type[Framebuffer], ...]] = (ArrayFramebuffer, PackedFramebuffer)
+
+# Header: frames published and frames started, keys held (bit N for key N), flags, then the dirty rows of the frame in
+# each display buffer.
+_counters: Final = 0
+_keys: Final = 16
+_flags: Final = 18
+_dirty: Final = 24
+# Flags, a byte each: stop requested, interpreter status and framebuffer layout.
+_stop_flag: Final = 0
+_status_flag: Final = 1
+_layout_flag: Final = 2
+# Why the interpreter faulted, UTF-8 and zero padded.
+_message: Final = 32
+_message_size: Final = 256
+# Offsets keep the state block and display buffers aligned to 8 bytes, as packed displays are viewed as words.
+_state: Final = _message + _message_size
+
+
+class MachineStatus(IntEnum):
+    """
+    Status of the interpreter process of a shared machine.
+    """
+
+    # Starting up or running.
+    RUNNING = 0
+    # Stopped on request.
+    STOPPED = 1
+    # Stopped by an exception, see SharedMachine.message.
+    FAULTED = 2
+
+
+class SharedMachine:
+    """
+    Shared memory segment linking an interpreter process with the processes presenting it.
+    """
+
+    def __init__(self, memory: SharedMemory, framebuffer_type: type[Framebuffer] | None = None) -> None:
+        """
+        Lay the link out over a segment, see create and attach.
+
+        :param memory: Shared memory segment.
+        :param framebuffer_type: Display backend of a new segment, None to read it from the segment's header.
+        """
+        self.memory = memory
+        buffer = memory.buf
+
+        if buffer is None:
+            msg = "The segment is closed"
+            raise ValueError(msg)
+
+        self.counters = buffer[_counters:_keys].cast("Q")
+        self.keys = buffer[_keys:_flags].cast("H")
+        self.flags = buffer[_flags:_dirty]
+        self.dirty = buffer[_dirty:_message].cast("I")
+        self.message_view = buffer[_message:_state]
+
+        if framebuffer_type is not None:
+            self.flags[_layout_flag] = _layouts.index(framebuffer_type)
+
+        self.framebuffer_type = _layouts[self.flags[_layout_flag]]
+        size = self.framebuffer_type.storage_size
+        displays = _state + STATE_DISPLAY + size
+
+        self.state = buffer[_state:displays]
+        self.displays = (buffer[displays : displays + size], buffer[displays + size : displays + size * 2])
+
+        # Readers' framebuffers over each display buffer.
+        self.framebuffers: tuple[Framebuffer, ...] = tuple(self.view(display) for display in self.displays)
+
+        # Display of the interpreter bound to the segment, frames are published from it.
+        self.source: memoryview | None = None
+
+    @classmethod
+    def create(cls, framebuffer_type: type[Framebuffer] = ArrayFramebuffer) -> SharedMachine:
+        """
+        Create a segment, to be unlinked once every process is done with it.
+
+        :param framebuffer_type: Display backend of the interpreter.
+        :return: Shared machine.
+        """
+        size = framebuffer_type.storage_size
+        memory = SharedMemory(create=True, size=_state + STATE_DISPLAY + size * 3)
+
+        return cls(memory, framebuffer_type)
+
+    @classmethod
+    def attach(cls, name: str) -> SharedMachine:
+        """
+        Attach to a segment created by another process.
+
+        :param name: Segment name.
+        :return: Shared machine.
+        """
+        return cls(SharedMemory(name))
+
+    def view(self, display: memoryview) -> Framebuffer:
+        """
+        Read a display buffer through a framebuffer, without writing to it.
+
+        :param display: Display buffer.
+        :return: Framebuffer over the buffer.
+        """
+        framebuffer = self.framebuffer_type()
+        framebuffer.bind(display, adopt=True)
+
+        return framebuffer
+
+    @property
+    def name(self) -> str:
+        """
+        Name other processes attach to the segment by.
+
+        :return: Segment name.
+        """
+        return self.memory.name
+
+    @property
+    def published(self) -> int:
+        """
+        Number of the last frame published, 0 before the first.
+
+        :return: Frame number.
+        """
+        return self.counters[0]
+
+    @property
+    def key_mask(self) -> int:
+        """
+        Keys held by the presenting process, bit N set for key N.
+
+        :return: Key mask.
+        """
+        return self.keys[0]
+
+    @key_mask.setter
+    def key_mask(self, value: int) -> None:
+        """
+        Set the keys held.
+
+        :param value: Key mask.
+        :return: None.
+        """
+        self.keys[0] = value & 0xFFFF
+
+    @property
+    def stop_requested(self) -> bool:
+        """
+        Whether the interpreter process has been asked to stop.
+
+        :return: True once stop has been called.
+        """
+        return self.flags[_stop_flag] != 0
+
+    def stop(self) -> None:
+        """
+        Ask the interpreter process to stop, it does so before its next frame.
+
+        :return: None.
+        """
+        self.flags[_stop_flag] = 1
+
+    @property
+    def status(self) -> MachineStatus:
+        """
+        Status of the interpreter process.
+
+        :return: Status.
+        """
+        return MachineStatus(self.flags[_status_flag])
+
+    @property
+    def message(self) -> str:
+        """
+        Why the interpreter process faulted.
+
+        :return: Message, empty unless the status is FAULTED.
+        """
+        return bytes(self.message_view).rstrip(b"\0").decode(errors="replace")
+
+    def finish(self, message: str | None = None) -> None:
+        """
+        Record that the interpreter process stopped.
+
+        :param message: Why it faulted, None if it stopped on request.
+        :return: None.
+        """
+        if message is not None:
+            encoded = message.encode()[:_message_size]
+            self.message_view[:] = encoded.ljust(_message_size, b"\0")
+
+        self.flags[_status_flag] = MachineStatus.STOPPED if message is None else MachineStatus.FAULTED
+
+    def bind(self, cpu: Interpreter) -> None:
+        """
+        Move an interpreter's state block into the segment, where it runs from then on.
+
+        :param cpu: Interpreter using the segment's framebuffer backend.
+        :return: None.
+        """
+        if type(cpu.framebuffer) is not self.framebuffer_type:
+            msg = f"The segment holds a {self.framebuffer_type.__name__} display"
+            raise ValueError(msg)
+
+        self.state[:] = cpu.sync_state()
+        cpu.bind_state(self.state, cpu.framebuffer)
+        self.source = self.state[STATE_DISPLAY:]
+
+    def unbind(self, cpu: Interpreter) -> None:
+        """
+        Move an interpreter's state block back out of the segment, so the segment can be closed.
+
+        :param cpu: Interpreter bound to the segment.
+        :return: None.
+        """
+        cpu.bind_state(bytearray(cpu.sync_state()), cpu.framebuffer)
+
+        if self.source is not None:
+            self.source.release()
+            self.source = None
+
+    def publish(self, cpu: Interpreter) -> None:
+        """
+        Publish the bound interpreter's display as the next frame, along with the rows changed since the last.
+
+        The state block's header is synced too, so the segment holds the whole machine as of the frame.
+
+        :param cpu: Interpreter bound to the segment.
+        :return: None.
+        """
+        if self.source is None:
+            msg = "No interpreter is bound to the segment"
+            raise ValueError(msg)
+
+        counters = self.counters
+        frame = counters[0] + 1
+        index = frame & 1
+
+        counters[1] = frame
+        self.displays[index][:] = self.source
+        self.dirty[index] = cpu.dirty_rows
+
+        cpu.dirty_rows = 0
+        cpu.frame_ready = False
+        cpu.sync_state()
+        counters[0] = frame
+
+    def frame(self, frame: int) -> tuple[Framebuffer, int]:
+        """
+        Read a published frame, check overwritten once done with it.
+
+        :param frame: Frame number, at most two behind published.
+        :return: The frame's display, and the rows changed since the frame before it.
+        """
+        index = frame & 1
+
+        return self.framebuffers[index], self.dirty[index]
+
+    def overwritten(self, frame: int) -> bool:
+        """
+        Whether a frame's buffer may have been overwritten since it was published, after reading it.
+
+        :param frame: Frame number.
+        :return: True if the frame has to be read again, from the latest published.
+        """
+        return self.counters[1] >= frame + 2
+
+    def close(self) -> None:
+        """
+        Release the segment in this process, any interpreter bound to it has to be unbound first.
+
+        :return: None.
+        """
+        # Every view of the segment has to be gone before it can be unmapped.
+        self.framebuffers = ()
+
+        for view in (self.counters, self.keys, self.flags, self.dirty, self.message_view, self.state, *self.displays):
+            view.release()
+
+        self.memory.close()
+
+    def unlink(self) -> None:
+        """
+        Destroy the segment, once every process has closed it.
+
+        :return: None.
+        """
+        self.memory.unlink()
+
+
+def run_interpreter(
+    name: str,
+    rom: bytes,
+    *,
+    instructions_per_second: int = 700,
+    sprite_mode: SpriteMode = SpriteMode.CLIP,
+    seed: int | None = None,
+) -> None:
+    """
+    Interpreter process: run a ROM in real time on a shared machine until asked to stop, publishing every frame drawn.
+
+    :param name: Segment name.
+    :param rom: ROM image.
+    :param instructions_per_second: Interpreter speed.
+    :param sprite_mode: Behaviour of sprites drawn past the edge of the display.
+    :param seed: Seed of the random numbers drawn by CXNN.
+    :return: None.
+    """
+    machine = SharedMachine.attach(name)
+    cpu = None
+    message = None
+
+    try:
+        cpu = Interpreter(sprite_mode=sprite_mode, framebuffer=machine.framebuffer_type(), seed=seed)
+        cpu.load_rom(BytesIO(rom))
+        machine.bind(cpu)
+        machine.publish(cpu)
+
+        scheduler = FrameScheduler(instructions_per_second)
+        key_mask = 0
+
+        while not machine.stop_requested:
+            if machine.key_mask != key_mask:
+                cpu.key_mask = key_mask = machine.key_mask
+
+            reason = cpu.run_frame(scheduler.cycles_for_next_frame())
+
+            if cpu.dirty_rows:
+                machine.publish(cpu)
+
+            if reason == StopReason.FAULT:
+                message = f"Executing opcode: {hex(cpu.current_op_code)}: {cpu.fault}"
+                break
+
+            scheduler.wait()
+    except Exception as e:
+        message = str(e) or type(e).__name__
+    finally:
+        if cpu is not None and machine.source is not None:
+            # The fault's traceback holds views of the segment.
+            cpu.fault = None
+            machine.unbind(cpu)
+        machine.finish(message)
+        machine.close()
+
+
+def start_interpreter(
+    machine: SharedMachine,
+    rom: bytes,
+    *,
+    instructions_per_second: int = 700,
+    sprite_mode: SpriteMode = SpriteMode.CLIP,
+    seed: int | None = None,
+) -> BaseProcess:
+    """
+    Start an interpreter process running a ROM on a shared machine.
+
+    The process is spawned rather than forked, so it doesn't inherit the caller's window or GL context.
+
+    :param machine: Shared machine, created by the caller.
+    :param rom: ROM image.
+    :param instructions_per_second: Interpreter speed.
+    :param sprite_mode: Behaviour of sprites drawn past the edge of the display.
+    :param seed: Seed of the random numbers drawn by CXNN.
+    :return: The started process.
+    """
+    process = multiprocessing.get_context("spawn").Process(
+        target=run_interpreter,
+        args=(machine.name, rom),
+        kwargs={"instructions_per_second": instructions_per_second, "sprite_mode": sprite_mode, "seed": seed},
+        name=f"chipmul8-{machine.name}",
+        daemon=True,
+    )
+    process.start()
+
+    return process
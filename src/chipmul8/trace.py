@@ -0,0 +1,411 @@
+"""
+Execution traces: a record of every instruction executed, for offline analysis and finding where backends diverge.
+
+Each record holds the cycle an instruction executed on, its address and opcode, I after it executed and the register
+it wrote (the destination VX, or VF for DXYN and FX1E, 0xFF if none) with the register's new value. Records are
+written to a preallocated buffer from an instrumented copy of the interpreter's dispatch table. Full buffers are
+handed to a background thread, which compresses and writes them while recording carries on into the other buffer.
+
+A trace file is a header (magic and compression level) followed by chunks, each a header (payload size and number of
+records) and the records, zlib compressed unless the level is 0. TraceReader memory maps trace files, so records of
+uncompressed traces are read straight from the page cache and compressed chunks are only inflated when read.
+
+Cycles count up through a trace, except after a state is loaded (e.g. rewinding) where they continue from the state's.
+"""
+
+from __future__ import annotations
+
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from functools import cache
+from pathlib import Path
+from queue import Queue
+from typing import TYPE_CHECKING, Any, Final, Self
+
+import numpy as np
+
+from chipmul8.profiler import op_code_patterns, replace_attributes, restore_attributes
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+    from types import TracebackType
+
+    import numpy.typing as npt
+
+    from chipmul8.interpreter import Interpreter, StopReason
+
+_trace_magic: Final = b"C8T\x01"
+_trace_header: Final = struct.Struct("<4sB3x")
+_chunk_header: Final = struct.Struct("<II")
+
+# Layout of a record, every field little-endian.
+TRACE_DTYPE: Final = np.dtype(
+    [
+        ("cycle", "<u8"),
+        ("program_counter", "<u2"),
+        ("op_code", "<u2"),
+        ("register_i", "<u2"),
+        ("register", "u1"),
+        ("value", "u1"),
+    ]
+)
+
+# Register field of records of instructions that don't write a register.
+NO_REGISTER: Final = 0xFF
+
+# Instructions writing VX, the flag register VF is also written by some and isn't recorded for them.
+# fmt: off
+_writes_vx: Final = frozenset({
+    "6XNN", "7XNN", "8XY0", "8XY1", "8XY2", "8XY3", "8XY4", "8XY5",
+    "8XY6", "8XY7", "8XYE", "CXNN", "FX07", "FX0A", "FX65",
+})
+# fmt: on
+# Instructions writing VF alone.
+_writes_vf: Final = frozenset({"DXYN", "FX1E"})
+
+
+@cache
+def destination_registers() -> tuple[int, ...]:
+    """
+    Register each instruction writes, as recorded in traces, computed once.
+
+    :return: Register index (NO_REGISTER if it doesn't write one), indexed by opcode.
+    """
+    return tuple(
+        (op_code & 0x0F00) >> 8 if pattern in _writes_vx else 0xF if pattern in _writes_vf else NO_REGISTER
+        for op_code, pattern in enumerate(op_code_patterns())
+    )
+
+
+class TraceRecorder:
+    """
+    Records the instructions executed by the interpreters it's attached to into a trace file.
+    """
+
+    def __init__(self, path: Path | str, *, chunk_records: int = 1 << 16, compression_level: int = 1) -> None:
+        """
+        :param path: Trace file path.
+        :param chunk_records: Number of records per chunk (and buffer).
+        :param compression_level: zlib compression level, 0 writes records uncompressed.
+        """
+        self.compression_level = compression_level
+        self.file = Path(path).open("wb")  # noqa: SIM115
+        self.file.write(_trace_header.pack(_trace_magic, compression_level))
+
+        # Records are two words: the cycle, then the rest of the fields packed as laid out by TRACE_DTYPE.
+        self.limit = chunk_records * 2
+        self.free: Queue[array[int]] = Queue()
+        self.full: Queue[tuple[array[int], int] | None] = Queue()
+
+        # Double buffered, recording only waits on the writer if it's a whole chunk behind.
+        for _ in range(2):
+            self.free.put(array("Q", bytes(self.limit * 8)))
+
+        self.buffer = self.free.get()
+        self.index = 0
+
+        # Cycle of the next instruction, and the cycle the current run ends on at the latest.
+        self.cycle = 0
+        self.end = 0
+
+        self.records = 0
+        self.error: Exception | None = None
+        self.replaced: dict[int, dict[str, Any]] = {}
+
+        self.writer = threading.Thread(target=self.write_chunks, name="chipmul8-trace", daemon=True)
+        self.writer.start()
+
+    def __enter__(self) -> Self:
+        """
+        :return: The recorder.
+        """
+        return self
+
+    def __exit__(
+        self, exc_type: type[BaseException] | None, exc_value: BaseException | None, traceback: TracebackType | None
+    ) -> None:
+        """
+        Close the trace.
+
+        :param exc_type: Exception type, if one was raised.
+        :param exc_value: Exception, if one was raised.
+        :param traceback: Exception traceback, if one was raised.
+        :return: None.
+        """
+        self.close()
+
+    def instrument(self, handler: Callable[[Interpreter], None], op_code: int) -> Callable[[Interpreter], None]:
+        """
+        Wrap a dispatch table entry, recording each execution.
+
+        :param handler: Dispatch table entry.
+        :param op_code: Opcode the entry executes.
+        :return: Instrumented entry.
+        """
+        register = destination_registers()[op_code]
+        fields = op_code << 16 | register << 48
+        limit = self.limit
+
+        if register == NO_REGISTER:
+
+            def traced(cpu: Interpreter) -> None:
+                program_counter = cpu.program_counter
+                handler(cpu)
+
+                index = self.index
+                buffer = self.buffer
+                buffer[index] = self.cycle
+                buffer[index + 1] = program_counter | fields | (cpu.register_i & 0xFFFF) << 32
+                self.cycle += 1
+                self.index = index = index + 2
+
+                if index == limit:
+                    self.flush()
+
+            return traced
+
+        def traced_write(cpu: Interpreter) -> None:
+            program_counter = cpu.program_counter
+            handler(cpu)
+
+            index = self.index
+            buffer = self.buffer
+            buffer[index] = self.cycle
+            buffer[index + 1] = program_counter | fields | (cpu.register_i & 0xFFFF) << 32 | cpu.v[register] << 56
+            self.cycle += 1
+            self.index = index = index + 2
+
+            if index == limit:
+                self.flush()
+
+        return traced_write
+
+    def attach(self, cpu: Interpreter) -> None:
+        """
+        Record an interpreter's instructions.
+
+        :param cpu: Interpreter to trace.
+        :return: None.
+        """
+        run = cpu.run
+        idle_period = cpu.idle_period
+
+        def traced_run(max_cycles: int) -> StopReason:
+            self.cycle = cpu.cycles
+            self.end = cpu.cycles + max_cycles
+
+            return run(max_cycles)
+
+        def traced_idle_period(jump: int, cycles: int) -> int:
+            period = idle_period(jump, cycles)
+
+            # Interpreter.run skips every whole period that fits in its budget, which isn't recorded.
+            if period:
+                self.cycle += (self.end - cycles) // period * period
+
+            return period
+
+        self.replaced[id(cpu)] = replace_attributes(
+            cpu,
+            {
+                "dispatch_table": tuple(
+                    self.instrument(handler, op_code) for op_code, handler in enumerate(cpu.dispatch_table)
+                ),
+                "run": traced_run,
+                "idle_period": traced_idle_period,
+            },
+        )
+
+    def detach(self, cpu: Interpreter) -> None:
+        """
+        Stop recording an interpreter's instructions, restoring its dispatch table.
+
+        :param cpu: Interpreter to stop tracing.
+        :return: None.
+        """
+        restore_attributes(cpu, ("dispatch_table", "run", "idle_period"), self.replaced.pop(id(cpu)))
+
+    def flush(self) -> None:
+        """
+        Hand the records buffered so far to the writer.
+
+        :return: None.
+        """
+        if self.index:
+            self.full.put((self.buffer, self.index))
+            self.records += self.index // 2
+            self.buffer = self.free.get()
+            self.index = 0
+
+    def write_chunks(self) -> None:
+        """
+        Writer thread: compress and write buffers handed over by flush until close.
+
+        :return: None.
+        """
+        while (item := self.full.get()) is not None:
+            buffer, length = item
+
+            try:
+                # Once writing fails the rest of the trace is discarded, close reports the error.
+                if self.error is None:
+                    self.write_chunk(buffer, length)
+            except Exception as e:
+                self.error = e
+            finally:
+                self.free.put(buffer)
+
+    def write_chunk(self, buffer: array[int], length: int) -> None:
+        """
+        Write a chunk of records.
+
+        :param buffer: Records buffer.
+        :param length: Number of words of the buffer used.
+        :return: None.
+        """
+        if sys.byteorder == "big":
+            buffer = array("Q", buffer[:length])
+            buffer.byteswap()
+
+        records = memoryview(buffer)[:length].cast("B")
+        payload = zlib.compress(records, self.compression_level) if self.compression_level else records
+
+        self.file.write(_chunk_header.pack(len(payload), length // 2))
+        self.file.write(payload)
+
+    def close(self) -> None:
+        """
+        Write the remaining records and close the file, raising any error the writer hit.
+
+        :return: None.
+        """
+        if self.file.closed:
+            return
+
+        self.flush()
+        self.full.put(None)
+        self.writer.join()
+        self.file.close()
+
+        if self.error is not None:
+            raise self.error
+
+
+class TraceReader:
+    """
+    Memory mapped trace file.
+    """
+
+    def __init__(self, path: Path | str) -> None:
+        """
+        :param path: Trace file path.
+        """
+        self.data: npt.NDArray[np.uint8] = np.memmap(path, dtype=np.uint8, mode="r")
+
+        msg = "Not a chipmul8 trace"
+
+        if len(self.data) < _trace_header.size:
+            raise ValueError(msg)
+
+        magic, self.compression_level = _trace_header.unpack_from(self.data)
+
+        if magic != _trace_magic:
+            raise ValueError(msg)
+
+        # Offset, payload size and number of records of every chunk.
+        self.chunks: list[tuple[int, int, int]] = []
+        offset = _trace_header.size
+
+        while offset < len(self.data):
+            if offset + _chunk_header.size > len(self.data):
+                raise ValueError(msg)
+
+            size, records = _chunk_header.unpack_from(self.data, offset)
+            offset += _chunk_header.size
+
+            if offset + size > len(self.data) or (
+                not self.compression_level and size != records * TRACE_DTYPE.itemsize
+            ):
+                raise ValueError(msg)
+
+            self.chunks.append((offset, size, records))
+            offset += size
+
+    def __len__(self) -> int:
+        """
+        Number of records in the trace.
+
+        :return: Number of records.
+        """
+        return sum(records for _, _, records in self.chunks)
+
+    def iter_chunks(self) -> Iterator[npt.NDArray[np.void]]:
+        """
+        Read the trace a chunk at a time.
+
+        :return: Iterator over the records of each chunk, views of the file if it's uncompressed.
+        """
+        for offset, size, records in self.chunks:
+            payload = self.data[offset : offset + size]
+
+            if self.compression_level:
+                chunk = np.frombuffer(zlib.decompress(payload), dtype=TRACE_DTYPE)
+
+                if len(chunk) != records:
+                    msg = "Corrupt chipmul8 trace"
+                    raise ValueError(msg)
+
+                yield chunk
+            else:
+                yield payload.view(TRACE_DTYPE)
+
+    def records(self) -> npt.NDArray[np.void]:
+        """
+        Read the whole trace.
+
+        :return: Every record.
+        """
+        chunks = list(self.iter_chunks())
+
+        if len(chunks) == 1:
+            return chunks[0]
+
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=TRACE_DTYPE)
+
+
+def first_divergence(expected: TraceReader, actual: TraceReader) -> int | None:
+    """
+    Find where two traces of the same run (e.g. on different backends) diverge, streaming through both.
+
+    :param expected: Trace of the reference run.
+    :param actual: Trace of the run to check.
+    :return: Index of the first record that differs (or the length of the shorter trace, if one is a prefix of the
+        other), None if the traces are identical.
+    """
+    expected_chunks = expected.iter_chunks()
+    actual_chunks = actual.iter_chunks()
+    left = right = np.empty(0, dtype=TRACE_DTYPE)
+    position = 0
+
+    while True:
+        if not len(left):
+            left = next(expected_chunks, left)
+
+        if not len(right):
+            right = next(actual_chunks, right)
+
+        if not len(left) or not len(right):
+            return None if len(left) == len(right) else position
+
+        length = min(len(left), len(right))
+        mismatches = np.flatnonzero(left[:length] != right[:length])
+
+        if len(mismatches):
+            return position + int(mismatches[0])
+
+        position += length
+        left = left[length:]
+        right = right[length:]
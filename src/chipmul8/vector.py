@@ -0,0 +1,569 @@
+"""
+Lockstep interpreter running many CHIP-8 machines at once.
+
+The state of every machine is held in stacked NumPy arrays (struct of arrays). Each step fetches the opcode of every
+machine, then executes each opcode class for all of the machines that fetched it with a handful of vectorised
+operations, so the Python overhead of a step is shared by every machine.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Final
+
+import numpy as np
+
+from chipmul8.display import DISPLAY_HEIGHT, DISPLAY_WIDTH, SpriteMode
+from chipmul8.interpreter import font_list
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    import numpy.typing as npt
+
+    # Indices of the machines an operation applies to.
+    Machines = npt.NDArray[np.intp]
+    Values = npt.NDArray[np.int64]
+
+MEMORY_SIZE: Final = 4096
+
+_stack_size: Final = 16
+
+# Longest sprite DXYN can draw.
+_sprite_rows: Final = np.arange(15)
+_sprite_columns: Final = np.arange(8)
+
+_keys: Final = np.arange(16)
+
+
+class VectorInterpreter:
+    """
+    Executes N CHIP-8 machines in lockstep, matching :class:`~chipmul8.interpreter.Interpreter` instruction for
+    instruction.
+
+    Instructions which raise in the interpreter (unknown opcodes, stack and memory overruns, invalid keys) mark the
+    machine as faulted instead, it stops executing while the remaining machines continue. CXNN draws from one NumPy
+    generator shared by every machine, rather than each Interpreter's own Random, so seeded runs don't draw the same
+    numbers as an Interpreter given the same seed.
+    """
+
+    def __init__(
+        self,
+        machines: int,
+        start_address: int = 0x200,
+        sprite_mode: SpriteMode = SpriteMode.CLIP,
+        seed: int | None = None,
+    ) -> None:
+        """
+        :param machines: Number of machines.
+        :param start_address: Interpreter memory start location.
+        :param sprite_mode: Behaviour of sprites drawn past the edge of the display.
+        :param seed: Seed of the generator used by CXNN.
+        """
+        self.machines = machines
+        self.sprite_mode = sprite_mode
+        self.random = np.random.default_rng(seed)
+
+        self.ram = np.zeros((machines, MEMORY_SIZE), dtype=np.uint8)
+        self.ram[:, : len(font_list)] = font_list
+        self.registers = np.zeros((machines, 16), dtype=np.uint8)
+
+        self.stack = np.zeros((machines, _stack_size), dtype=np.int64)
+        self.register_i = np.zeros(machines, dtype=np.int64)
+        self.program_counter = np.full(machines, start_address, dtype=np.int64)
+        self.stack_pointer = np.zeros(machines, dtype=np.int64)
+
+        self.delay_register = np.zeros(machines, dtype=np.int64)
+        self.sound_register = np.zeros(machines, dtype=np.int64)
+
+        self.current_op_code = np.zeros(machines, dtype=np.int64)
+
+        # Display pixels of every machine, indexed [machine, y, -x - 1] like Interpreter.display_memory.
+        self.pixels = np.zeros((machines, DISPLAY_HEIGHT, DISPLAY_WIDTH), dtype=np.int8)
+
+        # Bit N is set if key N is held down.
+        self.key_mask = np.zeros(machines, dtype=np.int64)
+        self.frame_ready = np.zeros(machines, dtype=np.bool_)
+
+        self.cycles = np.zeros(machines, dtype=np.int64)
+        self.faulted = np.zeros(machines, dtype=np.bool_)
+
+        self.handlers: tuple[Callable[[Machines, Values], None], ...] = (
+            self.op_code_0000,
+            self.op_code_1000,
+            self.op_code_2000,
+            self.op_code_3000,
+            self.op_code_4000,
+            self.op_code_5000,
+            self.op_code_6000,
+            self.op_code_7000,
+            self.op_code_8000,
+            self.op_code_9000,
+            self.op_code_a000,
+            self.op_code_b000,
+            self.op_code_c000,
+            self.op_code_d000,
+            self.op_code_e000,
+            self.op_code_f000,
+        )
+
+    def load_rom(self, rom: bytes, machines: Machines | slice | None = None) -> None:
+        """
+        Loads a rom into memory.
+
+        :param rom: Rom contents.
+        :param machines: Machines to load the rom into, defaults to every machine.
+        :return: None.
+        """
+        self.ram[slice(None) if machines is None else machines, 0x200 : 0x200 + len(rom)] = np.frombuffer(
+            rom, dtype=np.uint8
+        )
+
+    def step(self, machines: Machines | None = None) -> Machines:
+        """
+        Executes one emulation cycle on every running machine.
+
+        :param machines: Machines to step, defaults to every machine that hasn't faulted.
+        :return: Machines which fetched an instruction.
+        """
+        machines = np.flatnonzero(~self.faulted) if machines is None else machines[~self.faulted[machines]]
+
+        program_counter = self.program_counter[machines]
+        fetchable = program_counter < MEMORY_SIZE - 1
+
+        if not fetchable.all():
+            self.faulted[machines[~fetchable]] = True
+            machines = machines[fetchable]
+            program_counter = program_counter[fetchable]
+
+        ram = self.ram
+        op_codes = ram[machines, program_counter].astype(np.int64) << 8 | ram[machines, program_counter + 1]
+        self.current_op_code[machines] = op_codes
+
+        families = op_codes >> 12
+
+        for family in np.unique(families).tolist():
+            selected = families == family
+            self.handlers[family](machines[selected], op_codes[selected])
+
+        # Faulting instructions aren't counted, matching Interpreter.run.
+        self.cycles[machines] += ~self.faulted[machines]
+
+        return machines
+
+    def run(self, max_cycles: int) -> None:
+        """
+        Executes max_cycles emulation cycles on every running machine.
+
+        :param max_cycles: Number of cycles to execute.
+        :return: None.
+        """
+        for _ in range(max_cycles):
+            if not self.step().size:
+                break
+
+    def run_frame(self, max_cycles: int) -> None:
+        """
+        Executes one 60 Hz frame on every running machine: up to max_cycles emulation cycles followed by a timer tick.
+
+        Like Interpreter.run_frame, a machine waiting on FX0A for a key press stops executing for the rest of the
+        frame.
+
+        :param max_cycles: Number of cycles executed per frame.
+        :return: None.
+        """
+        running = np.flatnonzero(~self.faulted)
+        machines = running
+
+        for _ in range(max_cycles):
+            if not machines.size:
+                break
+
+            machines = self.step(machines)
+
+            waiting = (self.current_op_code[machines] & 0xF0FF == 0xF00A) & (self.key_mask[machines] == 0)
+            machines = machines[~waiting & ~self.faulted[machines]]
+
+        self.tick_timers(running)
+
+    def tick_timers(self, machines: Machines | None = None) -> None:
+        """
+        Decrements the delay and sound timers.
+
+        :param machines: Machines to tick, defaults to every machine.
+        :return: None.
+        """
+        selected = slice(None) if machines is None else machines
+
+        for timer in (self.delay_register, self.sound_register):
+            values = timer[selected]
+            timer[selected] = values - (values > 0)
+
+    def fault(self, machines: Machines) -> None:
+        """
+        Stop machines which executed an instruction the interpreter would raise on.
+
+        :param machines: Faulting machines.
+        :return: None.
+        """
+        self.faulted[machines] = True
+
+    def op_code_0000(self, machines: Machines, op_codes: Values) -> None:
+        """
+        00E0 (clear the screen) and 00EE (return from subroutine).
+
+        :param machines: Machines executing the opcode family.
+        :param op_codes: Opcode of each machine.
+        :return: None.
+        """
+        nn = op_codes & 0xFF
+
+        clear = machines[nn == 0xE0]
+        self.pixels[clear] = 0
+        self.program_counter[clear] += 2
+
+        returning = machines[nn == 0xEE]
+        # The interpreter indexes a Python list, so -16 to -1 wrap around rather than raise.
+        index = self.stack_pointer[returning] - 1
+        valid = index >= -_stack_size
+        self.fault(returning[~valid])
+
+        returning = returning[valid]
+        self.program_counter[returning] = self.stack[returning, index[valid] % _stack_size] + 2
+        self.stack_pointer[returning] -= 1
+
+        self.fault(machines[(nn != 0xE0) & (nn != 0xEE)])
+
+    def op_code_1000(self, machines: Machines, op_codes: Values) -> None:
+        """
+        1NNN: goto NNN.
+
+        :param machines: Machines executing the opcode family.
+        :param op_codes: Opcode of each machine.
+        :return: None.
+        """
+        self.program_counter[machines] = op_codes & 0xFFF
+
+    def op_code_2000(self, machines: Machines, op_codes: Values) -> None:
+        """
+        2NNN: calls subroutine at NNN.
+
+        :param machines: Machines executing the opcode family.
+        :param op_codes: Opcode of each machine.
+        :return: None.
+        """
+        index = self.stack_pointer[machines]
+        valid = (index >= -_stack_size) & (index < _stack_size)
+        self.fault(machines[~valid])
+
+        machines = machines[valid]
+        self.stack[machines, index[valid] % _stack_size] = self.program_counter[machines]
+        self.stack_pointer[machines] += 1
+        self.program_counter[machines] = op_codes[valid] & 0xFFF
+
+    def skip_if(self, machines: Machines, condition: npt.NDArray[np.bool_]) -> None:
+        """
+        Skips the next instruction on machines where the condition holds.
+
+        :param machines: Machines executing the instruction.
+        :param condition: Whether each machine skips.
+        :return: None.
+        """
+        self.program_counter[machines] += np.where(condition, 4, 2)
+
+    def op_code_3000(self, machines: Machines, op_codes: Values) -> None:
+        """
+        3XNN: skips the next instruction if VX equals NN.
+
+        :param machines: Machines executing the opcode family.
+        :param op_codes: Opcode of each machine.
+        :return: None.
+        """
+        self.skip_if(machines, self.registers[machines, op_codes >> 8 & 0xF] == op_codes & 0xFF)
+
+    def op_code_4000(self, machines: Machines, op_codes: Values) -> None:
+        """
+        4XNN: skips the next instruction if VX does not equal NN.
+
+        :param machines: Machines executing the opcode family.
+        :param op_codes: Opcode of each machine.
+        :return: None.
+        """
+        self.skip_if(machines, self.registers[machines, op_codes >> 8 & 0xF] != op_codes & 0xFF)
+
+    def op_code_5000(self, machines: Machines, op_codes: Values) -> None:
+        """
+        5XY0: skips the next instruction if VX equals VY.
+
+        :param machines: Machines executing the opcode family.
+        :param op_codes: Opcode of each machine.
+        :return: None.
+        """
+        registers = self.registers
+        self.skip_if(machines, registers[machines, op_codes >> 8 & 0xF] == registers[machines, op_codes >> 4 & 0xF])
+
+    def op_code_6000(self, machines: Machines, op_codes: Values) -> None:
+        """
+        6XNN: sets VX to NN.
+
+        :param machines: Machines executing the opcode family.
+        :param op_codes: Opcode of each machine.
+        :return: None.
+        """
+        self.registers[machines, op_codes >> 8 & 0xF] = op_codes & 0xFF
+        self.program_counter[machines] += 2
+
+    def op_code_7000(self, machines: Machines, op_codes: Values) -> None:
+        """
+        7XNN: adds NN to VX (carry flag is not changed).
+
+        :param machines: Machines executing the opcode family.
+        :param op_codes: Opcode of each machine.
+        :return: None.
+        """
+        x = op_codes >> 8 & 0xF
+        self.registers[machines, x] = (self.registers[machines, x] + (op_codes & 0xFF)) & 0xFF
+        self.program_counter[machines] += 2
+
+    def op_code_8000(self, machines: Machines, op_codes: Values) -> None:
+        """
+        8XYN: register to register arithmetic.
+
+        VF is written before VX, and operands are read again afterwards, so X or Y being F behaves as in the
+        interpreter.
+
+        :param machines: Machines executing the opcode family.
+        :param op_codes: Opcode of each machine.
+        :return: None.
+        """
+        r = self.registers
+        operations = op_codes & 0xF
+
+        # Registers are unsigned bytes, so arithmetic wraps like the interpreter's memory.
+        for operation in np.unique(operations).tolist():
+            selected = operations == operation
+            group = machines[selected]
+            x = op_codes[selected] >> 8 & 0xF
+            y = op_codes[selected] >> 4 & 0xF
+
+            match operation:
+                case 0x0:
+                    r[group, x] = r[group, y]
+                case 0x1:
+                    r[group, x] = r[group, x] | r[group, y]
+                case 0x2:
+                    r[group, x] = r[group, x] & r[group, y]
+                case 0x3:
+                    r[group, x] = r[group, x] ^ r[group, y]
+                case 0x4:
+                    r[group, 0xF] = r[group, y] > 0xFF - r[group, x]
+                    r[group, x] = r[group, x] + r[group, y]
+                case 0x5:
+                    r[group, 0xF] = r[group, y] <= r[group, x]
+                    r[group, x] = r[group, x] - r[group, y]
+                case 0x6:
+                    r[group, 0xF] = r[group, x] & 0x1
+                    r[group, x] = r[group, x] >> 1
+                case 0x7:
+                    r[group, 0xF] = r[group, x] <= r[group, y]
+                    r[group, x] = r[group, y] - r[group, x]
+                case 0xE:
+                    r[group, 0xF] = r[group, x] >> 7
+                    r[group, x] = r[group, x] << 1
+                case _:
+                    self.fault(group)
+                    continue
+
+            self.program_counter[group] += 2
+
+    def op_code_9000(self, machines: Machines, op_codes: Values) -> None:
+        """
+        9XY0: skips the next instruction if VX doesn't equal VY.
+
+        :param machines: Machines executing the opcode family.
+        :param op_codes: Opcode of each machine.
+        :return: None.
+        """
+        registers = self.registers
+        self.skip_if(machines, registers[machines, op_codes >> 8 & 0xF] != registers[machines, op_codes >> 4 & 0xF])
+
+    def op_code_a000(self, machines: Machines, op_codes: Values) -> None:
+        """
+        ANNN: sets I to the address NNN.
+
+        :param machines: Machines executing the opcode family.
+        :param op_codes: Opcode of each machine.
+        :return: None.
+        """
+        self.register_i[machines] = op_codes & 0xFFF
+        self.program_counter[machines] += 2
+
+    def op_code_b000(self, machines: Machines, op_codes: Values) -> None:
+        """
+        BNNN: jumps to the address NNN plus V0.
+
+        :param machines: Machines executing the opcode family.
+        :param op_codes: Opcode of each machine.
+        :return: None.
+        """
+        self.program_counter[machines] = (op_codes & 0xFFF) + self.registers[machines, 0]
+
+    def op_code_c000(self, machines: Machines, op_codes: Values) -> None:
+        """
+        CXNN: sets VX to a random number and NN.
+
+        :param machines: Machines executing the opcode family.
+        :param op_codes: Opcode of each machine.
+        :return: None.
+        """
+        self.registers[machines, op_codes >> 8 & 0xF] = op_codes & 0xFF & self.random.integers(0, 256, len(machines))
+        self.program_counter[machines] += 2
+
+    def op_code_d000(self, machines: Machines, op_codes: Values) -> None:
+        """
+        DXYN: draws an 8 pixel wide, N pixel high sprite from memory at I to (VX, VY), VF is set on collision.
+
+        Only the pixels each sprite turns on or off are gathered and scattered, so the cost scales with the sprites
+        rather than the displays.
+
+        :param machines: Machines executing the opcode family.
+        :param op_codes: Opcode of each machine.
+        :return: None.
+        """
+        registers = self.registers
+        x = registers[machines, op_codes >> 8 & 0xF].astype(np.int64) % DISPLAY_WIDTH
+        y = registers[machines, op_codes >> 4 & 0xF].astype(np.int64) % DISPLAY_HEIGHT
+        height = op_codes & 0xF
+
+        # Sprite rows read past the end of memory are dropped, like slicing the interpreter's memory.
+        addresses = self.register_i[machines, np.newaxis] + _sprite_rows
+        rows_valid = (_sprite_rows < height[:, np.newaxis]) & (addresses < MEMORY_SIZE)
+        sprites = np.where(rows_valid, self.ram[machines[:, np.newaxis], np.minimum(addresses, MEMORY_SIZE - 1)], 0)
+
+        # Column j of the unpacked sprite is its pixel at x + 7 - j, stored in column 56 - x + j.
+        bits = np.unpackbits(sprites.astype(np.uint8)[..., np.newaxis], axis=2, bitorder="little")
+        pixel_rows = y[:, np.newaxis] + _sprite_rows
+        pixel_columns = x[:, np.newaxis] + 7 - _sprite_columns
+
+        if self.sprite_mode == SpriteMode.WRAP:
+            pixel_rows %= DISPLAY_HEIGHT
+            pixel_columns %= DISPLAY_WIDTH
+        else:
+            rows_valid &= pixel_rows < DISPLAY_HEIGHT
+            bits &= (pixel_columns < DISPLAY_WIDTH)[:, np.newaxis, :]
+
+        bits &= rows_valid[..., np.newaxis]
+
+        sprite, row, column = np.nonzero(bits)
+        drawn = machines[sprite]
+        pixel_row = pixel_rows[sprite, row]
+        pixel_column = DISPLAY_WIDTH - 1 - pixel_columns[sprite, column]
+
+        pixels = self.pixels[drawn, pixel_row, pixel_column]
+        self.pixels[drawn, pixel_row, pixel_column] = pixels ^ 1
+
+        collision = np.zeros(len(machines), dtype=np.bool_)
+        collision[sprite[pixels != 0]] = True
+
+        registers[machines, 0xF] = collision
+        self.frame_ready[machines] = True
+        self.program_counter[machines] += 2
+
+    def op_code_e000(self, machines: Machines, op_codes: Values) -> None:
+        """
+        EX9E / EXA1: skips the next instruction if the key stored in VX is / isn't pressed.
+
+        :param machines: Machines executing the opcode family.
+        :param op_codes: Opcode of each machine.
+        :return: None.
+        """
+        nn = op_codes & 0xFF
+        keys = self.registers[machines, op_codes >> 8 & 0xF].astype(np.int64)
+
+        # The interpreter's keyboard is a list of 16 keys.
+        valid = ((nn == 0x9E) | (nn == 0xA1)) & (keys < len(_keys))
+        self.fault(machines[~valid])
+
+        machines = machines[valid]
+        pressed = (self.key_mask[machines] >> keys[valid] & 1).astype(np.bool_)
+        self.skip_if(machines, pressed == (nn[valid] == 0x9E))
+
+    def op_code_f000(self, machines: Machines, op_codes: Values) -> None:
+        """
+        FXNN: timers, keyboard, I and memory transfers.
+
+        :param machines: Machines executing the opcode family.
+        :param op_codes: Opcode of each machine.
+        :return: None.
+        """
+        registers = self.registers
+        operations = op_codes & 0xFF
+
+        for operation in np.unique(operations).tolist():
+            selected = operations == operation
+            group = machines[selected]
+            x = op_codes[selected] >> 8 & 0xF
+            vx = registers[group, x].astype(np.int64)
+
+            match operation:
+                case 0x07:
+                    registers[group, x] = self.delay_register[group]
+                case 0x0A:
+                    mask = self.key_mask[group]
+                    pressed = mask != 0
+                    group = group[pressed]
+                    # Lowest key held down.
+                    registers[group, x[pressed]] = (mask[pressed, np.newaxis] >> _keys & 1).argmax(axis=1)
+                case 0x15:
+                    self.delay_register[group] = vx
+                case 0x18:
+                    self.sound_register[group] = vx
+                case 0x1E:
+                    register_i = self.register_i[group] + vx
+                    self.register_i[group] = register_i
+                    registers[group, 0xF] = register_i + vx > 0xFFF
+                case 0x29:
+                    self.register_i[group] = vx * 0x5
+                case 0x33:
+                    digits = np.stack([vx // 100, vx // 10 % 10, vx % 10], axis=1)
+                    group = self.store(group, np.ones((len(group), 3), dtype=np.bool_), digits)
+                case 0x55:
+                    count = _keys <= x[:, np.newaxis]
+                    group = self.store(group, count, registers[group].astype(np.int64))
+                case 0x65:
+                    count = _keys <= x[:, np.newaxis]
+                    addresses = self.register_i[group, np.newaxis] + _keys
+                    readable = count & (addresses < MEMORY_SIZE)
+
+                    machine, index = np.nonzero(readable)
+                    registers[group[machine], index] = self.ram[group[machine], addresses[machine, index]]
+
+                    valid = ~(count & ~readable).any(axis=1)
+                    self.fault(group[~valid])
+                    group = group[valid]
+                case _:
+                    self.fault(group)
+                    continue
+
+            self.program_counter[group] += 2
+
+    def store(self, machines: Machines, count: npt.NDArray[np.bool_], values: Values) -> Machines:
+        """
+        Writes values to memory starting at I, faulting machines whose writes run past the end of memory.
+
+        Writes up to the end of memory still land, as they do in the interpreter before it raises.
+
+        :param machines: Machines storing values.
+        :param count: Which of each machine's values are written.
+        :param values: Values to write, one row per machine.
+        :return: Machines that didn't fault.
+        """
+        addresses = self.register_i[machines, np.newaxis] + np.arange(count.shape[1])
+        writable = count & (addresses < MEMORY_SIZE)
+
+        machine, index = np.nonzero(writable)
+        self.ram[machines[machine], addresses[machine, index]] = values[machine, index]
+
+        valid = ~(count & ~writable).any(axis=1)
+        self.fault(machines[~valid])
+
+        return machines[valid]
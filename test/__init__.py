@@ -1,3 +1,23 @@
 """
 Unit tests.
 """
+
+from io import BytesIO
+from typing import Any
+
+from chipmul8.interpreter import Interpreter
+
+
+def create_interpreter(rom: bytes, **kwargs: Any) -> Interpreter:
+    """
+    Create an interpreter with a rom loaded.
+
+    :param rom: Rom contents.
+    :param kwargs: Interpreter options, e.g. seed or framebuffer.
+    :return: Interpreter.
+    """
+
+    cpu = Interpreter(**kwargs)
+    cpu.load_rom(BytesIO(rom))
+
+    return cpu
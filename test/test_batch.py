@@ -0,0 +1,177 @@
+"""
+Batch runner unit tests.
+"""
+
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from chipmul8.batch import BatchJob, discover_jobs, load_manifest, run_batch, run_job
+from chipmul8.display import SpriteMode
+
+# fmt: off
+# Waits for a key, draws the font sprite for it and spins.
+key_rom = bytes([
+    0xF0, 0x0A,  # 200: V0 = key
+    0xF0, 0x29,  # 202: I = font sprite for V0
+    0xD1, 0x15,  # 204: draw at (V1, V1)
+    0x12, 0x06,  # 206: goto 206
+])
+
+# Draws random font sprites in a diagonal line.
+random_rom = bytes([
+    0xC0, 0x0F,  # 200: V0 = random & F
+    0xF0, 0x29,  # 202: I = font sprite for V0
+    0xD1, 0x15,  # 204: draw at (V1, V1)
+    0x71, 0x03,  # 206: V1 += 3
+    0x12, 0x00,  # 208: goto 200
+])
+
+# Executes an unknown opcode.
+fault_rom = bytes([
+    0x60, 0x01,  # 200: V0 = 1
+    0xFF, 0xFF,  # 202: unknown
+])
+# fmt: on
+
+
+class TestBatch(unittest.TestCase):
+    """
+    Batch runner test harness.
+    """
+
+    def setUp(self) -> None:
+        """
+        Write a corpus of roms.
+
+        :return: None.
+        """
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name)
+
+        (self.path / "nested").mkdir()
+        (self.path / "key.ch8").write_bytes(key_rom)
+        (self.path / "key.ch8.inputs").write_text("0 4\n")
+        (self.path / "nested" / "fault.c8").write_bytes(fault_rom)
+        (self.path / "notes.txt").write_text("not a rom")
+
+    def tearDown(self) -> None:
+        """
+        Remove the corpus.
+
+        :return: None.
+        """
+
+        self.directory.cleanup()
+
+    def test_discover_jobs(self) -> None:
+        """
+        Directories are scanned recursively for roms, picking up input scripts alongside them.
+
+        :return: None.
+        """
+
+        jobs = discover_jobs(self.path, frames=10, sprite_mode=SpriteMode.WRAP)
+
+        self.assertEqual(
+            [
+                BatchJob(self.path / "key.ch8", 10, None, self.path / "key.ch8.inputs", 700, SpriteMode.WRAP),
+                BatchJob(self.path / "nested" / "fault.c8", 10, None, None, 700, SpriteMode.WRAP),
+            ],
+            jobs,
+        )
+
+        with self.assertRaises(ValueError):
+            discover_jobs(self.path)
+
+    def test_load_manifest(self) -> None:
+        """
+        Manifest entries override the defaults and resolve paths against the manifest.
+
+        :return: None.
+        """
+
+        manifest = self.path / "manifest.json"
+        manifest.write_text(json.dumps([{"rom": "key.ch8", "cycles": 50, "input_script": "key.ch8.inputs"}]))
+
+        self.assertEqual(
+            [BatchJob(self.path / "key.ch8", 5, 50, self.path / "key.ch8.inputs", 60, SpriteMode.CLIP)],
+            load_manifest(manifest, frames=5, instructions_per_second=60),
+        )
+
+        manifest.write_text(json.dumps([{"rom": "key.ch8", "frames": 1, "speed": 2}]))
+
+        with self.assertRaises(ValueError):
+            load_manifest(manifest)
+
+    def test_run_job(self) -> None:
+        """
+        Jobs report the final display hash, cycle count and fault.
+
+        :return: None.
+        """
+
+        key, fault = discover_jobs(self.path, frames=10)
+
+        key_result = run_job(key)
+        fault_result = run_job(fault)
+
+        self.assertIsNone(key_result.fault)
+        self.assertEqual(len(key_result.display_hash or ""), 64)
+        # The key is held from the first frame, so every frame runs its share of 700 instructions per second.
+        self.assertEqual(key_result.cycles, 700 * 10 // 60)
+
+        self.assertIn("0xffff", fault_result.fault or "")
+        self.assertEqual(fault_result.cycles, 1)
+
+        # Without the input script nothing is drawn.
+        self.assertNotEqual(key_result.display_hash, run_job(key._replace(input_script=None)).display_hash)
+
+        missing = run_job(key._replace(rom=self.path / "missing.ch8"))
+        self.assertIsNone(missing.display_hash)
+        self.assertIsNotNone(missing.fault)
+
+        oversized = self.path / "oversized.ch8"
+        oversized.write_bytes(bytes(4000))
+        too_big = run_job(key._replace(rom=oversized))
+
+        self.assertIsNone(too_big.display_hash)
+        self.assertIn("don't fit", too_big.fault or "")
+
+    def test_seed(self) -> None:
+        """
+        Runs of a ROM drawing random numbers are reproducible, the seed decides the numbers drawn.
+
+        :return: None.
+        """
+
+        rom = self.path / "random.ch8"
+        rom.write_bytes(random_rom)
+        job = BatchJob(rom, frames=10)
+
+        self.assertEqual(run_job(job).display_hash, run_job(job).display_hash)
+        self.assertNotEqual(run_job(job).display_hash, run_job(job._replace(seed=1)).display_hash)
+
+        manifest = self.path / "manifest.json"
+        manifest.write_text(json.dumps([{"rom": "random.ch8", "seed": 7}, {"rom": "random.ch8"}]))
+
+        self.assertEqual([7, 3], [job.seed for job in load_manifest(manifest, frames=1, seed=3)])
+
+    def test_run_batch(self) -> None:
+        """
+        Pooled runs produce the same results as running each job in turn.
+
+        :return: None.
+        """
+
+        jobs = discover_jobs(self.path, cycles=200) * 3
+
+        results = sorted(run_batch(jobs, workers=2))
+        expected = sorted(run_job(job) for job in jobs)
+
+        self.assertEqual(
+            [(result.rom, result.display_hash, result.cycles, result.fault) for result in expected],
+            [(result.rom, result.display_hash, result.cycles, result.fault) for result in results],
+        )
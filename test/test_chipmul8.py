@@ -2,11 +2,15 @@
 Chip8 interpreter unit tests.
 """
 
+import tracemalloc
 import unittest
+from collections.abc import Callable
+from io import BytesIO
 from random import Random
 from unittest.mock import MagicMock, patch
 
-from chipmul8.interpreter import Interpreter
+from chipmul8.display import PackedFramebuffer, SpriteMode
+from chipmul8.interpreter import IDLE_CHECK_INTERVAL, Interpreter, StopReason
 
 
 class TestOpCodes(unittest.TestCase):
@@ -438,8 +442,7 @@ class TestOpCodes(unittest.TestCase):
         self.assertEqual(0x204, self.cpu.program_counter)
         self.assertEqual(0xF3, self.cpu.registers[0x0])
 
-    @patch("chipmul8.interpreter.random")
-    def test_op_code_c000(self, random: MagicMock) -> None:
+    def test_op_code_c000(self) -> None:
         """
         CXNN
 
@@ -448,7 +451,7 @@ class TestOpCodes(unittest.TestCase):
         :return: None.
         """
 
-        random.randint._mock_side_effect = self.random.randint
+        self.cpu.random = self.random
         op_code = 0xC111
 
         self.cpu.registers[0x1] = 0xF3
@@ -503,6 +506,103 @@ class TestOpCodes(unittest.TestCase):
 
         self.assertEqual(0x202, self.cpu.program_counter)
 
+    def test_op_code_d000_collision(self) -> None:
+        """
+        DXYN
+
+        VF is set when drawing erases a pixel, drawing the same sprite twice clears it.
+
+        :return: None.
+        """
+
+        self.cpu.current_op_code = 0xD011
+        self.cpu.register_i = 0x300
+        self.cpu.ram.set_address(0x300, 0xC0)
+        self.cpu.execute_op_code()
+
+        self.assertEqual(0x0, self.cpu.registers[0xF])
+        self.assertEqual(2, self.cpu.display_memory.sum())
+
+        self.cpu.ram.set_address(0x300, 0x40)
+        self.cpu.execute_op_code()
+
+        self.assertEqual(0x1, self.cpu.registers[0xF])
+        self.assertEqual(1, self.cpu.display_memory.sum())
+        self.assertEqual(0x1, self.cpu.display_memory[0, -1])
+
+    def test_op_code_d000_clip(self) -> None:
+        """
+        DXYN
+
+        Sprites drawn past the edge of the display are clipped, the starting coordinate wraps.
+
+        :return: None.
+        """
+
+        self.cpu.current_op_code = 0xD012
+        self.cpu.registers[0x0] = 60 + 64
+        self.cpu.registers[0x1] = 31
+        self.cpu.register_i = 0x300
+        self.cpu.ram.set_address(0x300, 0xFF)
+        self.cpu.ram.set_address(0x301, 0xFF)
+        self.cpu.execute_op_code()
+
+        self.assertEqual(4, self.cpu.display_memory.sum())
+
+        for x in range(60, 64):
+            self.assertEqual(0x1, self.cpu.display_memory[31, -x - 1])
+
+    def test_op_code_d000_wrap(self) -> None:
+        """
+        DXYN
+
+        Sprites drawn past the edge of the display wrap around to the opposite side.
+
+        :return: None.
+        """
+
+        self.cpu.sprite_mode = SpriteMode.WRAP
+        self.cpu.current_op_code = 0xD012
+        self.cpu.registers[0x0] = 62
+        self.cpu.registers[0x1] = 31
+        self.cpu.register_i = 0x300
+        self.cpu.ram.set_address(0x300, 0x81)
+        self.cpu.ram.set_address(0x301, 0x81)
+        self.cpu.execute_op_code()
+
+        self.assertEqual(4, self.cpu.display_memory.sum())
+
+        for x, y in ((62, 31), (5, 31), (62, 0), (5, 0)):
+            self.assertEqual(0x1, self.cpu.display_memory[y, -x - 1])
+
+    def test_op_code_d000_dirty_rows(self) -> None:
+        """
+        DXYN
+
+        Rows covered by a sprite are marked dirty, wrapping rows past the bottom edge.
+
+        :return: None.
+        """
+
+        self.cpu.dirty_rows = 0
+        self.cpu.current_op_code = 0xD013
+        self.cpu.registers[0x1] = 30
+        self.cpu.execute_op_code()
+
+        self.assertEqual(0b11 << 30, self.cpu.dirty_rows)
+
+        self.cpu.dirty_rows = 0
+        self.cpu.sprite_mode = SpriteMode.WRAP
+        self.cpu.execute_op_code()
+
+        self.assertEqual(0b11 << 30 | 0b1, self.cpu.dirty_rows)
+
+        self.cpu.dirty_rows = 0
+        self.cpu.current_op_code = 0x00E0
+        self.cpu.execute_op_code()
+
+        self.assertEqual(0xFFFFFFFF, self.cpu.dirty_rows)
+
     def test_op_code_e09e(self) -> None:
         """
         EX9E
@@ -741,3 +841,358 @@ class TestOpCodes(unittest.TestCase):
 
         for index in range(0x0, 0xF):
             self.assertEqual(0xFF, self.cpu.registers[index])
+
+
+class TestMemory(unittest.TestCase):
+    """
+    Raw memory and MemoryBase compatibility test harness.
+    """
+
+    def setUp(self) -> None:
+        """
+        Initialize interpreter.
+
+        :return: None.
+        """
+
+        Interpreter.initialize()
+        self.cpu = Interpreter()
+
+    def test_load_rom(self) -> None:
+        """
+        Roms are copied in at 0x200, roms that don't fit are rejected before touching memory.
+
+        :return: None.
+        """
+
+        self.cpu.load_rom(BytesIO(bytes([0x12, 0x34, 0x56])))
+
+        self.assertEqual(bytes([0x12, 0x34, 0x56, 0x00]), self.cpu.memory[0x200:0x204])
+        self.assertEqual(0xF0, self.cpu.memory[0x0])
+
+        with self.assertRaises(IndexError):
+            self.cpu.load_rom(BytesIO(bytes([0xFF]) * 0xE01))
+
+        self.assertEqual(4096, len(self.cpu.memory))
+        self.assertEqual(0x00, self.cpu.memory[0x203])
+
+    def test_bulk_copy_at_end_of_memory(self) -> None:
+        """
+        FX55 and FX65 running off the end of memory copy the bytes that fit then fault, without resizing either store.
+
+        :return: None.
+        """
+
+        self.cpu.v[:] = bytes(range(0x10, 0x20))
+        self.cpu.register_i = 0xFFE
+
+        with self.assertRaises(IndexError):
+            self.cpu.dispatch_table[0xF355](self.cpu)
+
+        self.assertEqual(bytes([0x10, 0x11]), self.cpu.memory[0xFFE:])
+
+        self.cpu.register_i = 0xFFF
+
+        with self.assertRaises(IndexError):
+            self.cpu.dispatch_table[0xF365](self.cpu)
+
+        self.assertEqual(bytes([0x11, 0x11, 0x12, 0x13]), self.cpu.v[:4])
+        self.assertEqual((4096, 16), (len(self.cpu.memory), len(self.cpu.v)))
+
+    def test_compatibility(self) -> None:
+        """
+        MemoryBase item access wraps values and shares storage with the raw memory instructions use.
+
+        :return: None.
+        """
+
+        self.cpu.registers[0x7] = 0x111
+        self.cpu.ram.set_address(0x300, -1)
+
+        self.assertIs(self.cpu.v, self.cpu.registers.memory)
+        self.assertIs(self.cpu.memory, self.cpu.ram.memory)
+        self.assertEqual(0x11, self.cpu.v[0x7])
+        self.assertEqual(0xFF, self.cpu.memory[0x300])
+
+        child = self.cpu.fork()
+        child.v[0x7] = 0x22
+
+        self.assertIs(child.v, child.registers.memory)
+        self.assertEqual(0x11, self.cpu.registers[0x7])
+
+
+class TestDispatch(unittest.TestCase):
+    """
+    Opcode dispatch table test harness.
+    """
+
+    def setUp(self) -> None:
+        """
+        Initialize interpreter.
+
+        :return: None.
+        """
+
+        Interpreter.initialize()
+        self.cpu = Interpreter()
+
+    def test_dispatch_table_covers_every_op_code(self) -> None:
+        """
+        Every 16-bit opcode has a decoded handler.
+
+        :return: None.
+        """
+
+        self.assertEqual(0x10000, len(Interpreter.dispatch_table))
+
+    def test_unknown_op_code(self) -> None:
+        """
+        Opcodes outside the instruction set leave the program counter untouched.
+
+        :return: None.
+        """
+
+        self.cpu.current_op_code = 0x8008
+
+        with patch("builtins.print") as mock_print:
+            self.cpu.execute_op_code()
+
+        self.assertEqual(0x200, self.cpu.program_counter)
+        mock_print.assert_any_call("Executing opcode: 0x8008")
+
+    def test_emulate_fetches_from_program_counter(self) -> None:
+        """
+        Emulate fetches the opcode at the program counter and executes it.
+
+        :return: None.
+        """
+
+        self.cpu.ram.set_address(0x200, 0x63)
+        self.cpu.ram.set_address(0x201, 0x2A)
+        self.cpu.emulate()
+
+        self.assertEqual(0x632A, self.cpu.current_op_code)
+        self.assertEqual(0x2A, self.cpu.registers[0x3])
+        self.assertEqual(0x202, self.cpu.program_counter)
+
+
+class TestRun(unittest.TestCase):
+    """
+    Batched execution test harness.
+    """
+
+    def setUp(self) -> None:
+        """
+        Initialize interpreter.
+
+        :return: None.
+        """
+
+        Interpreter.initialize()
+        self.cpu = Interpreter()
+
+    def load(self, *op_codes: int) -> None:
+        """
+        Write opcodes into memory from the start address.
+
+        :param op_codes: Opcodes to write.
+        :return: None.
+        """
+
+        for index, op_code in enumerate(op_codes):
+            self.cpu.ram.set_address(0x200 + index * 2, op_code >> 8)
+            self.cpu.ram.set_address(0x201 + index * 2, op_code & 0xFF)
+
+    def test_budget(self) -> None:
+        """
+        Execution stops once the cycle budget is exhausted.
+
+        :return: None.
+        """
+
+        self.load(0x7001, 0x1200)
+
+        self.assertEqual(StopReason.BUDGET, self.cpu.run(100))
+        self.assertEqual(100, self.cpu.cycles)
+        self.assertEqual(50, self.cpu.registers[0x0])
+
+    def test_frame(self) -> None:
+        """
+        Execution stops after a sprite is drawn.
+
+        :return: None.
+        """
+
+        self.load(0x6001, 0xD001, 0x1200)
+
+        self.assertEqual(StopReason.FRAME, self.cpu.run(100))
+        self.assertEqual(2, self.cpu.cycles)
+        self.assertEqual(0x204, self.cpu.program_counter)
+
+    def test_key_wait(self) -> None:
+        """
+        Execution stops while FX0A is waiting on a key press, and continues once a key is pressed.
+
+        :return: None.
+        """
+
+        self.load(0xF30A, 0x1202)
+
+        self.assertEqual(StopReason.KEY_WAIT, self.cpu.run(100))
+        self.assertEqual(0x200, self.cpu.program_counter)
+
+        self.cpu.keyboard[0x7] = True
+
+        # 1202 jumps to itself.
+        self.assertEqual(StopReason.IDLE, self.cpu.run(100))
+        self.assertEqual(0x7, self.cpu.registers[0x3])
+        self.assertEqual(0x202, self.cpu.program_counter)
+
+    def test_idle_loop(self) -> None:
+        """
+        Idle loops are fast-forwarded, leaving the machine exactly where executing every iteration would.
+
+        :return: None.
+        """
+
+        # Wait for the delay timer: V0 = DT, skip if V0 == 0, goto 204.
+        self.load(0x6005, 0xF015, 0xF007, 0x3000, 0x1204, 0x7101)
+
+        self.assertEqual(StopReason.IDLE, self.cpu.run(1000))
+        self.assertEqual(1000, self.cpu.cycles)
+        # 2 setup instructions then 3 instructions per iteration, 998 = 332 * 3 + 2.
+        self.assertEqual(0x208, self.cpu.program_counter)
+
+        self.cpu.tick_timers()
+        self.cpu.delay_register = 0
+
+        self.assertEqual(StopReason.BUDGET, self.cpu.run(4))
+        self.assertEqual(0x20C, self.cpu.program_counter)
+        self.assertEqual(1, self.cpu.registers[0x1])
+
+    def test_idle_loop_stays_fast_forwarded(self) -> None:
+        """
+        An idle loop keeps being fast-forwarded frame after frame, rather than only until its first detection.
+
+        :return: None.
+        """
+
+        # Poll key 0 forever: skip if key V0 is held, goto 200.
+        self.load(0xE09E, 0x1200)
+
+        dispatch_table = self.cpu.dispatch_table
+        dispatched = []
+
+        def dispatch(op_code: int) -> Callable[[Interpreter], None]:
+            dispatched.append(op_code)
+
+            return dispatch_table[op_code]
+
+        self.cpu.dispatch_table = MagicMock()
+        self.cpu.dispatch_table.__getitem__.side_effect = dispatch
+
+        for _ in range(100):
+            dispatched.clear()
+
+            self.assertEqual(StopReason.IDLE, self.cpu.run_frame(700))
+            # Two instructions per iteration: at most two checks' worth of iterations execute before the periods are
+            # skipped, and less than a period after.
+            self.assertLessEqual(len(dispatched), IDLE_CHECK_INTERVAL * 2 * 3)
+
+        self.assertEqual(70000, self.cpu.cycles)
+        self.assertEqual(0x200, self.cpu.program_counter)
+
+    def test_side_effects_not_idle(self) -> None:
+        """
+        Loops drawing random numbers or writing memory execute every iteration.
+
+        :return: None.
+        """
+
+        self.cpu.random = Random(3)
+        self.load(0xC0FF, 0xA300, 0xF055, 0x1200)
+
+        self.assertEqual(StopReason.BUDGET, self.cpu.run(400))
+        self.assertEqual(400, self.cpu.cycles)
+
+        expected = Random(3)
+
+        for _ in range(100):
+            expected.randint(0, 255)
+
+        self.assertEqual(expected.getstate(), self.cpu.random.getstate())
+
+    def test_fault(self) -> None:
+        """
+        Execution stops when an instruction raises, leaving the program counter on the faulting instruction.
+
+        :return: None.
+        """
+
+        self.load(0x6001, 0xFFFF)
+
+        self.assertEqual(StopReason.FAULT, self.cpu.run(100))
+        self.assertIsInstance(self.cpu.fault, ValueError)
+        self.assertEqual(0x202, self.cpu.program_counter)
+        self.assertEqual(1, self.cpu.cycles)
+
+    def test_run_frame(self) -> None:
+        """
+        A frame executes its full budget even after drawing, then ticks the timers once.
+
+        :return: None.
+        """
+
+        self.load(0x6001, 0xD001, 0x7101, 0x1204)
+        self.cpu.delay_register = 0x2
+        self.cpu.sound_register = 0x1
+
+        self.assertEqual(StopReason.FRAME, self.cpu.run_frame(12))
+        self.assertEqual(12, self.cpu.cycles)
+        self.assertEqual(5, self.cpu.registers[0x1])
+        self.assertTrue(self.cpu.frame_ready)
+        self.assertEqual(0x1, self.cpu.delay_register)
+        self.assertEqual(0x0, self.cpu.sound_register)
+
+        self.assertEqual(StopReason.BUDGET, self.cpu.run_frame(12))
+        self.assertEqual(0x0, self.cpu.delay_register)
+
+    def test_steady_state_allocations(self) -> None:
+        """
+        Once warmed up, running frames allocates nothing beyond transient integers, whichever display backend is used.
+
+        :return: None.
+        """
+
+        for framebuffer in (None, PackedFramebuffer()):
+            with self.subTest(framebuffer=framebuffer):
+                self.cpu = Interpreter(framebuffer=framebuffer, seed=0)
+                self.cpu.key_mask = 0b10
+                self.load(
+                    # 200: call 220, V2 = random, I = 300, BCD of V2, load and store V0 - V2.
+                    0x2220, 0xC2FF, 0xA300, 0xF233, 0xF265, 0xF255,
+                    # 20C: draw the font sprite for V1, skip the clear if key V1 is held, delay timer = V3, repeat.
+                    0xF129, 0xD015, 0xE19E, 0x00E0, 0xF315, 0x1200, 0x0000, 0x0000, 0x0000, 0x0000,
+                    # 220: arithmetic, sound timer = V3 and return.
+                    0x7003, 0x8014, 0x8126, 0x7107, 0xF318, 0x00EE,
+                )  # fmt: skip
+
+                for _ in range(10):
+                    self.cpu.run_frame(500)
+
+                tracemalloc.start()
+
+                try:
+                    baseline = tracemalloc.get_traced_memory()[0]
+
+                    for _ in range(200):
+                        self.cpu.run_frame(500)
+
+                    current, peak = tracemalloc.get_traced_memory()
+                finally:
+                    tracemalloc.stop()
+
+                self.assertEqual(self.cpu.cycles, 105000)
+                # Integers over 256 are boxed, a handful are alive at any time (the program counter, cycles, ...).
+                self.assertLess(peak - baseline, 1024)
+                self.assertLess(current - baseline, 512)
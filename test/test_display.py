@@ -0,0 +1,271 @@
+"""
+Framebuffer unit tests.
+"""
+
+import threading
+import unittest
+from random import Random
+
+import numpy as np
+
+from chipmul8.display import (
+    ArrayFramebuffer,
+    PackedFramebuffer,
+    SpriteMode,
+    SwapBuffer,
+    dirty_row_runs,
+    palette_lut,
+    render_rgb,
+)
+from chipmul8.interpreter import Interpreter
+
+
+class TestFramebuffers(unittest.TestCase):
+    """
+    Framebuffer backend test harness.
+    """
+
+    def setUp(self) -> None:
+        """
+        Initialize framebuffers.
+
+        :return: None.
+        """
+
+        self.array = ArrayFramebuffer()
+        self.packed = PackedFramebuffer()
+        self.random = Random(10)
+
+    def draw_random_sprites(self, mode: SpriteMode) -> None:
+        """
+        Draw the same random sprites on both framebuffers, checking collisions agree.
+
+        :param mode: Sprite mode.
+        :return: None.
+        """
+
+        for _ in range(200):
+            x = self.random.randrange(64)
+            y = self.random.randrange(32)
+            sprite = self.random.randbytes(self.random.randrange(16))
+
+            self.assertEqual(
+                self.array.draw_sprite(x, y, sprite, mode),
+                self.packed.draw_sprite(x, y, sprite, mode),
+            )
+
+        np.testing.assert_array_equal(self.array.to_array(), self.packed.to_array())
+
+    def test_clip(self) -> None:
+        """
+        Packed and array framebuffers agree when clipping sprites.
+
+        :return: None.
+        """
+
+        self.draw_random_sprites(SpriteMode.CLIP)
+
+    def test_wrap(self) -> None:
+        """
+        Packed and array framebuffers agree when wrapping sprites.
+
+        :return: None.
+        """
+
+        self.draw_random_sprites(SpriteMode.WRAP)
+
+    def test_packed_layout(self) -> None:
+        """
+        Packed rows hold the leftmost pixel in the most significant bit.
+
+        :return: None.
+        """
+
+        self.packed.draw_sprite(60, 1, b"\xff", SpriteMode.WRAP)
+
+        self.assertEqual(0xF00000000000000F, self.packed.rows[1])
+        self.assertEqual(0x1, self.packed.to_array()[1, -60 - 1])
+
+    def test_clear(self) -> None:
+        """
+        Clearing turns every pixel off.
+
+        :return: None.
+        """
+
+        self.draw_random_sprites(SpriteMode.CLIP)
+        self.packed.clear()
+        self.array.clear()
+
+        self.assertFalse(any(self.packed.rows))
+        self.assertFalse(self.array.to_array().any())
+
+    def test_bind(self) -> None:
+        """
+        Framebuffers bound to external storage keep their pixels and draw into the storage.
+
+        :return: None.
+        """
+
+        self.draw_random_sprites(SpriteMode.WRAP)
+        expected = self.array.to_array().copy()
+
+        for framebuffer in (self.array, self.packed):
+            with self.subTest(framebuffer=type(framebuffer).__name__):
+                storage = bytearray(framebuffer.storage_size)
+                framebuffer.bind(memoryview(storage))
+
+                np.testing.assert_array_equal(expected, framebuffer.to_array())
+
+                framebuffer.clear()
+
+                self.assertFalse(any(storage))
+
+                framebuffer.draw_sprite(0, 0, b"\x80", SpriteMode.CLIP)
+
+                self.assertTrue(any(storage))
+
+    def test_interpreter_packed_framebuffer(self) -> None:
+        """
+        The interpreter draws through a packed framebuffer.
+
+        :return: None.
+        """
+
+        cpu = Interpreter(framebuffer=PackedFramebuffer())
+        cpu.current_op_code = 0xD005
+        cpu.execute_op_code()
+
+        self.assertEqual(0xF0000000_00000000, cpu.framebuffer.rows[0])  # type: ignore[attr-defined]
+        self.assertEqual(0x1, cpu.display_memory[0, -1])
+
+
+class TestRenderRgb(unittest.TestCase):
+    """
+    Palette conversion test harness.
+    """
+
+    def test_render_rgb(self) -> None:
+        """
+        Pixels are converted through the palette into bottom-up RGB rows.
+
+        :return: None.
+        """
+
+        framebuffer = ArrayFramebuffer()
+        framebuffer.draw_sprite(0, 0, b"\x80", SpriteMode.CLIP)
+
+        out = np.zeros(shape=(32, 64, 3), dtype=np.uint8)
+        lut = palette_lut(((1, 2, 3), (4, 5, 6)))
+
+        self.assertIs(out, render_rgb(framebuffer.to_array(), lut, out))
+        self.assertEqual([4, 5, 6], out[31, 0].tolist())
+        self.assertEqual([1, 2, 3], out[31, 1].tolist())
+        self.assertEqual([1, 2, 3], out[0, 0].tolist())
+
+    def test_render_rgb_rows(self) -> None:
+        """
+        Only the requested display rows are converted.
+
+        :return: None.
+        """
+
+        framebuffer = ArrayFramebuffer()
+        framebuffer.draw_sprite(0, 0, b"\x80" * 32, SpriteMode.CLIP)
+
+        out = np.zeros(shape=(32, 64, 3), dtype=np.uint8)
+        render_rgb(framebuffer.to_array(), palette_lut(((1, 1, 1), (2, 2, 2))), out, 4, 6)
+
+        self.assertEqual([2, 2, 2], out[32 - 5, 0].tolist())
+        self.assertEqual([1, 1, 1], out[32 - 5, 1].tolist())
+        self.assertEqual([2, 2, 2], out[32 - 6, 0].tolist())
+        self.assertEqual(2 * 64 * 3 - 2 * 3, int((out == 1).sum()))
+
+    def test_dirty_row_runs(self) -> None:
+        """
+        Dirty row masks are split into runs of consecutive rows.
+
+        :return: None.
+        """
+
+        self.assertEqual([], dirty_row_runs(0))
+        self.assertEqual([(0, 32)], dirty_row_runs(0xFFFFFFFF))
+        self.assertEqual([(0, 2), (5, 6), (30, 32)], dirty_row_runs(0b11 << 30 | 0b100011))
+
+
+class TestSwapBuffer(unittest.TestCase):
+    """
+    Swap buffer test harness.
+    """
+
+    def test_swap(self) -> None:
+        """
+        The latest frame published is taken, along with every row changed since the frame taken before it.
+
+        :return: None.
+        """
+
+        for framebuffer_type in (ArrayFramebuffer, PackedFramebuffer):
+            with self.subTest(framebuffer=framebuffer_type.__name__):
+                swap = SwapBuffer(framebuffer_type)
+                framebuffer = framebuffer_type()
+                storage = memoryview(bytearray(framebuffer_type.storage_size))
+                framebuffer.bind(storage)
+
+                self.assertIsNone(swap.take())
+                self.assertFalse(swap.wait(0))
+
+                framebuffer.draw_sprite(0, 0, b"\xff", SpriteMode.CLIP)
+                swap.publish(storage, 0b1)
+                framebuffer.draw_sprite(0, 4, b"\xff", SpriteMode.CLIP)
+                swap.publish(storage, 0b10000)
+
+                self.assertTrue(swap.wait(0))
+
+                taken = swap.take()
+
+                assert taken is not None
+                display, dirty_rows = taken
+
+                self.assertEqual(dirty_rows, 0b10001)
+                self.assertTrue(np.array_equal(display.to_array(), framebuffer.to_array()))
+                self.assertIsNone(swap.take())
+
+                # Publishing into the other buffer leaves the frame taken intact.
+                framebuffer.clear()
+                swap.publish(storage, 0b10001)
+
+                self.assertEqual(display.to_array().sum(), 16)
+
+    def test_threads(self) -> None:
+        """
+        Frames published by another thread are taken whole.
+
+        :return: None.
+        """
+
+        swap = SwapBuffer()
+        frames = 200
+
+        def publish() -> None:
+            for frame in range(1, frames + 1):
+                swap.publish(bytes([frame % 2]) * ArrayFramebuffer.storage_size, 1 << frame % 32)
+
+        thread = threading.Thread(target=publish)
+        thread.start()
+        taken = 0
+
+        while thread.is_alive() or swap.wait(0):
+            if swap.wait(0.01):
+                frame = swap.take()
+
+                assert frame is not None
+                pixels = frame[0].to_array()
+
+                self.assertTrue((pixels == pixels[0, 0]).all())
+                taken += 1
+
+        thread.join()
+
+        self.assertGreater(taken, 0)
+        self.assertEqual(pixels[0, 0], frames % 2)
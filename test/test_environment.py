@@ -0,0 +1,200 @@
+"""
+Environment unit tests.
+"""
+
+import unittest
+
+import numpy as np
+
+from chipmul8.environment import Environment, VectorEnvironment, key_mask
+
+# fmt: off
+# Draws the font sprite of the lowest key held, waiting while no key is held.
+key_rom = bytes([
+    0xF0, 0x0A,  # 200: V0 = key
+    0x00, 0xE0,  # 202: clear
+    0xF0, 0x29,  # 204: I = font sprite for V0
+    0xD1, 0x15,  # 206: draw at (V1, V1)
+    0x12, 0x00,  # 208: goto 200
+])
+
+# Draws a random row of pixels each frame.
+random_rom = bytes([
+    0xC0, 0xFF,  # 200: V0 = random
+    0xA3, 0x00,  # 202: I = 300
+    0xF0, 0x55,  # 204: store V0 at 300
+    0x00, 0xE0,  # 206: clear
+    0xD1, 0x11,  # 208: draw at (V1, V1)
+    0x12, 0x00,  # 20A: goto 200
+])
+
+# Executes an unknown opcode once a key is held.
+fault_rom = bytes([
+    0xF0, 0x0A,  # 200: V0 = key
+    0xFF, 0xFF,  # 202: unknown
+])
+# fmt: on
+
+
+class TestEnvironment(unittest.TestCase):
+    """
+    Single environment test harness.
+    """
+
+    def test_key_mask(self) -> None:
+        """
+        Actions are masks of the keys held.
+
+        :return: None.
+        """
+
+        self.assertEqual(key_mask(), 0)
+        self.assertEqual(key_mask(0x0, 0x5, 0xF), 0b1000_0000_0010_0001)
+
+    def test_step(self) -> None:
+        """
+        Steps return a view of the display reflecting the action.
+
+        :return: None.
+        """
+
+        environment = Environment(key_rom)
+        observation = environment.reset()
+
+        self.assertFalse(observation.any())
+
+        self.assertIs(environment.step(key_mask(0x1)), observation)
+        self.assertIs(observation, environment.cpu.framebuffer.to_array())
+
+        one = observation.copy()
+        environment.step(key_mask(0x7, 0x2))
+
+        self.assertTrue(one.any())
+        self.assertFalse(np.array_equal(one, observation))
+        self.assertEqual(environment.cpu.registers[0], 0x2)
+
+    def test_frame_skip(self) -> None:
+        """
+        Each step runs frame_skip frames of the instruction rate.
+
+        :return: None.
+        """
+
+        environment = Environment(key_rom, frame_skip=3, instructions_per_second=600)
+        environment.reset()
+        environment.step(key_mask(0x1))
+
+        self.assertEqual(environment.cpu.cycles, 30)
+
+    def test_sticky_actions(self) -> None:
+        """
+        Sticky actions repeat the previous action.
+
+        :return: None.
+        """
+
+        environment = Environment(key_rom, sticky_action_probability=1.0)
+        environment.reset(seed=1)
+
+        self.assertFalse(environment.step(key_mask(0x1)).any())
+        self.assertEqual(environment.action, 0)
+
+    def test_seed(self) -> None:
+        """
+        Seeding makes sticky actions and random numbers reproducible.
+
+        :return: None.
+        """
+
+        observations = []
+
+        for _ in range(2):
+            environment = Environment(random_rom, frame_skip=1, sticky_action_probability=0.5)
+            environment.reset(seed=7)
+
+            observations.append([environment.step(action).copy() for action in range(20)])
+
+        np.testing.assert_array_equal(observations[0], observations[1])
+
+    def test_terminated(self) -> None:
+        """
+        Faults end the episode.
+
+        :return: None.
+        """
+
+        environment = Environment(fault_rom)
+        environment.reset()
+
+        environment.step(0)
+        self.assertFalse(environment.terminated)
+
+        environment.step(key_mask(0x3))
+        self.assertTrue(environment.terminated)
+
+        cycles = environment.cpu.cycles
+        environment.step(key_mask(0x3))
+        self.assertEqual(environment.cpu.cycles, cycles)
+
+
+class TestVectorEnvironment(unittest.TestCase):
+    """
+    Batched environment test harness.
+    """
+
+    def test_matches_environment(self) -> None:
+        """
+        Each batched environment matches a single environment given the same actions.
+
+        :return: None.
+        """
+
+        environments = VectorEnvironment(key_rom, 16, frame_skip=2)
+        observations = environments.reset()
+
+        single = Environment(key_rom, frame_skip=2)
+
+        for step in range(3):
+            actions = np.array([key_mask(key) if (key + step) % 3 else 0 for key in range(16)])
+
+            self.assertIs(environments.step(actions), observations)
+
+            for index in range(16):
+                single.reset()
+
+                for previous in range(step + 1):
+                    single.step(key_mask(index) if (index + previous) % 3 else 0)
+
+                np.testing.assert_array_equal(single.observation, observations[index])
+
+    def test_sticky_actions(self) -> None:
+        """
+        Sticky actions are drawn per environment and are reproducible for a seed.
+
+        :return: None.
+        """
+
+        actions = []
+
+        for _ in range(2):
+            environments = VectorEnvironment(key_rom, 64, frame_skip=1, sticky_action_probability=0.5)
+            environments.reset(seed=3)
+            environments.step(np.full(64, key_mask(0x1)))
+
+            actions.append(environments.actions.copy())
+
+        np.testing.assert_array_equal(actions[0], actions[1])
+        self.assertEqual(set(actions[0].tolist()), {0, key_mask(0x1)})
+
+    def test_terminated(self) -> None:
+        """
+        Environments that fault are flagged while the rest carry on.
+
+        :return: None.
+        """
+
+        environments = VectorEnvironment(fault_rom, 2)
+        environments.reset()
+        environments.step(np.array([key_mask(0x3), 0]))
+
+        self.assertEqual(environments.terminated.tolist(), [True, False])
@@ -0,0 +1,237 @@
+"""
+Headless execution unit tests.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from chipmul8.headless import (
+    encode_png,
+    format_display,
+    format_memory,
+    memory_png,
+    parse_input_script,
+    run_headless,
+)
+from chipmul8.interpreter import StopReason
+from test import create_interpreter
+
+# fmt: off
+# Waits for a key, stores it in V0, draws the font sprite for it and spins.
+key_rom = bytes([
+    0xF0, 0x0A,  # 200: V0 = key
+    0xF0, 0x29,  # 202: I = font sprite for V0
+    0xD1, 0x15,  # 204: draw at (V1, V1)
+    0x12, 0x06,  # 206: goto 206
+])
+# fmt: on
+
+
+class TestHeadless(unittest.TestCase):
+    """
+    Headless runner test harness.
+    """
+
+    def test_parse_input_script(self) -> None:
+        """
+        Input scripts map frames to key masks.
+
+        :return: None.
+        """
+
+        inputs = parse_input_script("# warm up\n\n10 5a  # move\n20 -\n30 F\n")
+
+        self.assertEqual(inputs, {10: 1 << 0x5 | 1 << 0xA, 20: 0, 30: 1 << 0xF})
+
+        for script in ("10", "x 5", "-1 5", "10 G"):
+            with self.assertRaises(ValueError):
+                parse_input_script(script)
+
+    def test_frame_budget(self) -> None:
+        """
+        Every frame executes its share of the instruction rate and scripted keys are applied on their frame.
+
+        :return: None.
+        """
+
+        cpu = create_interpreter(key_rom)
+
+        reason = run_headless(cpu, frames=10, inputs={5: 1 << 0x7, 6: 0}, instructions_per_second=600)
+
+        # The rom ends jumping to itself.
+        self.assertEqual(reason, StopReason.IDLE)
+        self.assertEqual(cpu.registers[0], 0x7)
+        self.assertEqual(cpu.key_mask, 0)
+        self.assertEqual(cpu.program_counter, 0x206)
+        # Frames 0 - 4 stop at FX0A after a single cycle, the rest run their 10 cycles.
+        self.assertEqual(cpu.cycles, 5 + 10 * 5)
+
+    def test_cycle_budget(self) -> None:
+        """
+        The cycle budget stops execution partway through a frame.
+
+        :return: None.
+        """
+
+        cpu = create_interpreter(key_rom)
+
+        run_headless(cpu, cycles=25, inputs={0: 1 << 0x2})
+
+        self.assertEqual(cpu.cycles, 25)
+
+    def test_fault(self) -> None:
+        """
+        Execution stops at the faulting instruction.
+
+        :return: None.
+        """
+
+        cpu = create_interpreter(bytes([0x60, 0x01, 0xFF, 0xFF]))
+
+        self.assertEqual(run_headless(cpu, frames=5), StopReason.FAULT)
+        self.assertIsInstance(cpu.fault, ValueError)
+        self.assertEqual(cpu.program_counter, 0x202)
+
+    def test_requires_budget(self) -> None:
+        """
+        Running without a budget is rejected.
+
+        :return: None.
+        """
+
+        with self.assertRaises(ValueError):
+            run_headless(create_interpreter(key_rom))
+
+    def test_format_display(self) -> None:
+        """
+        The display renders as text, left to right.
+
+        :return: None.
+        """
+
+        cpu = create_interpreter(key_rom)
+        run_headless(cpu, frames=2, inputs={0: 1 << 0x1})
+
+        lines = format_display(cpu.display_memory).splitlines()
+
+        # Font sprite for 1 is 0x20, 0x60, 0x20, 0x20, 0x70.
+        self.assertEqual(len(lines), 32)
+        self.assertEqual([line[:8] for line in lines[:5]], ["..#.....", ".##.....", "..#.....", "..#.....", ".###...."])
+        self.assertEqual(lines[5], "." * 64)
+
+    def test_format_memory(self) -> None:
+        """
+        Memory renders as a hex dump.
+
+        :return: None.
+        """
+
+        self.assertEqual(
+            format_memory(bytes(range(20)), width=8),
+            "000: 00 01 02 03 04 05 06 07\n008: 08 09 0A 0B 0C 0D 0E 0F\n010: 10 11 12 13\n",
+        )
+
+    def test_encode_png(self) -> None:
+        """
+        PNGs carry the image dimensions and unfiltered scanlines.
+
+        :return: None.
+        """
+
+        png = memory_png(bytes(range(8)), width=4)
+
+        self.assertEqual(png[:8], b"\x89PNG\r\n\x1a\n")
+        self.assertEqual(png[12:16], b"IHDR")
+        self.assertEqual(int.from_bytes(png[16:20]), 4)
+        self.assertEqual(int.from_bytes(png[20:24]), 2)
+
+        data_length = int.from_bytes(png[33:37])
+        self.assertEqual(png[37:41], b"IDAT")
+        self.assertEqual(zlib.decompress(png[41 : 41 + data_length]), b"\x00\x00\x01\x02\x03\x00\x04\x05\x06\x07")
+        self.assertTrue(png.endswith(b"IEND\xae\x42\x60\x82"))
+
+        rgb = encode_png(np.zeros((32, 64, 3), dtype=np.uint8))
+
+        # Colour type 2 (RGB).
+        self.assertEqual(rgb[25], 2)
+
+
+class TestHeadlessCli(unittest.TestCase):
+    """
+    Headless command line test harness.
+    """
+
+    def test_headless_run(self) -> None:
+        """
+        Headless runs dump the machine state without importing pygame or OpenGL.
+
+        :return: None.
+        """
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory)
+            (path / "key.ch8").write_bytes(key_rom)
+            (path / "inputs.txt").write_text("0 1\n")
+
+            code = (
+                "import sys\n"
+                "from chipmul8.cli import cli\n"
+                "try:\n"
+                "    cli(sys.argv[1:])\n"
+                "except SystemExit as e:\n"
+                "    assert not e.code, e.code\n"
+                "assert 'pygame' not in sys.modules and 'OpenGL' not in sys.modules\n"
+            )
+            arguments = [
+                "--headless",
+                "--frames=2",
+                f"--input_script={path / 'inputs.txt'}",
+                f"--dump_display={path / 'display.txt'}",
+                f"--dump_ram={path / 'ram.png'}",
+                "--dump_registers=-",
+                str(path / "key.ch8"),
+            ]
+
+            result = subprocess.run(  # noqa: S603
+                [sys.executable, "-c", code, *arguments],
+                capture_output=True,
+                check=False,
+                env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+                text=True,
+            )
+
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn("V0=01", result.stdout)
+            self.assertIn("PC=206", result.stdout)
+            self.assertEqual((path / "display.txt").read_text().splitlines()[0][:8], "..#.....")
+            self.assertTrue((path / "ram.png").read_bytes().startswith(b"\x89PNG"))
+
+    def test_headless_rom_too_big(self) -> None:
+        """
+        A ROM too big for memory is reported as a usage error rather than a traceback.
+
+        :return: None.
+        """
+
+        with tempfile.TemporaryDirectory() as directory:
+            rom = Path(directory) / "oversized.ch8"
+            rom.write_bytes(bytes(4000))
+
+            result = subprocess.run(  # noqa: S603
+                [sys.executable, "-m", "chipmul8", "run", "--headless", "--frames=1", str(rom)],
+                capture_output=True,
+                check=False,
+                env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+                text=True,
+            )
+
+            self.assertEqual(result.returncode, 2, result.stderr)
+            self.assertIn("Invalid value for 'INPUT_FILE'", result.stderr)
+            self.assertNotIn("Traceback", result.stderr)
@@ -0,0 +1,210 @@
+"""
+Basic-block compiler unit tests.
+"""
+
+import unittest
+
+from chipmul8.interpreter import Interpreter, StopReason
+from chipmul8.jit import BlockCompiler
+from test import create_interpreter
+
+# fmt: off
+# Counts V1 up to 5 adding V2 into V0 each pass, then sets I and spins.
+loop_rom = bytes([
+    0x60, 0x00,  # 200: V0 = 0
+    0x61, 0x00,  # 202: V1 = 0
+    0x62, 0x03,  # 204: V2 = 3
+    0x71, 0x01,  # 206: V1 += 1
+    0x80, 0x24,  # 208: V0 += V2
+    0x31, 0x05,  # 20A: skip if V1 == 5
+    0x12, 0x06,  # 20C: goto 206
+    0xA3, 0x00,  # 20E: I = 300
+    0x12, 0x10,  # 210: goto 210
+])
+
+# Calls a subroutine, overwrites its first instruction through FX55 and calls it again.
+self_modifying_rom = bytes([
+    0x22, 0x10,  # 200: call 210
+    0xA2, 0x10,  # 202: I = 210
+    0x60, 0x63,  # 204: V0 = 63
+    0x61, 0x09,  # 206: V1 = 09
+    0xF1, 0x55,  # 208: store V0..V1 at 210 => 6309 (V3 = 9)
+    0x22, 0x10,  # 20A: call 210
+    0x12, 0x0C,  # 20C: goto 20C
+    0x00, 0x00,  # 20E: padding
+    0x63, 0x05,  # 210: V3 = 5
+    0x00, 0xEE,  # 212: return
+])
+
+# Draws a random number then calls itself until the stack overflows.
+random_recursion_rom = bytes([
+    0xC0, 0xFF,  # 200: V0 = random & FF
+    0x22, 0x00,  # 202: call 200
+])
+
+# Mixes compiled arithmetic, random numbers, memory writes, drawing and a timer wait.
+mixed_rom = bytes([
+    0xC1, 0x3F,  # 200: V1 = random & 3F
+    0x72, 0x05,  # 202: V2 += 5
+    0x83, 0x24,  # 204: V3 += V2
+    0xA3, 0x00,  # 206: I = 300
+    0xF3, 0x33,  # 208: store V3 as BCD at 300
+    0xF2, 0x65,  # 20A: load V0..V2 from 300
+    0xD1, 0x25,  # 20C: draw at (V1, V2)
+    0x64, 0x02,  # 20E: V4 = 2
+    0xF4, 0x15,  # 210: DT = V4
+    0xF5, 0x07,  # 212: V5 = DT
+    0x35, 0x00,  # 214: skip if V5 == 0
+    0x12, 0x12,  # 216: goto 212
+    0x12, 0x00,  # 218: goto 200
+])
+# fmt: on
+
+
+def create_compiled(rom: bytes, **kwargs: int) -> tuple[Interpreter, BlockCompiler]:
+    """
+    Create an interpreter executing a rom through compiled blocks.
+
+    :param rom: Rom contents.
+    :param kwargs: BlockCompiler options.
+    :return: Interpreter and its block compiler.
+    """
+
+    cpu = create_interpreter(rom, seed=0)
+    compiler = BlockCompiler(cpu, **kwargs)
+    compiler.attach()
+
+    return cpu, compiler
+
+
+class TestBlockCompiler(unittest.TestCase):
+    """
+    Basic-block compiler test harness.
+    """
+
+    def assert_same_machine(self, reference: Interpreter, cpu: Interpreter) -> None:
+        """
+        Assert two interpreters are in the same state, cycles, side effects and CXNN generator included.
+
+        :param reference: Interpreter executed through its dispatch table.
+        :param cpu: Interpreter executed through compiled blocks.
+        :return: None.
+        """
+
+        self.assertEqual(bytes(reference.sync_state()), bytes(cpu.sync_state()))
+        self.assertEqual(reference.cycles, cpu.cycles)
+        self.assertEqual(reference.side_effects, cpu.side_effects)
+        self.assertEqual(reference.random.getstate(), cpu.random.getstate())
+
+    def test_matches_interpreter(self) -> None:
+        """
+        Compiled runs stop for the same reasons and leave the machine in the same state as the interpreter, whatever
+        the budget.
+
+        :return: None.
+        """
+
+        for rom in (loop_rom, mixed_rom):
+            for budget in (1, 5, 11, 200):
+                with self.subTest(rom=rom.hex(), budget=budget):
+                    reference = create_interpreter(rom, seed=0)
+                    cpu, _ = create_compiled(rom)
+
+                    for _ in range(30):
+                        self.assertEqual(reference.run_frame(budget), cpu.run_frame(budget))
+                        self.assert_same_machine(reference, cpu)
+
+    def test_blocks_are_cached(self) -> None:
+        """
+        Blocks are compiled once per entry address, and cut short to fit the end of a budget.
+
+        :return: None.
+        """
+
+        cpu, compiler = create_compiled(loop_rom)
+
+        self.assertEqual(StopReason.IDLE, cpu.run(200))
+        self.assertEqual({0x200, 0x206, 0x20C, 0x20E, 0x210}, set(compiler.blocks))
+        self.assertEqual(0xF, cpu.registers[0x0])
+
+        block = compiler.blocks[0x200]
+        cpu.program_counter = 0x200
+        cpu.run(2)
+
+        self.assertIs(block, compiler.blocks[0x200])
+        self.assertEqual({2}, set(compiler.truncated[0x200]))
+        self.assertEqual(0x204, cpu.program_counter)
+
+    def test_idle_loop(self) -> None:
+        """
+        Idle loops ending compiled blocks are fast-forwarded as the interpreter does.
+
+        :return: None.
+        """
+
+        reference = create_interpreter(loop_rom, seed=0)
+        cpu, _ = create_compiled(loop_rom)
+
+        for _ in range(3):
+            self.assertEqual(StopReason.IDLE, cpu.run_frame(700))
+            self.assertEqual(StopReason.IDLE, reference.run_frame(700))
+
+        self.assert_same_machine(reference, cpu)
+        self.assertEqual(2100, cpu.cycles)
+
+    def test_self_modifying_code(self) -> None:
+        """
+        Writing into compiled code through FX55 discards the stale block.
+
+        :return: None.
+        """
+
+        cpu, compiler = create_compiled(self_modifying_rom)
+
+        cpu.run(3)
+
+        self.assertIn(0x210, compiler.blocks)
+
+        cpu.run(7)
+
+        self.assertEqual(0x9, cpu.registers[0x3])
+        self.assertEqual(0x20C, cpu.program_counter)
+        self.assertEqual(0, cpu.stack_pointer)
+
+    def test_fault(self) -> None:
+        """
+        Faults are reported on the faulting instruction, without drawing the block's random numbers twice.
+
+        :return: None.
+        """
+
+        reference = create_interpreter(random_recursion_rom, seed=0)
+        cpu, _ = create_compiled(random_recursion_rom)
+
+        self.assertEqual(StopReason.FAULT, reference.run(100))
+        self.assertEqual(StopReason.FAULT, cpu.run(100))
+        self.assertIsInstance(cpu.fault, IndexError)
+        self.assertEqual(0x202, cpu.program_counter)
+        self.assert_same_machine(reference, cpu)
+
+    def test_state_changes(self) -> None:
+        """
+        Loading a state discards every block, and detaching restores the interpreter's own run.
+
+        :return: None.
+        """
+
+        cpu, compiler = create_compiled(loop_rom)
+        state = cpu.save_state()
+        cpu.run(50)
+
+        self.assertTrue(compiler.blocks)
+
+        cpu.load_state(state)
+
+        self.assertFalse(compiler.blocks)
+
+        compiler.detach()
+
+        self.assertNotIn("run", vars(cpu))
+        self.assertNotIn("reset_idle", vars(cpu))
@@ -0,0 +1,122 @@
+"""
+Movie recording and replay unit tests.
+"""
+
+import unittest
+from io import BytesIO
+from random import Random
+
+from chipmul8.display import PackedFramebuffer
+from chipmul8.interpreter import Interpreter
+from chipmul8.movie import Movie, ReplayDivergedError, replay, rom_hash
+from chipmul8.scheduler import FrameScheduler
+
+# fmt: off
+# Draws the font sprite of a random key whenever that key is held.
+random_key_rom = bytes([
+    0xC0, 0x0F,  # 200: V0 = random & F
+    0xE0, 0x9E,  # 202: skip if key V0 held
+    0x12, 0x0A,  # 204: goto 20A
+    0xF0, 0x29,  # 206: I = font sprite for V0
+    0xD1, 0x15,  # 208: draw at (V1, V1)
+    0x71, 0x01,  # 20A: V1 += 1
+    0x12, 0x00,  # 20C: goto 200
+])
+# fmt: on
+
+
+def record(frames: int) -> tuple[Movie, Interpreter]:
+    """
+    Record a run of random_key_rom with random keys held, frame by frame as the game engine does.
+
+    :param frames: Number of frames to record.
+    :return: Movie and the interpreter in its final state.
+    """
+
+    movie = Movie(rom_hash(random_key_rom), 7, instructions_per_second=650)
+    cpu = movie.create_interpreter()
+    cpu.load_rom(BytesIO(random_key_rom))
+
+    scheduler = FrameScheduler(650)
+    keys = Random(1)
+
+    for _ in range(frames):
+        cpu.key_mask = keys.choice([0, 0xFFFF, keys.randrange(0x10000)])
+        cpu.run_frame(scheduler.cycles_for_next_frame())
+        movie.record_frame(cpu)
+
+    return movie, cpu
+
+
+class TestMovie(unittest.TestCase):
+    """
+    Movie test harness.
+    """
+
+    def test_replay(self) -> None:
+        """
+        Replaying a saved movie reproduces the recorded run exactly, on either display backend.
+
+        :return: None.
+        """
+
+        movie, recorded = record(250)
+        loaded = Movie.from_bytes(movie.to_bytes())
+
+        self.assertEqual(len(loaded), 250)
+        self.assertEqual(len(loaded.checkpoints), 4)
+
+        for framebuffer in (None, PackedFramebuffer()):
+            with self.subTest(framebuffer=framebuffer):
+                cpu = replay(loaded, random_key_rom, framebuffer)
+
+                self.assertEqual(cpu.save_state(), recorded.save_state())
+
+    def test_divergence(self) -> None:
+        """
+        Replays that stop matching the recording are caught at the next checkpoint.
+
+        :return: None.
+        """
+
+        movie, _ = record(250)
+        movie.seed += 1
+
+        with self.assertRaises(ReplayDivergedError) as context:
+            replay(movie, random_key_rom)
+
+        self.assertEqual(context.exception.frame, 60)
+
+    def test_truncate(self) -> None:
+        """
+        Truncating drops the frames and checkpoints past the cut, and the rest still replays.
+
+        :return: None.
+        """
+
+        movie, _ = record(250)
+        movie.truncate(130)
+
+        self.assertEqual(len(movie), 130)
+        self.assertEqual(len(movie.checkpoints), 2)
+
+        replay(movie, random_key_rom)
+
+    def test_invalid(self) -> None:
+        """
+        Other ROMs and files that aren't movies are rejected.
+
+        :return: None.
+        """
+
+        movie, _ = record(10)
+        data = movie.to_bytes()
+
+        with self.assertRaises(ValueError):
+            replay(movie, random_key_rom + b"\x00")
+
+        with self.assertRaises(ValueError):
+            Movie.from_bytes(data[:-1])
+
+        with self.assertRaises(ValueError):
+            Movie.from_bytes(b"XXXX" + data[4:])
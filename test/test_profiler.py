@@ -0,0 +1,205 @@
+"""
+Host profiler unit tests.
+"""
+
+import json
+import unittest
+
+from chipmul8.interpreter import Interpreter
+from chipmul8.profiler import GuestProfiler, HostProfiler, format_report, op_code_pattern
+from test import create_interpreter
+
+# fmt: off
+# Adds V1 to V0 in a loop, calling a subroutine each time around.
+loop_rom = bytes([
+    0x80, 0x14,  # 200: V0 += V1
+    0x22, 0x08,  # 202: call 208
+    0x12, 0x00,  # 204: goto 200
+    0x00, 0x00,  # 206: padding
+    0x71, 0x01,  # 208: V1 += 1
+    0x00, 0xEE,  # 20A: return
+])
+
+# Calls a subroutine which calls another, calls the other directly, then waits for the delay timer and starts over.
+call_rom = bytes([
+    0x22, 0x10,  # 200: call 210
+    0x22, 0x18,  # 202: call 218
+    0x63, 0x03,  # 204: V3 = 3
+    0xF3, 0x15,  # 206: delay timer = V3
+    0xF4, 0x07,  # 208: V4 = delay timer
+    0x34, 0x00,  # 20A: skip if V4 == 0
+    0x12, 0x08,  # 20C: goto 208
+    0x12, 0x00,  # 20E: goto 200
+    0x70, 0x01,  # 210: V0 += 1
+    0x22, 0x18,  # 212: call 218
+    0x00, 0xEE,  # 214: return
+    0x00, 0x00,  # 216: padding
+    0x71, 0x01,  # 218: V1 += 1
+    0x00, 0xEE,  # 21A: return
+])
+# fmt: on
+
+
+class TestHostProfiler(unittest.TestCase):
+    """
+    Host profiler test harness.
+    """
+
+    def test_op_code_pattern(self) -> None:
+        """
+        Opcodes are named by the instruction they decode to.
+
+        :return: None.
+        """
+
+        self.assertEqual(op_code_pattern(0x8AB4), "8XY4")
+        self.assertEqual(op_code_pattern(0x00EE), "00EE")
+        self.assertEqual(op_code_pattern(0x1234), "1NNN")
+        self.assertEqual(op_code_pattern(0x6A12), "6XNN")
+        self.assertEqual(op_code_pattern(0xD125), "DXYN")
+        self.assertEqual(op_code_pattern(0xFA33), "FX33")
+        self.assertEqual(op_code_pattern(0x800F), "unknown")
+
+    def test_counts(self) -> None:
+        """
+        Every executed instruction is counted under its pattern and family, and frames as the emulate phase.
+
+        :return: None.
+        """
+
+        cpu = create_interpreter(loop_rom, seed=0)
+        profiler = HostProfiler()
+        profiler.attach(cpu)
+
+        cpu.run_frame(100)
+        cpu.run_frame(100)
+
+        report = profiler.report()
+        executions = {row["name"]: row["executions"] for row in report["instructions"]}
+        families = {row["name"]: row["executions"] for row in report["families"]}
+        phases = {row["name"]: row["calls"] for row in report["phases"]}
+
+        self.assertEqual(executions, {"8XY4": 40, "2NNN": 40, "7XNN": 40, "00EE": 40, "1NNN": 40})
+        self.assertEqual(families["8XXX"], 40)
+        self.assertEqual(families["0XXX"], 40)
+        self.assertEqual(phases, {"emulate": 2})
+        self.assertEqual(report["instructions_executed"], 200)
+        self.assertEqual(report["cycles"], 200)
+        self.assertEqual(report["frames"], 2)
+        self.assertAlmostEqual(sum(row["share"] for row in report["instructions"]), 1.0)
+
+        # The report is JSON serialisable and its tables name the instructions.
+        json.dumps(report)
+        self.assertIn("8XY4", format_report(report))
+
+    def test_detach(self) -> None:
+        """
+        Detaching restores the interpreter to the shared dispatch table, and it runs the same as an unprofiled one.
+
+        :return: None.
+        """
+
+        cpu = create_interpreter(loop_rom, seed=0)
+        profiler = HostProfiler()
+        profiler.attach(cpu)
+        cpu.run_frame(50)
+        profiler.detach(cpu)
+
+        self.assertIs(cpu.dispatch_table, Interpreter.dispatch_table)
+        self.assertNotIn("run_frame", vars(cpu))
+
+        cpu.run_frame(50)
+
+        expected = create_interpreter(loop_rom, seed=0)
+        expected.run_frame(100)
+
+        self.assertEqual(cpu.save_state(), expected.save_state())
+        self.assertEqual(profiler.report()["instructions_executed"], 50)
+
+
+class TestGuestProfiler(unittest.TestCase):
+    """
+    Guest profiler test harness.
+    """
+
+    def test_call_graph(self) -> None:
+        """
+        Cycles are attributed to the call stack they were spent in, fast-forwarded idle loops included.
+
+        :return: None.
+        """
+
+        cpu = create_interpreter(call_rom, seed=0)
+        profiler = GuestProfiler()
+        profiler.attach(cpu)
+
+        for _ in range(40):
+            cpu.run_frame(100)
+
+        iterations = cpu.registers[0x0]
+        subroutines = {row["name"]: row for row in profiler.subroutines()}
+
+        self.assertEqual(cpu.registers[0x1], iterations * 2)
+        self.assertGreater(profiler.skipped_cycles, 0)
+        self.assertEqual(profiler.executed[0] + profiler.skipped_cycles, cpu.cycles)
+        self.assertEqual(sum(profiler.stacks.values()), cpu.cycles)
+        self.assertEqual(profiler.executions[0x200], iterations)
+        self.assertEqual(profiler.executions[0x218], iterations * 2)
+
+        self.assertEqual(subroutines["main"]["inclusive_cycles"], cpu.cycles)
+        self.assertEqual(subroutines["sub_210"]["calls"], iterations)
+        self.assertEqual(subroutines["sub_218"]["calls"], iterations * 2)
+        # sub_210: V0 += 1, call, return. sub_218: V1 += 1, return.
+        self.assertEqual(subroutines["sub_210"]["exclusive_cycles"], iterations * 3)
+        self.assertEqual(subroutines["sub_210"]["inclusive_cycles"], iterations * 5)
+        self.assertEqual(subroutines["sub_218"]["inclusive_cycles"], iterations * 4)
+
+        folded = dict(line.rsplit(" ", 1) for line in profiler.folded_stacks().splitlines())
+
+        self.assertEqual(set(folded), {"main", "main;sub_210", "main;sub_210;sub_218", "main;sub_218"})
+        self.assertEqual(int(folded["main;sub_210;sub_218"]), iterations * 2)
+
+        report = profiler.report()
+        json.dumps(report)
+
+        self.assertEqual(report["addresses"][0]["address"], "208")
+
+    def test_heatmap(self) -> None:
+        """
+        Heatmaps are PNG images of RAM.
+
+        :return: None.
+        """
+
+        cpu = create_interpreter(call_rom, seed=0)
+        profiler = GuestProfiler()
+        profiler.attach(cpu)
+        cpu.run_frame(100)
+
+        png = profiler.heatmap(cpu.ram.memory)
+
+        self.assertTrue(png.startswith(b"\x89PNG"))
+        # 64 x 64 pixels, one per byte of RAM.
+        self.assertEqual(png[16:24], bytes([0, 0, 0, 64, 0, 0, 0, 64]))
+
+    def test_with_host_profiler(self) -> None:
+        """
+        Both profilers can profile an interpreter at once, and detaching them restores the shared dispatch table.
+
+        :return: None.
+        """
+
+        cpu = create_interpreter(call_rom, seed=0)
+        host = HostProfiler()
+        guest = GuestProfiler()
+        host.attach(cpu)
+        guest.attach(cpu)
+        cpu.run_frame(100)
+
+        self.assertEqual(host.report()["instructions_executed"], guest.executed[0])
+
+        guest.detach(cpu)
+        host.detach(cpu)
+
+        self.assertIs(cpu.dispatch_table, Interpreter.dispatch_table)
+        self.assertFalse({"dispatch_table", "run", "run_frame"} & set(vars(cpu)))
@@ -0,0 +1,27 @@
+"""
+Frame scheduler unit tests.
+"""
+
+import unittest
+
+from chipmul8.scheduler import TIMER_FREQUENCY, FrameScheduler
+
+
+class TestFrameScheduler(unittest.TestCase):
+    """
+    Frame scheduler test harness.
+    """
+
+    def test_cycles_per_second(self) -> None:
+        """
+        Every second of frames executes exactly the configured number of instructions.
+
+        :return: None.
+        """
+
+        for instructions_per_second in (1, 60, 500, 700, 1000):
+            scheduler = FrameScheduler(instructions_per_second)
+            cycles = [scheduler.cycles_for_next_frame() for _ in range(TIMER_FREQUENCY * 2)]
+
+            self.assertEqual(instructions_per_second * 2, sum(cycles))
+            self.assertLessEqual(max(cycles) - min(cycles), 1)
@@ -0,0 +1,180 @@
+"""
+Shared machine unit tests.
+"""
+
+import time
+import unittest
+from collections.abc import Callable
+from io import BytesIO
+
+import numpy as np
+
+from chipmul8.display import ALL_ROWS, ArrayFramebuffer, PackedFramebuffer
+from chipmul8.interpreter import Interpreter
+from chipmul8.shared import MachineStatus, SharedMachine, start_interpreter
+
+# fmt: off
+# Waits for key 5 to be held, then draws its font sprite one pixel further right, again and again.
+walk_rom = bytes([
+    0x60, 0x05,  # 200: V0 = 5
+    0xE0, 0x9E,  # 202: skip if key V0 is held
+    0x12, 0x02,  # 204: goto 202
+    0xF0, 0x29,  # 206: I = font sprite for V0
+    0xD1, 0x25,  # 208: draw at (V1, V2)
+    0x71, 0x01,  # 20A: V1 += 1
+    0x12, 0x08,  # 20C: goto 208
+])
+# fmt: on
+
+
+def wait_for(condition: Callable[[], bool], timeout: float = 30) -> bool:
+    """
+    Poll a condition until it holds.
+
+    :param condition: Condition to wait for.
+    :param timeout: Seconds to wait at most.
+    :return: True if the condition held in time.
+    """
+
+    deadline = time.monotonic() + timeout
+
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+
+        time.sleep(0.01)
+
+    return True
+
+
+class TestSharedMachine(unittest.TestCase):
+    """
+    Shared machine test harness.
+    """
+
+    def create(self, framebuffer_type: type = ArrayFramebuffer) -> SharedMachine:
+        """
+        Create a shared machine, closed and unlinked once the test is done.
+
+        :param framebuffer_type: Display backend.
+        :return: Shared machine.
+        """
+
+        machine = SharedMachine.create(framebuffer_type)
+        self.addCleanup(machine.unlink)
+        self.addCleanup(machine.close)
+
+        return machine
+
+    def test_publish(self) -> None:
+        """
+        Published frames are read back from the segment with the rows they changed, without copying the machine.
+
+        :return: None.
+        """
+
+        for framebuffer_type in (ArrayFramebuffer, PackedFramebuffer):
+            with self.subTest(framebuffer=framebuffer_type.__name__):
+                machine = self.create(framebuffer_type)
+                cpu = Interpreter(framebuffer=framebuffer_type(), seed=0)
+                cpu.load_rom(BytesIO(walk_rom))
+                machine.bind(cpu)
+                self.addCleanup(machine.unbind, cpu)
+
+                self.assertEqual(machine.published, 0)
+
+                machine.publish(cpu)
+                _, dirty_rows = machine.frame(1)
+
+                self.assertEqual(dirty_rows, ALL_ROWS)
+                self.assertEqual(cpu.dirty_rows, 0)
+
+                cpu.key_mask = 1 << 5
+                cpu.run(4)
+                machine.publish(cpu)
+                framebuffer, dirty_rows = machine.frame(machine.published)
+
+                self.assertEqual(machine.published, 2)
+                self.assertEqual(dirty_rows, 0b11111)
+                self.assertTrue(np.array_equal(framebuffer.to_array(), cpu.display_memory))
+                # The machine runs on the segment itself.
+                self.assertEqual(bytes(machine.state), bytes(cpu.sync_state()))
+                self.assertFalse(machine.overwritten(2))
+
+                machine.publish(cpu)
+
+                self.assertFalse(machine.overwritten(2))
+
+                machine.publish(cpu)
+
+                self.assertTrue(machine.overwritten(2))
+
+    def test_attach(self) -> None:
+        """
+        Other processes attach by name and share the header, the framebuffer backend is read from it.
+
+        :return: None.
+        """
+
+        machine = self.create(PackedFramebuffer)
+        attached = SharedMachine.attach(machine.name)
+        self.addCleanup(attached.close)
+
+        attached.key_mask = 0x1_8001
+        machine.stop()
+
+        self.assertIs(attached.framebuffer_type, PackedFramebuffer)
+        self.assertEqual(machine.key_mask, 0x8001)
+        self.assertTrue(attached.stop_requested)
+        self.assertEqual(attached.status, MachineStatus.RUNNING)
+
+        attached.finish("Unknown opcode")
+
+        self.assertEqual(machine.status, MachineStatus.FAULTED)
+        self.assertEqual(machine.message, "Unknown opcode")
+
+        with self.assertRaises(ValueError):
+            machine.bind(Interpreter())
+
+    def test_interpreter_process(self) -> None:
+        """
+        The interpreter process runs in real time, reading keys from and publishing frames to the segment.
+
+        :return: None.
+        """
+
+        machine = self.create()
+        process = start_interpreter(machine, walk_rom)
+        self.addCleanup(process.join)
+
+        self.assertTrue(wait_for(lambda: machine.published >= 1))
+
+        machine.key_mask = 1 << 5
+
+        self.assertTrue(wait_for(lambda: machine.published >= 3))
+
+        machine.stop()
+        process.join(30)
+        framebuffer, _ = machine.frame(machine.published)
+
+        self.assertEqual(process.exitcode, 0)
+        self.assertEqual(machine.status, MachineStatus.STOPPED)
+        self.assertTrue(framebuffer.to_array().any())
+
+        # The segment can't be closed while its display is viewed.
+        del framebuffer
+
+        faulting = self.create()
+        process = start_interpreter(faulting, bytes([0x00, 0x00]))
+        process.join(30)
+
+        self.assertEqual(faulting.status, MachineStatus.FAULTED)
+        self.assertIn("0x0", faulting.message)
+
+        # Failing to create the interpreter is reported too, rather than leaving the machine running.
+        failing = self.create()
+        process = start_interpreter(failing, walk_rom, seed=(1,))  # type: ignore[arg-type]
+        process.join(30)
+
+        self.assertEqual(failing.status, MachineStatus.FAULTED)
+        self.assertTrue(failing.message)
@@ -0,0 +1,309 @@
+"""
+Save state and rewind buffer unit tests.
+"""
+
+import unittest
+
+import numpy as np
+
+from chipmul8.display import PackedFramebuffer
+from chipmul8.interpreter import SAVE_STATE_RANDOM_SIZE, STATE_DISPLAY, STATE_KEYS, STATE_RAM, STATE_STACK, Interpreter
+from chipmul8.rewind import RewindBuffer
+from test import create_interpreter
+
+# fmt: off
+# Bounces a random sprite around the display, calling a subroutine and using both timers.
+busy_rom = bytes([
+    0x22, 0x10,  # 200: call 210
+    0xC2, 0xFF,  # 202: V2 = random
+    0xA3, 0x00,  # 204: I = 300
+    0xF2, 0x55,  # 206: store V0..V2 at 300
+    0xD0, 0x13,  # 208: draw 3 rows at (V0, V1)
+    0xF3, 0x15,  # 20A: delay timer = V3
+    0x12, 0x00,  # 20C: goto 200
+    0x00, 0x00,  # 20E: padding
+    0x70, 0x03,  # 210: V0 += 3
+    0x71, 0x01,  # 212: V1 += 1
+    0x73, 0x07,  # 214: V3 += 7
+    0xF3, 0x18,  # 216: sound timer = V3
+    0x00, 0xEE,  # 218: return
+])
+
+# Draws a random number every other instruction.
+dice_rom = bytes([
+    0xC0, 0x0F,  # 200: V0 = random & 0F
+    0x71, 0x01,  # 202: V1 += 1
+    0x12, 0x00,  # 204: goto 200
+])
+# fmt: on
+
+
+def machine_state(cpu: Interpreter) -> tuple[object, ...]:
+    """
+    Everything a save state captures, in comparable form.
+
+    :param cpu: Interpreter to inspect.
+    :return: Machine state.
+    """
+
+    return (
+        bytes(cpu.ram.memory),
+        bytes(cpu.registers.memory),
+        list(cpu.stack),
+        cpu.stack_pointer,
+        cpu.register_i,
+        cpu.program_counter,
+        cpu.delay_register,
+        cpu.sound_register,
+        cpu.current_op_code,
+        cpu.key_mask,
+        cpu.cycles,
+        cpu.dirty_rows,
+        cpu.frame_ready,
+        cpu.display_memory.tobytes(),
+    )
+
+
+class TestSaveState(unittest.TestCase):
+    """
+    Save state test harness.
+    """
+
+    def test_round_trip(self) -> None:
+        """
+        Loading a state restores the machine, and execution continues identically (including random numbers).
+
+        :return: None.
+        """
+
+        cpu = create_interpreter(busy_rom)
+        cpu.key_mask = 0b1010
+        cpu.run_frame(150)
+
+        state = cpu.save_state()
+        saved = machine_state(cpu)
+
+        cpu.run_frame(150)
+        expected = machine_state(cpu)
+
+        restored = Interpreter()
+        restored.load_state(state)
+
+        self.assertEqual(saved, machine_state(restored))
+
+        restored.run_frame(150)
+
+        self.assertEqual(expected, machine_state(restored))
+
+    def test_framebuffers_interchangeable(self) -> None:
+        """
+        States saved from one display backend load into the other.
+
+        :return: None.
+        """
+
+        cpu = create_interpreter(busy_rom)
+        cpu.run_frame(200)
+
+        packed = Interpreter(framebuffer=PackedFramebuffer())
+        packed.load_state(cpu.save_state())
+
+        np.testing.assert_array_equal(cpu.display_memory, packed.display_memory)
+        self.assertEqual(cpu.save_state(), packed.save_state())
+
+    def test_invalid_state(self) -> None:
+        """
+        Anything other than a save state is rejected.
+
+        :return: None.
+        """
+
+        state = create_interpreter(busy_rom).save_state()
+
+        with self.assertRaises(ValueError):
+            Interpreter().load_state(state[:-1])
+
+        with self.assertRaises(ValueError):
+            Interpreter().load_state(b"XXXX" + state[4:])
+
+        # Too short to hold the header.
+        for truncated in (b"", state[:8]):
+            with self.assertRaises(ValueError):
+                Interpreter().load_state(truncated)
+
+
+class TestStateBlock(unittest.TestCase):
+    """
+    State block test harness.
+    """
+
+    def test_views(self) -> None:
+        """
+        RAM, the stack, the keys and the display are views of the state block.
+
+        :return: None.
+        """
+
+        cpu = create_interpreter(busy_rom)
+        cpu.run_frame(100)
+        cpu.key_mask = 0b100
+
+        self.assertEqual(busy_rom, cpu.state[STATE_RAM + 0x200 : STATE_RAM + 0x200 + len(busy_rom)])
+        self.assertEqual(cpu.stack.tobytes(), cpu.state[STATE_STACK:STATE_KEYS])
+        self.assertEqual(1, cpu.state[STATE_KEYS + 2])
+        self.assertEqual(cpu.display_memory.tobytes(), cpu.state[STATE_DISPLAY:])
+
+        cpu.ram[0x300] = 0xAB
+        self.assertEqual(0xAB, cpu.state[STATE_RAM + 0x300])
+
+    def test_snapshot(self) -> None:
+        """
+        Snapshots capture the whole guest, compare equal for identical machines and restore it.
+
+        :return: None.
+        """
+
+        for framebuffer in (None, PackedFramebuffer()):
+            with self.subTest(framebuffer=framebuffer):
+                cpu = create_interpreter(busy_rom, framebuffer=framebuffer)
+                cpu.run_frame(150)
+
+                snapshot = cpu.snapshot()
+                saved = machine_state(cpu)
+
+                self.assertEqual(snapshot, cpu.fork().snapshot())
+
+                cpu.key_mask = 0xFFFF
+                cpu.run_frame(150)
+
+                self.assertNotEqual(snapshot, cpu.snapshot())
+
+                cpu.restore(snapshot)
+
+                self.assertEqual(saved, machine_state(cpu))
+                self.assertEqual(snapshot, cpu.snapshot())
+
+    def test_snapshot_layout(self) -> None:
+        """
+        Snapshots only restore into machines with the same display backend.
+
+        :return: None.
+        """
+
+        with self.assertRaises(ValueError):
+            Interpreter(framebuffer=PackedFramebuffer()).restore(Interpreter().snapshot())
+
+
+class TestRewindBuffer(unittest.TestCase):
+    """
+    Rewind buffer test harness.
+    """
+
+    def test_push_pop(self) -> None:
+        """
+        States come back out newest first, across keyframes.
+
+        :return: None.
+        """
+
+        cpu = create_interpreter(busy_rom)
+        rewind = RewindBuffer(capacity=1000, keyframe_interval=16)
+        states = []
+
+        for _ in range(100):
+            cpu.run_frame(12)
+            states.append(cpu.save_state())
+            rewind.push(states[-1])
+
+        self.assertEqual(len(rewind), 100)
+        self.assertLess(rewind.nbytes, sum(map(len, states)) // 10)
+
+        for state in reversed(states):
+            self.assertEqual(rewind.pop(), state)
+
+        self.assertEqual(len(rewind), 0)
+        self.assertIsNone(rewind.pop())
+
+    def test_capacity(self) -> None:
+        """
+        Once over capacity the oldest segment is dropped.
+
+        :return: None.
+        """
+
+        rewind = RewindBuffer(capacity=10, keyframe_interval=4)
+
+        for index in range(12):
+            rewind.push(bytes([index]) * 8)
+
+        # States 0 - 3 were dropped together with their keyframe.
+        self.assertEqual(len(rewind), 8)
+        self.assertEqual([rewind.pop() for _ in range(8)], [bytes([index]) * 8 for index in range(11, 3, -1)])
+
+    def test_random_state(self) -> None:
+        """
+        The RNG state is stored against the previous state's, so regenerating it doesn't grow every later delta.
+
+        :return: None.
+        """
+
+        cpu = create_interpreter(dice_rom, seed=0)
+        rewind = RewindBuffer(capacity=250, keyframe_interval=60, tail_size=SAVE_STATE_RANDOM_SIZE)
+        whole = RewindBuffer(capacity=250, keyframe_interval=60)
+        states = []
+
+        # About 6 numbers drawn a frame, the generator is regenerated every 100 frames or so.
+        for _ in range(300):
+            cpu.run_frame(12)
+            states.append(cpu.save_state())
+            rewind.push(states[-1])
+            whole.push(states[-1])
+
+        self.assertLess(rewind.nbytes, whole.nbytes // 4)
+
+        # The oldest segment was dropped.
+        self.assertEqual(len(rewind), 240)
+
+        for state in reversed(states[-240:]):
+            self.assertEqual(rewind.pop(), state)
+
+        self.assertIsNone(rewind.pop())
+
+        rewind.push(states[0])
+
+        self.assertEqual(rewind.pop(), states[0])
+
+
+class TestFork(unittest.TestCase):
+    """
+    Fork test harness.
+    """
+
+    def test_fork_independent(self) -> None:
+        """
+        Forks start in the parent's state and diverge from it without affecting it.
+
+        :return: None.
+        """
+
+        for framebuffer in (None, PackedFramebuffer()):
+            with self.subTest(framebuffer=framebuffer):
+                parent = create_interpreter(busy_rom, framebuffer=framebuffer)
+                parent.run_frame(100)
+
+                saved = machine_state(parent)
+                child = parent.fork()
+
+                self.assertEqual(machine_state(child), saved)
+
+                child.key_mask = 0xFFFF
+                child.ram[0x300] = 0xAB
+                child.registers[0x5] = 0xCD
+                child.stack[0] = 0x123
+                child.run_frame(100)
+
+                self.assertEqual(machine_state(parent), saved)
+
+                parent.run_frame(100)
+
+                self.assertNotEqual(machine_state(child), machine_state(parent))
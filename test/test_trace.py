@@ -0,0 +1,160 @@
+"""
+Execution trace unit tests.
+"""
+
+import tempfile
+import unittest
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+
+from chipmul8.interpreter import Interpreter
+from chipmul8.trace import NO_REGISTER, TraceReader, TraceRecorder, first_divergence
+
+# fmt: off
+# Counts V0 up, draws a random sprite and waits a frame on the delay timer, forever.
+count_rom = bytes([
+    0x70, 0x01,  # 200: V0 += 1
+    0xC1, 0x07,  # 202: V1 = random & 7
+    0xF1, 0x29,  # 204: I = font sprite for V1
+    0xD0, 0x05,  # 206: draw at (V0, V0)
+    0x62, 0x01,  # 208: V2 = 1
+    0xF2, 0x15,  # 20A: delay timer = V2
+    0xF2, 0x07,  # 20C: V2 = delay timer
+    0x32, 0x00,  # 20E: skip if V2 == 0
+    0x12, 0x0C,  # 210: goto 20C
+    0x12, 0x00,  # 212: goto 200
+])
+# fmt: on
+
+
+def trace(path: Path, frames: int, *, seed: int = 0, **kwargs: int) -> Interpreter:
+    """
+    Trace frames of count_rom.
+
+    :param path: Trace file path.
+    :param frames: Number of frames to run.
+    :param seed: Seed of the random numbers drawn by the ROM.
+    :param kwargs: TraceRecorder options.
+    :return: Interpreter in its final state.
+    """
+
+    cpu = Interpreter(seed=seed)
+    cpu.load_rom(BytesIO(count_rom))
+
+    with TraceRecorder(path, **kwargs) as recorder:
+        recorder.attach(cpu)
+
+        for _ in range(frames):
+            cpu.run_frame(50)
+
+        recorder.detach(cpu)
+
+    return cpu
+
+
+class TestTrace(unittest.TestCase):
+    """
+    Trace test harness.
+    """
+
+    def setUp(self) -> None:
+        """
+        Create a directory for the traces.
+
+        :return: None.
+        """
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def test_round_trip(self) -> None:
+        """
+        Traces read back every instruction executed, whether compressed or not.
+
+        :return: None.
+        """
+
+        for compression_level in (0, 1, 9):
+            with self.subTest(compression_level=compression_level):
+                path = self.directory / f"{compression_level}.c8t"
+                cpu = trace(path, 20, chunk_records=16, compression_level=compression_level)
+                reader = TraceReader(path)
+                records = reader.records()
+
+                self.assertGreater(len(reader.chunks), 1)
+                self.assertEqual(len(reader), len(records))
+                self.assertNotIn("dispatch_table", vars(cpu))
+
+                first = records[:5]
+
+                self.assertEqual(first["cycle"].tolist(), [0, 1, 2, 3, 4])
+                self.assertEqual(first["program_counter"].tolist(), [0x200, 0x202, 0x204, 0x206, 0x208])
+                self.assertEqual(first["op_code"].tolist(), [0x7001, 0xC107, 0xF129, 0xD005, 0x6201])
+                self.assertEqual(first["register"].tolist(), [0x0, 0x1, NO_REGISTER, 0xF, 0x2])
+                self.assertEqual(first["value"][[0, 3, 4]].tolist(), [1, 0, 1])
+                # I points at the font sprite of the random number drawn.
+                self.assertEqual(first["register_i"][2], first["value"][1] * 5)
+                # The last instruction executed is on the last cycle.
+                self.assertEqual(records["cycle"][-1], cpu.cycles - 1)
+                self.assertEqual(records[records["op_code"] == 0x7001]["value"].tolist(), list(range(1, 21)))
+
+    def test_idle_cycles(self) -> None:
+        """
+        Cycles fast-forwarded through idle loops are skipped in the trace, later records keep their true cycle.
+
+        :return: None.
+        """
+
+        path = self.directory / "trace.c8t"
+        cpu = trace(path, 20)
+        records = TraceReader(path).records()
+        cycles = records["cycle"]
+
+        self.assertLess(len(cycles), cpu.cycles)
+        self.assertTrue(np.all(np.diff(cycles.astype(np.int64)) >= 1))
+        # Each iteration waits out a frame, so starts in the next.
+        self.assertEqual((cycles[records["program_counter"] == 0x200] // 50).tolist(), list(range(20)))
+
+    def test_first_divergence(self) -> None:
+        """
+        Divergence is found at the first record that differs.
+
+        :return: None.
+        """
+
+        trace(self.directory / "a.c8t", 20, chunk_records=7)
+        trace(self.directory / "b.c8t", 20, chunk_records=11)
+        trace(self.directory / "short.c8t", 10)
+        trace(self.directory / "seed.c8t", 20, seed=1)
+
+        a, b, short, seed = (TraceReader(self.directory / f"{name}.c8t") for name in ("a", "b", "short", "seed"))
+        seeded = seed.records()
+        index = first_divergence(a, seed)
+
+        self.assertIsNone(first_divergence(a, b))
+        self.assertEqual(first_divergence(a, short), len(short))
+        self.assertEqual(first_divergence(short, a), len(short))
+        self.assertIsNotNone(index)
+        self.assertEqual(seeded[index]["op_code"], 0xC107)
+        self.assertEqual(a.records()[:index].tolist(), seeded[:index].tolist())
+
+    def test_invalid(self) -> None:
+        """
+        Files that aren't traces are rejected.
+
+        :return: None.
+        """
+
+        path = self.directory / "trace.c8t"
+        trace(path, 2)
+        data = path.read_bytes()
+
+        for invalid in (b"", b"XXXX" + data[4:], data[:-1]):
+            with self.subTest(invalid=invalid[:8]):
+                path.write_bytes(invalid)
+
+                with self.assertRaises(ValueError):
+                    TraceReader(path)
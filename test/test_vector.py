@@ -0,0 +1,209 @@
+"""
+Lockstep interpreter unit tests.
+"""
+
+import unittest
+from io import BytesIO
+from random import Random
+
+import numpy as np
+
+from chipmul8.display import SpriteMode
+from chipmul8.interpreter import Interpreter, StopReason
+from chipmul8.vector import VectorInterpreter
+
+
+def random_program(random: Random, length: int = 64) -> bytes:
+    """
+    Generate a program of mostly valid instructions (no CXNN) jumping around its own code, looping back to the start
+    at the end.
+
+    :param random: Random number generator.
+    :param length: Number of instructions.
+    :return: Program.
+    """
+
+    end = 0x200 + (length - 1) * 2
+
+    def address() -> int:
+        return random.randrange(0x200, end, 2)
+
+    def anything() -> int:
+        op_code = random.randrange(0x10000)
+        return op_code if op_code & 0xF000 != 0xC000 else op_code ^ 0x4000
+
+    # Returns, calls, computed jumps and arbitrary opcodes tend to end up executing data, so they're rarer.
+    rare = [
+        lambda: 0x00EE,
+        lambda: 0x2000 | address(),
+        lambda: 0xB000 | address() - 0x10,
+        anything,
+    ]
+    common = [
+        lambda: 0x00E0,
+        lambda: 0x1000 | address(),
+        lambda: 0x3000 | random.randrange(0x1000),
+        lambda: 0x4000 | random.randrange(0x1000),
+        lambda: 0x5000 | random.randrange(0x100) << 4,
+        lambda: 0x6000 | random.randrange(0x1000),
+        lambda: 0x7000 | random.randrange(0x1000),
+        lambda: 0x8000 | random.randrange(0x100) << 4 | random.choice([0x0, 0x1, 0x2, 0x3, 0x4, 0x5, 0x6, 0x7, 0xE]),
+        lambda: 0x9000 | random.randrange(0x100) << 4,
+        lambda: 0xA000 | random.choice([random.randrange(0x1000), random.randrange(0xFF0, 0x1000)]),
+        lambda: 0xD000 | random.randrange(0x1000),
+        lambda: 0xE09E | random.randrange(0x10) << 8,
+        lambda: 0xE0A1 | random.randrange(0x10) << 8,
+        lambda: 0xF000 | random.randrange(0x10) << 8 | random.choice([0x07, 0x0A, 0x15, 0x18, 0x1E, 0x29, 0x33]),
+        lambda: 0xF000 | random.randrange(0x10) << 8 | random.choice([0x55, 0x65]),
+    ]
+
+    templates = rare + common
+    weights = [1] * len(rare) + [4] * len(common)
+    op_codes = [random.choices(templates, weights)[0]() for _ in range(length - 1)]
+
+    return b"".join(op_code.to_bytes(2) for op_code in [*op_codes, 0x1200])
+
+
+class TestVectorInterpreter(unittest.TestCase):
+    """
+    Lockstep interpreter test harness.
+    """
+
+    def run_against_interpreter(self, sprite_mode: SpriteMode, seed: int) -> None:
+        """
+        Run random programs on both interpreters, frame by frame, checking every machine's state agrees.
+
+        :param sprite_mode: Behaviour of sprites drawn past the edge of the display.
+        :param seed: Seed of the random programs and key presses.
+        :return: None.
+        """
+
+        random = Random(seed)
+        machines = 32
+
+        vector = VectorInterpreter(machines, sprite_mode=sprite_mode)
+        cpus = []
+
+        for machine in range(machines):
+            program = random_program(random)
+            vector.load_rom(program, np.array([machine]))
+
+            cpu = Interpreter(sprite_mode=sprite_mode)
+            cpu.load_rom(BytesIO(program))
+            cpus.append(cpu)
+
+        for _ in range(20):
+            for machine, cpu in enumerate(cpus):
+                key_mask = random.choice([0, 1 << random.randrange(16), random.randrange(0x10000)])
+                vector.key_mask[machine] = key_mask
+                cpu.key_mask = key_mask
+
+                if cpu.fault is None:
+                    cpu.run_frame(30)
+
+            vector.run_frame(30)
+
+        for machine, cpu in enumerate(cpus):
+            with self.subTest(machine=machine):
+                self.assertEqual(cpu.fault is not None, vector.faulted[machine])
+                self.assertEqual(cpu.cycles, vector.cycles[machine])
+                self.assertEqual(cpu.program_counter, vector.program_counter[machine])
+                self.assertEqual(cpu.current_op_code, vector.current_op_code[machine])
+                self.assertEqual(cpu.register_i, vector.register_i[machine])
+                self.assertEqual(cpu.stack_pointer, vector.stack_pointer[machine])
+                self.assertEqual(list(cpu.stack), vector.stack[machine].tolist())
+                self.assertEqual(cpu.delay_register, vector.delay_register[machine])
+                self.assertEqual(cpu.sound_register, vector.sound_register[machine])
+                self.assertEqual(bytes(cpu.registers.memory), vector.registers[machine].tobytes())
+                self.assertEqual(bytes(cpu.ram.memory), vector.ram[machine].tobytes())
+                np.testing.assert_array_equal(cpu.display_memory, vector.pixels[machine])
+
+    def test_clip_matches_interpreter(self) -> None:
+        """
+        Clipped sprites, and every other instruction, match the interpreter.
+
+        :return: None.
+        """
+
+        for seed in range(4):
+            self.run_against_interpreter(SpriteMode.CLIP, seed)
+
+    def test_wrap_matches_interpreter(self) -> None:
+        """
+        Wrapped sprites match the interpreter.
+
+        :return: None.
+        """
+
+        for seed in range(4, 8):
+            self.run_against_interpreter(SpriteMode.WRAP, seed)
+
+    def test_sprite_past_memory(self) -> None:
+        """
+        Sprite rows past the end of memory are skipped, even with I moved past it entirely, as on the interpreter.
+
+        :return: None.
+        """
+
+        # fmt: off
+        program = bytes([
+            0xAF, 0xFE,  # 200: I = FFE
+            0x60, 0x01,  # 202: V0 = 1
+            0xD1, 0x15,  # 204: draw the 2 rows left at (V1, V1)
+            0x60, 0x10,  # 206: V0 = 10
+            0xF0, 0x1E,  # 208: I += V0, past the end of memory
+            0xD1, 0x15,  # 20A: draw nothing
+            0xD1, 0x10,  # 20C: draw nothing
+            0x12, 0x0E,  # 20E: goto 20E
+        ])
+        # fmt: on
+
+        vector = VectorInterpreter(1)
+        vector.load_rom(program)
+        cpu = Interpreter()
+        cpu.load_rom(BytesIO(program))
+
+        vector.run_frame(20)
+
+        self.assertEqual(StopReason.IDLE, cpu.run_frame(20))
+        self.assertFalse(vector.faulted[0])
+        self.assertEqual(cpu.program_counter, vector.program_counter[0])
+        self.assertEqual(0x100E, cpu.register_i)
+        self.assertEqual(cpu.registers[0xF], vector.registers[0, 0xF])
+        np.testing.assert_array_equal(cpu.display_memory, vector.pixels[0])
+
+    def test_fault_isolated(self) -> None:
+        """
+        A faulting machine stops without affecting the others.
+
+        :return: None.
+        """
+
+        vector = VectorInterpreter(3)
+        vector.load_rom(bytes([0x70, 0x01, 0x12, 0x00]))
+        vector.load_rom(bytes([0x70, 0x01, 0xFF, 0xFF]), np.array([1]))
+
+        vector.run(10)
+
+        self.assertEqual(vector.faulted.tolist(), [False, True, False])
+        self.assertEqual(vector.registers[:, 0].tolist(), [5, 1, 5])
+        self.assertEqual(vector.cycles.tolist(), [10, 1, 10])
+        self.assertEqual(vector.program_counter[1], 0x202)
+
+    def test_random(self) -> None:
+        """
+        CXNN masks a random byte with NN, reproducibly for a seed.
+
+        :return: None.
+        """
+
+        first = VectorInterpreter(64, seed=1)
+        second = VectorInterpreter(64, seed=1)
+
+        for vector in (first, second):
+            vector.load_rom(bytes([0xC0, 0x0F, 0xC1, 0xFF]))
+            vector.run(2)
+
+        self.assertTrue((first.registers[:, 0] <= 0x0F).all())
+        self.assertGreater(len(np.unique(first.registers[:, 1])), 1)
+        np.testing.assert_array_equal(first.registers, second.registers)